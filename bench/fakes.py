@@ -0,0 +1,273 @@
+"""Gateway payloads and a stand-in REST layer for running the cogs without Discord.
+
+Everything here produces the same dicts Discord sends, so the real discord.py parsers,
+models, views and the cogs' listeners run unchanged on top of it.
+"""
+import asyncio
+import itertools
+import re
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import discord
+from discord.http import Route
+from discord.webhook import async_ as webhook_async
+
+DISCORD_EPOCH = 1420070400000
+ADMINISTRATOR = 0x8
+_sequence = itertools.count()
+
+
+def snowflake() -> int:
+    return ((int(time.time() * 1000) - DISCORD_EPOCH) << 22) | (next(_sequence) & 0x3FFFFF)
+
+
+def iso(dt: Optional[datetime] = None) -> str:
+    return (dt or datetime.now(timezone.utc)).isoformat()
+
+
+#   ---- Payloads ----
+def user_payload(user_id: int, name: str, bot: bool = False) -> Dict[str, Any]:
+    return {"id": str(user_id), "username": name, "global_name": None, "discriminator": "0", "avatar": None, "bot": bot}
+
+
+def member_payload(user_id: int, name: str, roles: Iterable[int] = (), joined_at: Optional[str] = None,
+                   bot: bool = False, permissions: Optional[int] = None) -> Dict[str, Any]:
+    payload = {
+        "user": user_payload(user_id, name, bot),
+        "roles": [str(r) for r in roles],
+        "joined_at": joined_at or iso(),
+        "deaf": False,
+        "mute": False,
+        "flags": 0,
+    }
+    if permissions is not None:
+        payload["permissions"] = str(permissions)
+    return payload
+
+
+def role_payload(role_id: int, name: str, position: int = 0, permissions: int = 0) -> Dict[str, Any]:
+    return {"id": str(role_id), "name": name, "permissions": str(permissions), "position": position, "color": 0,
+            "hoist": False, "managed": False, "mentionable": False}
+
+
+def channel_payload(channel_id: int, guild_id: int, name: str, channel_type: int = 0, position: int = 0,
+                    parent_id: Optional[int] = None, overwrites: Iterable[Dict] = ()) -> Dict[str, Any]:
+    payload = {"id": str(channel_id), "guild_id": str(guild_id), "type": channel_type, "name": name,
+               "position": position, "parent_id": str(parent_id) if parent_id else None,
+               "permission_overwrites": list(overwrites)}
+    if channel_type == 2:
+        payload.update(bitrate=64000, user_limit=0, rtc_region=None)
+    return payload
+
+
+def voice_state_payload(guild_id: int, channel_id: Optional[int], member: Dict[str, Any]) -> Dict[str, Any]:
+    return {"guild_id": str(guild_id), "channel_id": str(channel_id) if channel_id else None,
+            "user_id": member["user"]["id"], "member": member, "session_id": "harness", "deaf": False, "mute": False,
+            "self_deaf": False, "self_mute": False, "self_video": False, "suppress": False,
+            "request_to_speak_timestamp": None}
+
+
+def guild_payload(guild_id: int, name: str, channels: List[Dict], roles: List[Dict], members: List[Dict],
+                  voice_states: List[Dict] = ()) -> Dict[str, Any]:
+    return {"id": str(guild_id), "name": name, "icon": None, "owner_id": members[0]["user"]["id"] if members else "0",
+            "roles": roles, "channels": channels, "members": members, "voice_states": list(voice_states),
+            "member_count": len(members), "emojis": [], "stickers": [], "features": [], "threads": [],
+            "stage_instances": [], "guild_scheduled_events": [], "presences": []}
+
+
+def message_payload(message_id: int, channel_id: int, author: Dict[str, Any], content: str = "",
+                    guild_id: Optional[int] = None, member: Optional[Dict[str, Any]] = None,
+                    embeds: Iterable[Dict] = (), components: Iterable[Dict] = ()) -> Dict[str, Any]:
+    payload = {"id": str(message_id), "channel_id": str(channel_id), "author": author, "content": content,
+               "attachments": [], "embeds": list(embeds), "components": list(components), "mentions": [],
+               "mention_roles": [], "pinned": False, "mention_everyone": False, "tts": False,
+               "timestamp": iso(), "edited_timestamp": None, "type": 0, "flags": 0}
+    if guild_id is not None:
+        payload["guild_id"] = str(guild_id)
+    if member is not None:
+        payload["member"] = {k: v for k, v in member.items() if k != "user"}
+    return payload
+
+
+def interaction_payload(interaction_type: int, application_id: int, guild_id: int, channel_id: int,
+                        member: Dict[str, Any], data: Dict[str, Any],
+                        message: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    payload = {"id": str(snowflake()), "application_id": str(application_id), "type": interaction_type,
+               "token": f"harness-{snowflake()}", "version": 1, "guild_id": str(guild_id),
+               "channel_id": str(channel_id), "channel": {"id": str(channel_id), "type": 0},
+               "member": member, "app_permissions": str(ADMINISTRATOR), "locale": "en-US", "data": data}
+    if message is not None:
+        payload["message"] = message
+    return payload
+
+
+def guild_from_cache(guild: discord.Guild) -> Dict[str, Any]:
+    """Gateway-shaped copy of a cached guild (what the recorder stores as the replay world)."""
+    members = {m.id: member_payload(m.id, m.name, [r.id for r in m.roles[1:]],
+                                    iso(m.joined_at) if m.joined_at else None, m.bot)
+               for m in guild.members}
+    return guild_payload(
+        guild.id, guild.name,
+        channels=[channel_payload(c.id, guild.id, c.name, c.type.value, c.position, c.category_id)
+                  for c in guild.channels],
+        roles=[role_payload(r.id, r.name, r.position, r.permissions.value) for r in guild.roles],
+        members=list(members.values()),
+        voice_states=[voice_state_payload(guild.id, m.voice.channel.id, members[m.id])
+                      for m in guild.members if m.voice and m.voice.channel]
+    )
+
+
+#   ---- REST ----
+class FakeREST:
+    """Stands in for discord.py's HTTP layer: records each call, answers with plausible payloads
+    and simulates per-bucket rate limits.
+
+    Side effects that Discord would announce on the gateway (channel created, member moved, ...)
+    are fed back to the parsers on the next loop iteration, like a real echo.
+    """
+
+    def __init__(self, state, latency: float = 0.0, bucket_limit: int = 5, bucket_window: float = 5.0):
+        self.state = state
+        self.latency = latency
+        self.bucket_limit = bucket_limit
+        self.bucket_window = bucket_window
+        self.calls: Counter = Counter()
+        self.total = 0
+        self.rate_limited = 0
+        self.rate_limit_wait = 0.0
+        # Requests currently waiting on a rate limit or the simulated latency
+        self.inflight = 0
+        # bucket -> (window start, calls in window)
+        self._buckets: Dict[Tuple, List[float]] = {}
+        # Called with (interaction id, modal data) when a modal is sent
+        self.on_modal: Optional[Callable[[int, Dict[str, Any]], None]] = None
+        self._patterns: Dict[str, re.Pattern] = {}
+
+    def install(self, bot):
+        """Routes the bot's REST calls and interaction/webhook calls through this object."""
+        bot.http.request = self.request
+        adapter = _WebhookAdapter(self)
+        webhook_async.async_context.set(adapter)
+
+    def _params(self, route: Route) -> Dict[str, str]:
+        pattern = self._patterns.get(route.path)
+        if pattern is None:
+            pattern = self._patterns[route.path] = re.compile(
+                re.escape(Route.BASE) + re.sub(r"\\\{(\w+)\\\}", r"(?P<\1>[^/]+)", re.escape(route.path)) + "$")
+        match = pattern.match(route.url)
+        return match.groupdict() if match else {}
+
+    async def _throttle(self, route: Route, params: Dict[str, str]):
+        bucket = (route.method, route.path, route.channel_id, route.guild_id, route.webhook_id)
+        now = time.monotonic()
+        window = self._buckets.get(bucket)
+        if window is None or now - window[0] >= self.bucket_window:
+            window = self._buckets[bucket] = [now, 0]
+        if window[1] >= self.bucket_limit:
+            # Like discord.py, wait for the bucket to reset instead of failing
+            wait = window[0] + self.bucket_window - now
+            self.rate_limited += 1
+            self.rate_limit_wait += wait
+            await asyncio.sleep(wait)
+            window[0], window[1] = time.monotonic(), 0
+        window[1] += 1
+
+    async def request(self, route: Route, *, files=None, form=None, **kwargs) -> Any:
+        params = self._params(route)
+        self.calls[f"{route.method} {route.path}"] += 1
+        self.total += 1
+        self.inflight += 1
+        try:
+            if self.bucket_limit:
+                await self._throttle(route, params)
+            if self.latency:
+                await asyncio.sleep(self.latency)
+        finally:
+            self.inflight -= 1
+        return self._respond(route, params, kwargs.get("json") or kwargs.get("payload") or {})
+
+    def _echo(self, event: str, data: Dict[str, Any]):
+        asyncio.get_running_loop().call_soon(self.state.parsers[event], data)
+
+    def _bot_author(self) -> Dict[str, Any]:
+        user = self.state.user
+        return user_payload(user.id, user.name, bot=True)
+
+    def _respond(self, route: Route, params: Dict[str, str], body: Dict[str, Any]) -> Any:
+        method, path = route.method, route.path
+
+        if path in ("/channels/{channel_id}/messages", "/webhooks/{webhook_id}/{webhook_token}"):
+            channel_id = params.get("channel_id") or 0
+            return message_payload(snowflake(), channel_id, self._bot_author(), body.get("content") or "",
+                                   embeds=body.get("embeds") or (), components=body.get("components") or ())
+        if path.endswith("/messages/{message_id}") or path.endswith("/messages/@original"):
+            message_id = params.get("message_id") or snowflake()
+            return message_payload(message_id, params.get("channel_id") or 0, self._bot_author(),
+                                   body.get("content") or "", embeds=body.get("embeds") or ())
+
+        if path == "/interactions/{webhook_id}/{webhook_token}/callback":
+            if body.get("type") == 9 and self.on_modal:
+                self.on_modal(int(params["webhook_id"]), body.get("data") or {})
+            return None
+
+        if path == "/guilds/{guild_id}/channels" and method == "POST":
+            guild_id = int(params["guild_id"])
+            channel = channel_payload(snowflake(), guild_id, body.get("name", "channel"), body.get("type", 0),
+                                      parent_id=body.get("parent_id"),
+                                      overwrites=body.get("permission_overwrites") or ())
+            self._echo("CHANNEL_CREATE", channel)
+            return channel
+
+        if path == "/channels/{channel_id}":
+            channel = self.state.get_channel(int(params["channel_id"]))
+            guild_id = channel.guild.id if channel is not None and getattr(channel, "guild", None) else 0
+            payload = channel_payload(int(params["channel_id"]), guild_id,
+                                      body.get("name") or (channel.name if channel else "channel"),
+                                      channel.type.value if channel else 0,
+                                      overwrites=body.get("permission_overwrites") or ())
+            if method == "DELETE":
+                self._echo("CHANNEL_DELETE", payload)
+            elif method == "PATCH":
+                self._echo("CHANNEL_UPDATE", payload)
+            return payload
+
+        if path == "/guilds/{guild_id}/members/{user_id}":
+            guild = self.state._get_guild(int(params["guild_id"]))
+            member = guild.get_member(int(params["user_id"])) if guild else None
+            if member is None:
+                return None
+            payload = member_payload(member.id, member.name, [r.id for r in member.roles[1:]])
+            if method == "DELETE":
+                self._echo("GUILD_MEMBER_REMOVE", {"guild_id": str(guild.id), "user": payload["user"]})
+                return None
+            if "channel_id" in body:
+                self._echo("VOICE_STATE_UPDATE", voice_state_payload(guild.id, body["channel_id"], payload))
+            return payload
+
+        if path == "/applications/{application_id}/commands" and method == "PUT":
+            # Bulk overwrite of the global commands: echoed back with their IDs
+            return [dict(command, id=str(snowflake()), application_id=params["application_id"], version="1")
+                    for command in body]
+
+        if path == "/users/@me/channels":
+            return {"id": str(snowflake()), "type": 1, "recipients": [user_payload(int(body.get("recipient_id", 0)), "user")]}
+
+        return {}
+
+
+class _WebhookAdapter(webhook_async.AsyncWebhookAdapter):
+    """Interaction responses and followups use discord.py's webhook adapter, not HTTPClient."""
+
+    def __init__(self, rest: FakeREST):
+        super().__init__()
+        self.rest = rest
+
+    async def request(self, route: Route, session=None, *, payload=None, multipart=None, files=None, **kwargs) -> Any:
+        if payload is None and multipart:
+            # Multipart bodies carry the JSON payload as their first part
+            import json
+            payload = json.loads(multipart[0]["value"])
+        return await self.rest.request(route, json=payload)
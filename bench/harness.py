@@ -0,0 +1,552 @@
+"""Offline load generator and replay harness.
+
+Drives the real cogs with synthetic (or recorded) gateway traffic, entirely offline:
+
+    python -m bench.harness run --members 5000 --rate 200 --duration 30
+    python -m bench.harness run --mix message=70,voice=15,leave=5,casino=10 --rest-latency 0.05
+    python -m bench.harness replay events.jsonl --speed 10
+
+Every run happens in a fresh temporary directory (the store writes to ./data), optionally
+seeded with a copy of a real data directory (--data-dir). Recordings come from bench/recorder.py.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import discord
+from discord.ext import commands
+
+from bench import fakes
+
+DEFAULT_COGS = ("cogs.leveling", "cogs.tempvoice", "cogs.moderation", "cogs.lucky_events")
+DEFAULT_MIX = "message=80,voice=10,leave=5,casino=5"
+# Long enough for TempVoice's join debounce and the Casino embed edit delay to fire
+SETTLE_SECONDS = 2.5
+DRAIN_TIMEOUT = 60.0
+BOT_ID = 1000
+APPLICATION_ID = BOT_ID
+ADMIN_ID = 1001
+
+
+#   ---- Measurements ----
+class Stats:
+    """Handler latencies and event counts for one run."""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.events: Dict[str, int] = defaultdict(int)
+        self.inflight = 0
+
+    def timed(self, label: str, coro_fn, *args, **kwargs):
+        async def runner():
+            self.inflight += 1
+            start = time.perf_counter()
+            try:
+                return await coro_fn(*args, **kwargs)
+            except Exception:
+                self.errors[label] += 1
+                raise
+            finally:
+                self.latencies[label].append(time.perf_counter() - start)
+                self.inflight -= 1
+        return runner()
+
+    @property
+    def total_events(self) -> int:
+        return sum(self.events.values())
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def _bytes_written() -> Optional[int]:
+    """Bytes this process passed to write() so far (Linux only)."""
+    try:
+        with open("/proc/self/io") as f:
+            for line in f:
+                if line.startswith("wchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            with contextlib.suppress(OSError):
+                total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+def _instrument(bot: commands.Bot, stats: Stats):
+    """Times every listener, component callback, modal and app command the cogs run."""
+    run_event = bot._run_event
+
+    def timed_run_event(coro, event_name, *args, **kwargs):
+        label = getattr(coro, "__qualname__", event_name)
+        return stats.timed(label, run_event, coro, event_name, *args, **kwargs)
+    bot._run_event = timed_run_event
+
+    view_task = discord.ui.View._scheduled_task
+
+    def timed_view_task(self, item, interaction):
+        label = f"{type(self).__name__}:{getattr(item, 'custom_id', None) or type(item).__name__}"
+        return stats.timed(label, view_task, self, item, interaction)
+    discord.ui.View._scheduled_task = timed_view_task
+
+    modal_task = discord.ui.Modal._scheduled_task
+
+    def timed_modal_task(self, interaction, components):
+        return stats.timed(type(self).__name__, modal_task, self, interaction, components)
+    discord.ui.Modal._scheduled_task = timed_modal_task
+
+    tree_call = bot.tree._call
+
+    def timed_tree_call(interaction):
+        name = interaction.data.get("name", "?") if interaction.data else "?"
+        return stats.timed(f"/{name}", tree_call, interaction)
+    bot.tree._call = timed_tree_call
+
+
+#   ---- Offline bot ----
+async def create_offline_bot(rest_latency: float, rate_limit: Tuple[int, float],
+                             bot_options: Optional[Dict[str, Any]] = None) -> Tuple[commands.Bot, fakes.FakeREST]:
+    """`bot_options` are passed to commands.Bot (default: every intent, discord.py's default caches)."""
+    bot = commands.Bot(command_prefix="/", **(bot_options or {"intents": discord.Intents.all()}))
+    rest = fakes.FakeREST(bot._connection, latency=rest_latency,
+                          bucket_limit=rate_limit[0], bucket_window=rate_limit[1])
+    rest.install(bot)
+    await bot._async_setup_hook()
+
+    state = bot._connection
+    state.user = discord.ClientUser(state=state, data=fakes.user_payload(BOT_ID, "harness-bot", bot=True))
+    state.application_id = APPLICATION_ID
+    return bot, rest
+
+
+async def start_world(bot: commands.Bot, guilds: Iterable[Dict[str, Any]], cogs: Iterable[str]):
+    state = bot._connection
+    for guild in guilds:
+        state._add_guild_from_data(guild)
+    bot._ready.set()
+    for extension in cogs:
+        await bot.load_extension(extension)
+
+
+def apply_config(bot: commands.Bot, cog_name: str, guild_id: int, values: Dict[str, Any]):
+    cog = bot.get_cog(cog_name)
+    if cog:
+        cog.guild_configs.edit(guild_id).update(values)
+        cog.guild_configs.save(guild_id)
+
+
+async def shutdown(bot: commands.Bot):
+    leveling = bot.get_cog("Leveling")
+    if leveling:
+        leveling.flush_level_data()
+    for name in list(bot.extensions):
+        with contextlib.suppress(Exception):
+            await bot.unload_extension(name)
+    store = getattr(bot, "store", None)
+    if store:
+        store.flush()
+        store.close()
+
+
+async def drain(stats: Stats, rest: fakes.FakeREST, settle: float = SETTLE_SECONDS) -> float:
+    """Waits until every handler started by the run (and its follow-ups) has finished.
+
+    Returns the monotonic time the last handler finished.
+    """
+    deadline = time.monotonic() + DRAIN_TIMEOUT
+    quiet_since = None
+    while time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+        if stats.inflight or rest.inflight:
+            quiet_since = None
+        elif quiet_since is None:
+            quiet_since = time.monotonic()
+        elif time.monotonic() - quiet_since >= settle:
+            return quiet_since
+    return time.monotonic()
+
+
+#   ---- Synthetic world ----
+class SyntheticWorld:
+    """One guild with a text channel, a voice creator channel and `members` members."""
+
+    def __init__(self, members: int, seed: int):
+        self.random = random.Random(seed)
+        self.guild_id = fakes.snowflake()
+        self.text_id = fakes.snowflake()
+        self.exit_id = fakes.snowflake()
+        self.levelup_id = fakes.snowflake()
+        self.creator_id = fakes.snowflake()
+        self.category_id = fakes.snowflake()
+        admin_role = fakes.snowflake()
+        self.members = [fakes.member_payload(ADMIN_ID, "admin", roles=[admin_role], permissions=fakes.ADMINISTRATOR)]
+        self.members += [fakes.member_payload(fakes.snowflake(), f"member{i}") for i in range(members)]
+        bot_member = fakes.member_payload(BOT_ID, "harness-bot", roles=[admin_role], bot=True)
+        self.payload = fakes.guild_payload(
+            self.guild_id, "Harness guild",
+            channels=[
+                fakes.channel_payload(self.category_id, self.guild_id, "Voice", 4),
+                fakes.channel_payload(self.text_id, self.guild_id, "general", 0, 1),
+                fakes.channel_payload(self.exit_id, self.guild_id, "goodbye", 0, 2),
+                fakes.channel_payload(self.levelup_id, self.guild_id, "level-up", 0, 3),
+                fakes.channel_payload(self.creator_id, self.guild_id, "Join to create", 2, 4, self.category_id),
+            ],
+            roles=[fakes.role_payload(self.guild_id, "@everyone"),
+                   fakes.role_payload(admin_role, "admin", 1, fakes.ADMINISTRATOR)],
+            members=self.members + [bot_member]
+        )
+        self.casino_events: List[int] = []
+
+    def configs(self) -> Dict[str, Dict[str, Any]]:
+        """What /config would set to point the cogs at the world's channels."""
+        return {
+            "Leveling": {"level_up_channel_id": self.levelup_id},
+            "Moderation": {"exit_channel_id": self.exit_id},
+            "TempVoice": {"creator_channel_id": self.creator_id},
+        }
+
+    def member(self) -> Dict[str, Any]:
+        return self.random.choice(self.members[1:])
+
+
+class Generator:
+    """Turns a scenario mix into gateway events fed straight to discord.py's parsers."""
+
+    def __init__(self, bot: commands.Bot, rest: fakes.FakeREST, world: SyntheticWorld, stats: Stats,
+                 recorder: Optional["JsonlWriter"] = None):
+        self.bot = bot
+        self.state = bot._connection
+        self.world = world
+        self.stats = stats
+        self.recorder = recorder
+        self.pending_modals: Dict[int, Tuple[Dict[str, Any], Dict[str, Any]]] = {}
+        rest.on_modal = self._on_modal
+
+    def dispatch(self, event: str, data: Dict[str, Any]):
+        self.stats.events[event] += 1
+        if self.recorder:
+            self.recorder.event(event, data)
+        self.state.parsers[event](data)
+
+    def _interaction(self, interaction_type: int, member: Dict[str, Any], data: Dict[str, Any],
+                     message: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return fakes.interaction_payload(interaction_type, APPLICATION_ID, self.world.guild_id, self.world.text_id,
+                                         member, data, message)
+
+    # ---- Scenarios ----
+    def message(self):
+        member = self.world.member()
+        words = self.world.random.randint(1, 12)
+        self.dispatch("MESSAGE_CREATE", fakes.message_payload(
+            fakes.snowflake(), self.world.text_id, member["user"], " ".join(["lorem"] * words),
+            guild_id=self.world.guild_id, member=member))
+
+    def voice(self):
+        member = self.world.member()
+        cached = self.bot.get_guild(self.world.guild_id).get_member(int(member["user"]["id"]))
+        in_voice = cached is not None and cached.voice is not None and cached.voice.channel is not None
+        channel_id = None if in_voice else self.world.creator_id
+        self.dispatch("VOICE_STATE_UPDATE", fakes.voice_state_payload(self.world.guild_id, channel_id, member))
+
+    def leave(self):
+        member = self.world.member()
+        self.dispatch("GUILD_MEMBER_REMOVE", {"guild_id": str(self.world.guild_id), "user": member["user"]})
+        # Rejoin right away so the world keeps its size
+        self.dispatch("GUILD_MEMBER_ADD", dict(member, guild_id=str(self.world.guild_id)))
+
+    def casino(self):
+        casino = self.bot.get_cog("Casino")
+        if casino is None or not casino.active_casinos:
+            return
+        message_id = self.world.random.choice(list(casino.active_casinos))
+        message = fakes.message_payload(message_id, self.world.text_id, fakes.user_payload(BOT_ID, "harness-bot", True),
+                                        guild_id=self.world.guild_id)
+        payload = self._interaction(3, self.world.member(), {"custom_id": "casino:select_number", "component_type": 2},
+                                    message)
+        self.pending_modals[int(payload["id"])] = (payload["member"], message)
+        self.dispatch("INTERACTION_CREATE", payload)
+
+    def _on_modal(self, interaction_id: int, modal: Dict[str, Any]):
+        """The button answered with a modal: the same member submits a random number."""
+        pending = self.pending_modals.pop(interaction_id, None)
+        casino = self.bot.get_cog("Casino")
+        if pending is None or casino is None:
+            return
+        member, message = pending
+        event = casino.active_casinos.get(int(message["id"]))
+        size = event.get("size", 100) if event else 100
+        text_input = modal["components"][0]["components"][0]
+        data = {"custom_id": modal["custom_id"], "components": [
+            {"type": 1, "components": [{"type": 4, "custom_id": text_input["custom_id"],
+                                        "value": str(self.world.random.randint(1, size))}]}]}
+        payload = self._interaction(5, member, data, message)
+        asyncio.get_running_loop().call_soon(self.dispatch, "INTERACTION_CREATE", payload)
+
+    def create_casino(self, size: int):
+        admin = self.world.members[0]
+        options = [{"name": "date_time", "type": 3, "value": time.strftime("%d/%m/%Y %H:%M", time.gmtime(time.time() + 3600))},
+                   {"name": "size", "type": 4, "value": size}]
+        self.dispatch("INTERACTION_CREATE", self._interaction(
+            2, admin, {"id": str(fakes.snowflake()), "name": "casino", "type": 1, "options": options}))
+
+    async def run(self, mix: Dict[str, float], rate: float, duration: float):
+        scenarios = list(mix)
+        weights = [mix[name] for name in scenarios]
+        interval = 1.0 / rate
+        start = time.perf_counter()
+        sent = 0
+        while time.perf_counter() - start < duration:
+            getattr(self, self.world.random.choices(scenarios, weights)[0])()
+            sent += 1
+            # Sleep to the schedule, not per event, so slow handlers show up as lag, not as a lower rate
+            delay = start + sent * interval - time.perf_counter()
+            await asyncio.sleep(max(0.0, delay))
+
+
+#   ---- Recording and replay ----
+class JsonlWriter:
+    """Writes {"world": guild} and {"ts", "t", "d"} lines (the recorder's format)."""
+
+    def __init__(self, path: str):
+        self.file = open(path, "w", encoding="utf-8")
+        self.start = time.monotonic()
+        # Kept so the report can leave the recording out of the disk writes
+        self.bytes = 0
+
+    def _write(self, entry: Dict[str, Any]):
+        line = json.dumps(entry) + "\n"
+        self.bytes += len(line.encode("utf-8"))
+        self.file.write(line)
+
+    def world(self, guild: Dict[str, Any]):
+        self._write({"world": guild})
+
+    def config(self, cog_name: str, guild_id: int, values: Dict[str, Any]):
+        self._write({"config": {"cog": cog_name, "guild_id": guild_id, "values": values}})
+
+    def event(self, event: str, data: Dict[str, Any]):
+        self._write({"ts": round(time.monotonic() - self.start, 4), "t": event, "d": data})
+
+    def close(self):
+        self.file.close()
+
+
+def read_recording(path: str) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Returns the recording's guilds, config overrides and events."""
+    guilds, configs, events = [], [], []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if "world" in entry:
+                guilds.append(entry["world"])
+            elif "config" in entry:
+                configs.append(entry["config"])
+            else:
+                events.append(entry)
+    return guilds, configs, events
+
+
+async def replay_events(bot: commands.Bot, events: List[Dict[str, Any]], stats: Stats, speed: float):
+    state = bot._connection
+    start = time.perf_counter()
+    first = events[0]["ts"] if events else 0.0
+    for entry in events:
+        if speed > 0:
+            delay = start + (entry["ts"] - first) / speed - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        parser = state.parsers.get(entry["t"])
+        if parser is None:
+            continue
+        stats.events[entry["t"]] += 1
+        try:
+            parser(entry["d"])
+        except Exception as e:
+            print(f"[Harness] Could not replay {entry['t']}: {e}", file=sys.stderr)
+        if speed <= 0:
+            # Still let the handlers run between events
+            await asyncio.sleep(0)
+
+
+#   ---- Report ----
+def report(stats: Stats, rest: fakes.FakeREST, elapsed: float, disk_bytes: Optional[int], out=sys.stdout):
+    events = stats.total_events or 1
+    print("=== Harness report ===", file=out)
+    print(f"Events: {stats.total_events} in {elapsed:.2f}s -> {stats.total_events / elapsed:.1f} events/s", file=out)
+    for event, count in sorted(stats.events.items(), key=lambda kv: -kv[1]):
+        print(f"  {event:<22} {count}", file=out)
+
+    print("Handler latency (ms):", file=out)
+    print(f"  {'handler':<40} {'count':>7} {'p50':>8} {'p99':>8} {'max':>8} {'errors':>7}", file=out)
+    for label, values in sorted(stats.latencies.items(), key=lambda kv: -len(kv[1])):
+        print(f"  {label:<40} {len(values):>7} {statistics.median(values) * 1000:>8.3f} "
+              f"{_percentile(values, 99) * 1000:>8.3f} {max(values) * 1000:>8.3f} {stats.errors.get(label, 0):>7}",
+              file=out)
+
+    print(f"REST calls: {rest.total} ({rest.total / events:.3f} per event), "
+          f"rate limited: {rest.rate_limited} ({rest.rate_limit_wait:.1f}s waited)", file=out)
+    for route, count in rest.calls.most_common():
+        print(f"  {route:<60} {count:>7} ({count / events:.3f}/event)", file=out)
+
+    if disk_bytes is not None:
+        print(f"Disk writes: {disk_bytes} bytes ({disk_bytes / events:.1f} per event)", file=out)
+
+
+def _parse_mix(text: str) -> Dict[str, float]:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ("message", "voice", "leave", "casino"):
+            raise argparse.ArgumentTypeError(f"unknown scenario: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def _parse_rate_limit(text: str) -> Tuple[int, float]:
+    """"5/5" = 5 calls per 5 seconds per bucket; "0" disables rate limits."""
+    if text in ("0", "off", "none"):
+        return 0, 1.0
+    calls, _, window = text.partition("/")
+    return int(calls), float(window or 1)
+
+
+#   ---- Entry point ----
+async def _run(args) -> int:
+    stats = Stats()
+    bot, rest = await create_offline_bot(args.rest_latency, args.rate_limit)
+    _instrument(bot, stats)
+    recorder = JsonlWriter(args.record) if getattr(args, "record", None) else None
+
+    if args.command == "replay":
+        guilds, configs, events = read_recording(args.recording)
+        if not guilds:
+            print("[Harness] The recording has no world lines; record with bench/recorder.py.", file=sys.stderr)
+            return 1
+        await start_world(bot, guilds, args.cogs)
+        for config in configs:
+            apply_config(bot, config["cog"], config["guild_id"], config["values"])
+    else:
+        world = SyntheticWorld(args.members, args.seed)
+        await start_world(bot, [world.payload], args.cogs)
+        if recorder:
+            recorder.world(world.payload)
+        for cog_name, values in world.configs().items():
+            apply_config(bot, cog_name, world.guild_id, values)
+            if recorder:
+                recorder.config(cog_name, world.guild_id, values)
+        generator = Generator(bot, rest, world, stats, recorder)
+        if "casino" in args.mix:
+            generator.create_casino(args.casino_size)
+            await drain(stats, rest, settle=0.1)
+
+    # Only the run itself is measured; stdout goes to memory so the cogs' prints are not counted as disk writes
+    baseline_rest = rest.total
+    rest.calls.clear()
+    rest.total = rest.rate_limited = 0
+    rest.rate_limit_wait = 0.0
+    stats.latencies.clear()
+    stats.events.clear()
+    logs = io.StringIO()
+    if recorder:
+        recorder.file.flush()
+        recorded_before = recorder.bytes
+    wchar_before, size_before = _bytes_written(), _dir_size("data")
+    start = time.monotonic()
+    with contextlib.redirect_stdout(logs):
+        if args.command == "replay":
+            await replay_events(bot, events, stats, args.speed)
+        else:
+            await generator.run(args.mix, args.rate, args.duration)
+        # Throughput counts until the last handler finished, not the idle settle time after it
+        elapsed = await drain(stats, rest) - start
+        if recorder:
+            recorder.close()
+        await shutdown(bot)
+    wchar_after = _bytes_written()
+    if wchar_before is not None and wchar_after is not None:
+        disk_bytes = wchar_after - wchar_before - (recorder.bytes - recorded_before if recorder else 0)
+    else:
+        disk_bytes = max(0, _dir_size("data") - size_before)
+    if args.verbose:
+        sys.stdout.write(logs.getvalue())
+    report(stats, rest, elapsed, disk_bytes)
+    if baseline_rest:
+        print(f"(setup made {baseline_rest} REST calls, not counted)")
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m bench.harness", description=__doc__.splitlines()[0])
+    parser.add_argument("--cogs", type=lambda s: s.split(","), default=list(DEFAULT_COGS),
+                        help="Comma-separated extensions to load")
+    parser.add_argument("--rest-latency", type=float, default=0.0, help="Simulated seconds per REST call")
+    parser.add_argument("--rate-limit", type=_parse_rate_limit, default=(5, 5.0),
+                        help="Calls/seconds per route bucket, e.g. 5/5 (0 = off)")
+    parser.add_argument("--data-dir", help="Copy this data directory into the sandbox before starting")
+    parser.add_argument("--backend", choices=("sqlite", "json"), help="Storage backend (default: STORAGE_BACKEND)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Print the cogs' output after the report")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="Generate synthetic traffic")
+    run.add_argument("--members", type=int, default=1000)
+    run.add_argument("--rate", type=float, default=100.0, help="Events per second")
+    run.add_argument("--duration", type=float, default=10.0, help="Seconds of traffic")
+    run.add_argument("--mix", type=_parse_mix, default=_parse_mix(DEFAULT_MIX),
+                     help=f"Scenario weights (default: {DEFAULT_MIX})")
+    run.add_argument("--casino-size", type=int, default=100)
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--record", help="Also write the generated events to this JSONL file")
+
+    replay = sub.add_parser("replay", help="Replay a recorded event stream")
+    replay.add_argument("recording")
+    replay.add_argument("--speed", type=float, default=1.0, help="Time acceleration (0 = as fast as possible)")
+
+    args = parser.parse_args(argv)
+    if getattr(args, "record", None):
+        args.record = os.path.abspath(args.record)
+    if args.command == "replay":
+        args.recording = os.path.abspath(args.recording)
+    if args.backend:
+        os.environ["STORAGE_BACKEND"] = args.backend
+
+    # The store writes to ./data: every run gets its own sandbox
+    with tempfile.TemporaryDirectory(prefix="bot-harness-") as sandbox:
+        if args.data_dir:
+            shutil.copytree(args.data_dir, os.path.join(sandbox, "data"))
+        else:
+            os.makedirs(os.path.join(sandbox, "data"))
+        sys.path.insert(0, os.getcwd())
+        cwd = os.getcwd()
+        os.chdir(sandbox)
+        try:
+            return asyncio.run(_run(args))
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
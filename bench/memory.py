@@ -0,0 +1,191 @@
+"""Memory held by the gateway caches, Intents.all() against the intents profile of the cogs.
+
+    python -m bench.memory --members 100000 --online 0.2 --voice 200 --messages 5000
+
+Each profile gets a fresh offline bot fed what Discord would send it for one large guild:
+GUILD_CREATE (online members and their presences with the presences intent, otherwise only
+the members in voice), the full member list in GUILD_MEMBERS_CHUNK events when the guild is
+chunked (or over REST when the kick task indexes it), presence updates when they are subscribed to, and a stream
+of messages. The memory still allocated afterwards is measured with tracemalloc.
+"""
+import argparse
+import asyncio
+import gc
+import random
+import sys
+import tracemalloc
+from typing import Any, Dict, Iterator, List, Optional
+
+from bench import fakes
+from bench.harness import BOT_ID, DEFAULT_COGS, create_offline_bot
+from utils.intents import PREFIX_COMMANDS, ensure_chunked, gateway_profile
+from utils.member_index import GATEWAY_PROFILE as UNASSIGNED_INDEX_PROFILE, UnassignedMemberIndex
+
+CHUNK_SIZE = 1000
+STATUSES = ("online", "idle", "dnd")
+
+
+class LargeGuild:
+    """Payloads of one large guild, generated on demand so they are allocated (and freed) while measuring."""
+
+    def __init__(self, members: int, online: float, voice: int, seed: int):
+        self.random = random.Random(seed)
+        self.guild_id = fakes.snowflake()
+        self.text_id = fakes.snowflake()
+        self.voice_id = fakes.snowflake()
+        self.size = members
+        self.first_id = fakes.snowflake()
+        self.online = set(self.random.sample(range(members), int(members * online)))
+        self.in_voice = self.random.sample(range(members), min(voice, members))
+
+    def member(self, index: int) -> Dict[str, Any]:
+        return fakes.member_payload(self.first_id + index, f"member{index}")
+
+    def presence(self, index: int) -> Dict[str, Any]:
+        status = STATUSES[index % len(STATUSES)]
+        activities = [{"name": "a game", "type": 0, "created_at": 0}] if index % 2 else []
+        return {"user": {"id": str(self.first_id + index)}, "guild_id": str(self.guild_id), "status": status,
+                "activities": activities, "client_status": {"desktop": status}}
+
+    def guild_create(self, presences: bool) -> Dict[str, Any]:
+        # Large guilds only come with their online members when presences are subscribed to,
+        # otherwise with the members in voice (and the bot itself)
+        listed = sorted(self.online) if presences else self.in_voice
+        members = [self.member(i) for i in listed]
+        members.append(fakes.member_payload(BOT_ID, "bench-bot", bot=True))
+        payload = fakes.guild_payload(
+            self.guild_id, "Large guild",
+            channels=[fakes.channel_payload(self.text_id, self.guild_id, "general"),
+                      fakes.channel_payload(self.voice_id, self.guild_id, "voice", 2, 1)],
+            roles=[fakes.role_payload(self.guild_id, "@everyone")],
+            members=members,
+            voice_states=[fakes.voice_state_payload(self.guild_id, self.voice_id, self.member(i))
+                          for i in self.in_voice]
+        )
+        payload["member_count"] = self.size + 1
+        payload["large"] = True
+        if presences:
+            payload["presences"] = [self.presence(i) for i in listed]
+        return payload
+
+    def chunks(self, nonce: str, presences: bool) -> Iterator[Dict[str, Any]]:
+        count = -(-self.size // CHUNK_SIZE)
+        for index in range(count):
+            indexes = range(index * CHUNK_SIZE, min(self.size, (index + 1) * CHUNK_SIZE))
+            chunk = {"guild_id": str(self.guild_id), "members": [self.member(i) for i in indexes],
+                     "chunk_index": index, "chunk_count": count, "nonce": nonce}
+            if presences:
+                chunk["presences"] = [self.presence(i) for i in indexes if i in self.online]
+            yield chunk
+
+    def members_page(self, after: Optional[int], limit: int) -> List[Dict[str, Any]]:
+        # GET /guilds/{guild.id}/members: members by ascending ID, after the given one
+        start = 0 if not after else max(0, after - self.first_id + 1)
+        return [self.member(i) for i in range(start, min(self.size, start + limit))]
+
+    def message(self) -> Dict[str, Any]:
+        member = self.member(self.random.randrange(self.size))
+        return fakes.message_payload(fakes.snowflake(), self.text_id, member["user"], "lorem ipsum dolor",
+                                     guild_id=self.guild_id, member=member)
+
+
+async def measure(name: str, bot_options: Optional[Dict[str, Any]], world: LargeGuild, messages: int,
+                  presence_updates: int, members: Optional[str]) -> Dict[str, Any]:
+    """`members`: "chunk" caches the member list, "index" feeds it to the kick task's index only."""
+    bot, _ = await create_offline_bot(0.0, (0, 0.0), bot_options)
+    state = bot._connection
+    intents = bot.intents
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+
+    def send_chunks(nonce: str, presences: bool):
+        for data in world.chunks(nonce, presences):
+            state.parsers["GUILD_MEMBERS_CHUNK"](data)
+
+    async def request_chunks(guild_id, query="", limit=0, presences=False, *, nonce=None):
+        # Stands in for the websocket: the gateway answers on a later loop iteration
+        asyncio.get_running_loop().call_soon(send_chunks, nonce, presences)
+    state.chunker = request_chunks
+
+    async def get_members(guild_id, limit, after):
+        return world.members_page(after, limit)
+    bot.http.get_members = get_members
+
+    state.parsers["GUILD_CREATE"](world.guild_create(intents.presences))
+    guild = bot.get_guild(world.guild_id)
+    index = UnassignedMemberIndex()
+    if members == "chunk":
+        # Joins the request discord.py made from GUILD_CREATE if it chunks at startup
+        await ensure_chunked(guild)
+    elif members == "index":
+        await index.index_guild(guild)
+    if intents.presences:
+        for _ in range(presence_updates):
+            state.parsers["PRESENCE_UPDATE"](world.presence(world.random.randrange(world.size)))
+    for _ in range(messages):
+        state.parsers["MESSAGE_CREATE"](world.message())
+    await asyncio.sleep(0)
+
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    result = {
+        "profile": name,
+        "intents": intents.value,
+        "members": len(guild.members),
+        "indexed": len(index),
+        "presences": sum(1 for m in guild.members if m.raw_status != "offline"),
+        "messages": len(bot.cached_messages),
+        "bytes": retained,
+    }
+    await bot.close()
+    return result
+
+
+def report(results: List[Dict[str, Any]]):
+    baseline = results[0]["bytes"] or 1
+    print(f"{'profile':<28} {'members':>9} {'indexed':>8} {'presences':>10} {'messages':>9} {'MiB':>9} {'vs all':>7}")
+    for row in results:
+        print(f"{row['profile']:<28} {row['members']:>9} {row['indexed']:>8} {row['presences']:>10} "
+              f"{row['messages']:>9} {row['bytes'] / 2**20:>9.1f} {row['bytes'] / baseline:>6.0%}")
+
+
+async def _run(args) -> int:
+    profile = gateway_profile(args.cogs, PREFIX_COMMANDS, UNASSIGNED_INDEX_PROFILE)
+    print(f"[Memory] Profile of {', '.join(args.cogs)}: {profile.describe()}")
+    print(f"[Memory] Guild of {args.members} members, {args.online:.0%} online, {args.voice} in voice, "
+          f"{args.messages} messages")
+    options = profile.bot_options()
+    runs = [
+        # discord.py chunks every guild at startup when the members intent is on
+        ("Intents.all()", None, "chunk"),
+        ("profile", options, "chunk" if profile.chunk_at_startup else None),
+        # Once the kick task indexed the guild (no member in it has a role: the index's worst case)
+        ("profile, kick index", options, "index"),
+        # What /list-id leaves behind once it chunked the guild
+        ("profile, guild chunked", options, "chunk"),
+    ]
+    results = []
+    for name, bot_options, members in runs:
+        world = LargeGuild(args.members, args.online, args.voice, args.seed)
+        results.append(await measure(name, bot_options, world, args.messages, args.presence_updates, members))
+    report(results)
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m bench.memory", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--cogs", type=lambda s: s.split(","), default=list(DEFAULT_COGS) + ["cogs.member_id"],
+                        help="Extensions whose declared profiles are combined")
+    parser.add_argument("--members", type=int, default=100000)
+    parser.add_argument("--online", type=float, default=0.2, help="Share of members online")
+    parser.add_argument("--voice", type=int, default=200, help="Members in voice channels")
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--presence-updates", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    return asyncio.run(_run(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""Records the live gateway stream to JSONL for offline replay (python -m bench.harness replay).
+
+Loaded by bot.py as an extension when GATEWAY_RECORD_FILE is set. The file holds one
+{"world": guild} line per guild at startup and one {"ts", "t", "d"} line per event.
+
+Recordings contain message contents and member names: treat them like a database dump.
+To replay against the same configuration, pass a copy of the bot's data directory with --data-dir.
+Lines are buffered on the event loop and written to the file from a thread once per second.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from typing import List
+
+from discord.ext import commands, tasks
+
+from bench.fakes import guild_from_cache
+
+RECORDED_EVENTS = ("MESSAGE_CREATE", "VOICE_STATE_UPDATE", "GUILD_MEMBER_ADD", "GUILD_MEMBER_REMOVE",
+                   "GUILD_MEMBER_UPDATE", "INTERACTION_CREATE", "CHANNEL_CREATE", "CHANNEL_DELETE")
+FLUSH_INTERVAL_SECONDS = 1.0
+
+
+class GatewayRecorder(commands.Cog):
+    def __init__(self, bot: commands.Bot, path: str):
+        self.bot = bot
+        self.path = path
+        self.file = open(path, "a", encoding="utf-8")
+        # Encoded lines waiting for the next flush; the file is only touched under _file_lock
+        self._buffer: List[str] = []
+        self._file_lock = threading.Lock()
+        self.start = 0.0
+        self.count = 0
+        # Events are only written after the world lines (the first on_ready)
+        self.recording = False
+        self._originals = {}
+
+    async def cog_load(self):
+        # The gateway looks parsers up in this dict for every event, so wrapping them here sees
+        # exactly the payloads discord.py parses, before any listener runs
+        parsers = self.bot._connection.parsers
+        for event in RECORDED_EVENTS:
+            original = parsers.get(event)
+            if original is not None:
+                self._originals[event] = original
+                parsers[event] = self._wrap(event, original)
+        self.flush_loop.start()
+        # Usually loaded from setup_hook, before the connection: the world is written on the first on_ready
+        if self.bot.is_ready():
+            self._start_recording()
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        if not self.recording:
+            self._start_recording()
+
+    def _start_recording(self):
+        for guild in self.bot.guilds:
+            self._write({"world": guild_from_cache(guild)})
+        self.start = time.monotonic()
+        self.recording = True
+        print(f"Recorder: Writing gateway events to {self.path}")
+
+    async def cog_unload(self):
+        self.bot._connection.parsers.update(self._originals)
+        self.flush_loop.cancel()
+        await asyncio.to_thread(self._write_lines, self._take_buffer(), True)
+        print(f"Recorder: Stopped after {self.count} events.")
+
+    def _write(self, entry):
+        # Encoded now: discord.py keeps using the payload after the parser returns
+        self._buffer.append(json.dumps(entry, separators=(",", ":")) + "\n")
+
+    def _take_buffer(self) -> List[str]:
+        lines, self._buffer = self._buffer, []
+        return lines
+
+    def _write_lines(self, lines: List[str], close: bool = False):
+        with self._file_lock:
+            if lines:
+                self.file.write("".join(lines))
+                self.file.flush()
+            if close:
+                self.file.close()
+
+    @tasks.loop(seconds=FLUSH_INTERVAL_SECONDS)
+    async def flush_loop(self):
+        if self._buffer:
+            await asyncio.to_thread(self._write_lines, self._take_buffer())
+
+    def _wrap(self, event: str, parser):
+        def record(data):
+            if not self.recording:
+                return parser(data)
+            try:
+                self._write({"ts": round(time.monotonic() - self.start, 4), "t": event, "d": data})
+                self.count += 1
+            except Exception as e:
+                print(f"Recorder: Could not record {event}: {e}")
+            return parser(data)
+        return record
+
+
+#   ---- Setup function ----
+async def setup(bot: commands.Bot):
+    await bot.add_cog(GatewayRecorder(bot, os.environ["GATEWAY_RECORD_FILE"]))
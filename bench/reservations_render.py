@@ -0,0 +1,61 @@
+"""Cost of a Casino submit and of the compact free-number render as events grow.
+
+    python -m bench.reservations_render --sizes 100,1000,5000 --events 1,10,100
+
+For every event size and number of concurrent events, half as many submits as there are
+numbers take a random number under the event lock (like cogs/lucky_events.py), then the free
+numbers of every event are rendered with format_ranges. Prints the mean cost of each in µs.
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+from typing import List, Optional, Tuple
+
+from utils.reservations import ReservationEngine, format_ranges
+
+
+async def measure(size: int, events: int, submits: int, rng: random.Random) -> Tuple[float, float]:
+    engine = ReservationEngine()
+    for event_id in range(events):
+        engine.open(event_id, size)
+
+    async def submit(user_id: int):
+        event = engine.get(rng.randrange(events))
+        async with event.lock:
+            event.take(rng.randint(1, size), user_id)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(submit(user_id) for user_id in range(1, submits + 1)))
+    submit_cost = (time.perf_counter() - start) / submits
+
+    start = time.perf_counter()
+    for event in engine.events.values():
+        format_ranges(event.free_ranges())
+    render_cost = (time.perf_counter() - start) / events
+    return submit_cost, render_cost
+
+
+def _ints(value: str) -> List[int]:
+    return [int(part) for part in value.split(",") if part]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m bench.reservations_render", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=_ints, default=[100, 1000, 5000], help="Event sizes, comma-separated")
+    parser.add_argument("--events", type=_ints, default=[1, 10, 100], help="Concurrent events, comma-separated")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    print(f"{'size':>6} {'events':>6} {'submit (us)':>12} {'render (us)':>12}")
+    for size in args.sizes:
+        for events in args.events:
+            submit_cost, render_cost = asyncio.run(measure(size, events, max(1, size * events // 2), rng))
+            print(f"{size:>6} {events:>6} {submit_cost * 1e6:>12.1f} {render_cost * 1e6:>12.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
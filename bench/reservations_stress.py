@@ -0,0 +1,160 @@
+"""Stress test of the Casino reservations: hundreds of concurrent submits on one event.
+
+    python -m bench.reservations_stress --submits 500 --size 200 --rounds 20
+
+Every submit follows the cog's flow (cogs/lucky_events.py): hold or take the number under the
+event lock, await the validation message, re-key the hold, then the staff approves or rejects
+it while an expiry task releases holds whose deadline passed. Random awaits between the steps
+interleave the submits. After each round the test checks that no number was granted twice and
+that free, held and taken numbers add up to the event size. Exits with 1 on the first violation.
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from utils.reservations import EventReservations, ReservationEngine
+
+EVENT_ID = 1
+
+
+class Round:
+    def __init__(self, size: int, seed: int, validation: float, ttl: float):
+        self.random = random.Random(seed)
+        self.engine = ReservationEngine()
+        self.event: EventReservations = self.engine.open(EVENT_ID, size)
+        self.size = size
+        self.validation = validation
+        self.ttl = ttl
+        # Validation message IDs, distinct from the user IDs used as initial tokens
+        self.tokens = iter(range(1 << 32, 1 << 33))
+        # number -> user_id of every successful take/commit
+        self.granted: Dict[int, int] = {}
+        self.double_grants: List[Tuple[int, int, int]] = []
+        # token -> outcome of every successful hold
+        self.holds: Dict[int, str] = {}
+        self.counts: Counter = Counter()
+
+    def _grant(self, number: int, user_id: int):
+        if number in self.granted:
+            self.double_grants.append((number, self.granted[number], user_id))
+        self.granted[number] = user_id
+
+    async def _pause(self):
+        await asyncio.sleep(self.random.random() * 0.002)
+
+    async def submit(self, user_id: int):
+        number = self.random.randint(1, self.size)
+        await self._pause()
+        if self.random.random() >= self.validation:
+            async with self.event.lock:
+                taken = self.event.take(number, user_id)
+            if taken:
+                self._grant(number, user_id)
+            self.counts["taken" if taken else "refused"] += 1
+            return
+
+        # Like the cog, the hold is keyed by the submit (its interaction) until the validation message exists
+        async with self.event.lock:
+            held = self.engine.hold(EVENT_ID, number, user_id, time.time() + self.ttl)
+        if not held:
+            self.counts["refused"] += 1
+            return
+
+        # Sending the validation message can fail, which releases the hold
+        await self._pause()
+        if self.random.random() < 0.05:
+            self.event.release(number, user_id)
+            self.counts["send failed"] += 1
+            return
+        token = next(self.tokens)
+        if not self.engine.set_token(EVENT_ID, number, token, user_id):
+            self.counts["expired while sending"] += 1
+            return
+        self.holds[token] = "held"
+
+        # Staff decision
+        await self._pause()
+        if self.random.random() < 0.7:
+            async with self.event.lock:
+                committed = self.event.commit(number, user_id, token)
+            if committed:
+                self._grant(number, user_id)
+                self.holds[token] = "committed"
+            self.counts["approved" if committed else "approve too late"] += 1
+        else:
+            async with self.event.lock:
+                released = self.event.release(number, token)
+            if released:
+                self.holds[token] = "rejected"
+            self.counts["rejected" if released else "reject too late"] += 1
+
+    async def expire(self, stop: asyncio.Event):
+        while not stop.is_set():
+            for _, _, token in self.engine.pop_expired(time.time()):
+                if token in self.holds:
+                    self.holds[token] = "expired"
+                self.counts["expired"] += 1
+            await asyncio.sleep(0.0005)
+
+    async def run(self, submits: int):
+        stop = asyncio.Event()
+        expirer = asyncio.create_task(self.expire(stop))
+        await asyncio.gather(*(self.submit(user_id) for user_id in range(1, submits + 1)))
+        stop.set()
+        await expirer
+
+    def check(self) -> Optional[str]:
+        event = self.event
+        if self.double_grants:
+            return f"numbers granted twice (number, first user, second user): {self.double_grants[:5]}"
+        assignments = dict(event.assignments())
+        if assignments != self.granted:
+            return f"assignments {len(assignments)} differ from the grants {len(self.granted)}"
+        if event.taken_count != len(assignments):
+            return f"taken_count {event.taken_count} != {len(assignments)} assignments"
+
+        states = Counter()
+        for number in range(1, self.size + 1):
+            state = [event.is_free(number), event.is_held(number), event.is_taken(number)]
+            if sum(state) != 1:
+                return f"number {number} is free={state[0]} held={state[1]} taken={state[2]}"
+            states["free" if state[0] else "held" if state[1] else "taken"] += 1
+        if states["free"] + states["held"] + states["taken"] != self.size:
+            return f"free + held + taken != {self.size}: {dict(states)}"
+
+        still_held = sum(1 for outcome in self.holds.values() if outcome == "held")
+        if still_held != states["held"]:
+            return f"{states['held']} numbers held, but {still_held} holds were never resolved"
+        return None
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m bench.reservations_stress", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--submits", type=int, default=500, help="Concurrent submits per round")
+    parser.add_argument("--size", type=int, default=200, help="Event size (smaller = more collisions)")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--validation", type=float, default=0.8, help="Share of submits that go through staff validation")
+    parser.add_argument("--ttl", type=float, default=0.004, help="Hold lifetime in seconds (short, so holds expire mid-round)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    totals: Counter = Counter()
+    for index in range(args.rounds):
+        test = Round(args.size, args.seed + index, args.validation, args.ttl)
+        asyncio.run(test.run(args.submits))
+        totals.update(test.counts)
+        error = test.check()
+        if error:
+            print(f"[Stress] Round {index} (seed {args.seed + index}) FAILED: {error}")
+            return 1
+    print(f"[Stress] {args.rounds} rounds of {args.submits} concurrent submits on {args.size} numbers: OK")
+    print("  " + " | ".join(f"{name} {count}" for name, count in sorted(totals.items())))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,18 +3,40 @@ import discord
 from discord.ext import commands, tasks
 from dotenv import load_dotenv
 from datetime import datetime, timedelta, timezone
-import asyncio
+import time
+from utils.monitoring import LoopLagMonitor
+from utils.member_index import UnassignedMemberIndex, GATEWAY_PROFILE as UNASSIGNED_INDEX_PROFILE
+from utils.kick_executor import KickExecutor
+from utils.metrics import REGISTRY, instrument_bot, timed_task
+from utils.sharding import ShardPlan, shard_is_connected
+from utils.intents import PREFIX_COMMANDS, gateway_profile
+from utils.extensions import load_extensions, sync_command_tree, timing_report
 
 #   ---- Global log list ----
 WEB_LOGS = []
 MAX_LOGS = 200
 
-#   ---- Configure Intents ----
-intents = discord.Intents.all()
-bot = commands.Bot(command_prefix='/', intents=intents)
+# The shard settings come from the '.env' file, so it is read before the bot is created
+load_dotenv()
+
+#   ---- Configure Intents and shards ----
+# Only what the cogs and the kick task declare (see utils/intents.py); GATEWAY_INTENTS = all enables everything
+EXTENSIONS = ("cogs.leveling", "cogs.tempvoice", "cogs.moderation", "cogs.member_id")
+gateway = gateway_profile(EXTENSIONS, PREFIX_COMMANDS, UNASSIGNED_INDEX_PROFILE)
+# SHARD_COUNT / SHARD_IDS switch to an AutoShardedBot (see utils/sharding.py)
+shard_plan = ShardPlan.from_env()
+shard_error = shard_plan.validate()
+if shard_error:
+    print(f"Fatal Error: {shard_error}")
+    exit()
+bot = shard_plan.create_bot(command_prefix='/', **gateway.bot_options())
+bot.loop_monitor = LoopLagMonitor()
+unassigned_members = UnassignedMemberIndex()
+instrument_bot(bot)
+REGISTRY.gauge("bot_unassigned_members", "Members without roles waiting for the 48h kick",
+               callback=lambda: len(unassigned_members))
 
 #   ---- Load the token ----
-load_dotenv()
 Token = os.getenv('BOT_TOKEN')
 
 if Token is None:
@@ -31,51 +53,63 @@ if bot.owner_id is None:
 #   ---- Definition of the time for the kick ----
 Kick_Timeout = timedelta(hours=48)
 Current_Timezone = timezone.utc
+Kick_Interval_Minutes = int(os.getenv('KICK_INTERVAL_MINUTES', 60))
+Kick_Dry_Run = os.getenv('KICK_DRY_RUN', 'false').lower() in ('1', 'true', 'yes')
+# Members whose list may be requested per run to index new guilds (at least one guild per run)
+Kick_Index_Members_Per_Run = int(os.getenv('KICK_INDEX_MEMBERS_PER_RUN', 200000))
+kick_executor = KickExecutor(
+    per_guild_concurrency=int(os.getenv('KICK_GUILD_CONCURRENCY', 2)),
+    dry_run=Kick_Dry_Run
+)
 
-#   ---- Fuction for loading Cogs ----
-async def load_extensions():
-    # Checks for levels.json in the data/ directory
+#   ---- Startup: runs once per process, before connecting ----
+async def setup_hook():
+    # Makes sure the data/ directory exists
     if not os.path.exists('data'):
         os.makedirs('data')
-        
-    try:
 
-        await bot.load_extension("cogs.leveling")        
-        print("COG: Leveling loaded successfully.")
+    extensions = list(EXTENSIONS)
+    # Gateway recording for offline replay (python -m bench.harness replay)
+    if os.getenv('GATEWAY_RECORD_FILE'):
+        extensions.append("bench.recorder")
 
-        await bot.load_extension("cogs.tempvoice")        
-        print("COG: TempVoice loaded successfully.")
-        
-        await bot.load_extension("cogs.moderation")     
-        print("COG: Moderation loaded successfully.")
-        
-        await bot.load_extension("cogs.member_id")
-        print("COG: Member ID Lister loaded successfully.")
+    # The cogs don't depend on each other, so they are loaded concurrently
+    start = time.perf_counter()
+    timings = await load_extensions(bot, extensions)
+    print(timing_report(timings, time.perf_counter() - start))
+    print("--------------")
 
-        print("--------------")
+    # Global syncs are heavily rate limited: only sync when the commands changed
+    try:
+        synced = await sync_command_tree(bot)
+        print("Slash commands unchanged, not synced." if synced is None else f"{synced} slash commands synced globally")
     except Exception as e:
-        print(f"Error while loading the cogs\n{e}")
+        print(f"Error while syncing the slash commands\n{e}")
+    print("--------------")
+
+bot.setup_hook = setup_hook
 
 #   ---- Event listener ----
+# Fires again after every reconnect that could not resume: only (re)start what is not running
 @bot.event
 async def on_ready():
-    await load_extensions()
-    print(f'Bot is logged in as {bot.user.name}')
+    print(f'Bot is logged in as {bot.user.name} ({shard_plan.describe()}, {len(bot.guilds)} guilds)')
+    print(f"Gateway: {gateway.describe()}")
     print("--------------")
-    
-    print("Extensions loaded")
+
+    # Built from the members cached so far (no REST calls); the kick task requests each guild's member list once
+    for guild in bot.guilds:
+        unassigned_members.rebuild_guild(guild)
+    print(f"Indexed {len(unassigned_members)} members without roles.")
     print("--------------")
     
     if not check_unassigned_roles.is_running():
         check_unassigned_roles.start()
+
+    bot.loop_monitor.start()
     
     print("Background task started.")
     print("--------------")
-
-    await asyncio.sleep(2)
-    await bot.tree.sync()
-    print("slash command synced globally")
-    print("--------------")
  
 
 #   ---- Event listener for commands errors ----
@@ -88,11 +122,11 @@ async def on_command_error(ctx: commands.Context, error: commands.CommandError):
         if isinstance(error, commands.NotOwner):
             # Sends message to the user
             await ctx.send(
-                "❌ **Access denied!** Only the bot owner can execute **/sync**. ",
+                f"❌ **Access denied!** Only the bot owner can execute **/{ctx.command.qualified_name}**. ",
                 ephemeral=True
             )
             # Logs the attempt for admin
-            print(f"{ctx.author.name} ({ctx.author.id}) tried to use /sync without being the owner.")
+            print(f"{ctx.author.name} ({ctx.author.id}) tried to use /{ctx.command.qualified_name} without being the owner.")
         
         # Can add other CheckFailure errors here
         else:
@@ -106,8 +140,32 @@ async def on_command_error(ctx: commands.Context, error: commands.CommandError):
     else:
         print(f"❌ Error not handle: {error}")
 
+#   ---- Event listeners for the unassigned members index ----
+@bot.event
+async def on_guild_join(guild: discord.Guild):
+    unassigned_members.rebuild_guild(guild)
+
+@bot.event
+async def on_guild_remove(guild: discord.Guild):
+    unassigned_members.remove_guild(guild.id)
+
+@bot.event
+async def on_member_join(member: discord.Member):
+    unassigned_members.update(member)
+
+@bot.event
+async def on_member_update(before: discord.Member, after: discord.Member):
+    if before.roles != after.roles:
+        unassigned_members.update(after)
+
+@bot.event
+async def on_raw_member_remove(payload: discord.RawMemberRemoveEvent):
+    # Raw: indexed members are not necessarily cached
+    unassigned_members.discard(payload.guild_id, payload.user.id)
+
 #   ---- Background task ----
-@tasks.loop(minutes=60)
+@tasks.loop(minutes=Kick_Interval_Minutes)
+@timed_task("check_unassigned_roles")
 async def check_unassigned_roles():
     time_limit = datetime.now(Current_Timezone) - Kick_Timeout
     
@@ -117,6 +175,8 @@ async def check_unassigned_roles():
         print("Warnign: COG 'leveling' not found. Unable to read backgroundT_status.")
         return
 
+    batches = {}
+    index_budget = Kick_Index_Members_Per_Run
     for guild in bot.guilds:
         guild_id = str(guild.id)
         
@@ -127,29 +187,57 @@ async def check_unassigned_roles():
         if not guild_config.get("backgroundT_status", True): 
             print(f"Background task (kick) for the guild **{guild.name}** is unactive from server config.")
             continue
-                    
+
+        # Each process only sees the guilds of its own shards; a reconnecting shard's cache may be stale
+        if not shard_is_connected(bot, guild):
+            print(f"Background task (kick): shard {guild.shard_id} of '{guild.name}' is not connected, skipped.")
+            continue
+
         bot_member = guild.get_member(bot.user.id)
         
         if not bot_member or not bot_member.guild_permissions.kick_members:
             print(f"Bot can't kick '{guild.name}' (missing permission to kick).")
             continue
+
+        # Members who joined before the bot connected are only found in the guild's member list:
+        # it is requested once per start, without caching it, and large guilds are spread over several runs
+        if not unassigned_members.is_complete(guild.id):
+            if index_budget <= 0:
+                print(f"Background task (kick): '{guild.name}' will be indexed on a later run.")
+                continue
+            index_budget -= guild.member_count or 0
+            await unassigned_members.index_guild(guild)
         
-        async for member in guild.fetch_members(limit=None):
-            if member.bot or member == guild.owner or member == bot_member:
+        # Only members whose 48h deadline has passed are popped from the index
+        members = []
+        for member_id in unassigned_members.pop_expired(guild.id, time_limit.timestamp()):
+            if member_id == guild.owner_id or member_id == bot_member.id:
                 continue
-            
-            # Checks if has other role than @everyone
-            has_only_everyone_role = len(member.roles) <= 1
-            
-            # Checks if the 48hrs have passed
-            if has_only_everyone_role and member.joined_at < time_limit:
+            member = guild.get_member(member_id)
+            if member is None:
+                # Indexed from the member list, which is not cached
                 try:
-                    # Tries kick
-                    print(f"Kicking {member.name} ({member.id}) from server '{guild.name}'")
-                    await member.kick(reason="Automatic: No roles after 48h (Background task)") 
-                except discord.Forbidden:
-                    print(f"Error: I can't kick {member.name} from the server '{guild.name}'")
-                except Exception as e:
-                    print(f"Error while kicking {member.name}: {e}")                    
+                    member = await guild.fetch_member(member_id)
+                except discord.NotFound:
+                    continue
+                except discord.HTTPException as e:
+                    print(f"Background task (kick): can't fetch member {member_id} of '{guild.name}': {e}")
+                    continue
+            
+            # Re-checks the cached member in case an event was missed
+            if unassigned_members.is_candidate(member):
+                members.append(member)
+        batches[guild] = members
+
+    if not any(batches.values()):
+        return
+
+    # 4. Kicks concurrently across guilds
+    summary = await kick_executor.run(batches, reason="Automatic: No roles after 48h (Background task)")
+    # Keeps the members that were not kicked (or dry run) indexed so the next run retries
+    for member in summary.retry:
+        unassigned_members.add(member)
+    print(f"Background task (kick): {summary}")
+
 #   ---- Run ----
 bot.run(Token)
@@ -1,89 +1,295 @@
 import discord
 from discord import app_commands
-from discord.ext import commands
-from typing import Dict, Any, Optional
-import json
-import os
+from discord.ext import commands, tasks
+from typing import Dict, Any, List, Optional, Set, Tuple
+from bisect import bisect_right
+import random
+import time
+from utils.storage import get_store
+from utils.ranking import GuildRanking
+from utils.guild_config import get_guild_configs
+from utils.metrics import LEVEL_WRITES, LEVEL_WRITES_COALESCED, timed_task
+from utils.intents import GatewayProfile
+
+# XP comes from guild messages (their content is not read)
+GATEWAY_PROFILE = GatewayProfile(intents=["guild_messages"])
 
 XP_PER_MESSAGE = 1
 
-LEVEL_THRESHOLDS = {
-    1: 15,
-    2: 100,
-    3: 300,
-    4: 500,
-    5: 1500
-}
-
-MAX_LEVEL = max(LEVEL_THRESHOLDS.keys())
-
-
-def get_level_info(total_xp: int):
-    for level, threshold in LEVEL_THRESHOLDS.items():
-        if total_xp < threshold:
-            return level - 1, threshold - total_xp
-    return MAX_LEVEL, 0
+#   ---- Anti-spam defaults (overridable per guild) ----
+DEFAULT_XP_COOLDOWN = 10
+MAX_XP_COOLDOWN = 3600
+MAX_XP_PER_MESSAGE = 1000
+COOLDOWN_EVICT_MINUTES = 5
+
+LEADERBOARD_PAGE_SIZE = 10
+
+#   ---- Write-behind settings for level data ----
+FLUSH_INTERVAL_SECONDS = 30
+FLUSH_THRESHOLD = 500
+
+#   ---- Level curves ----
+# Total XP needed to reach level 1, 2, 3, ...
+DEFAULT_THRESHOLDS = [15, 100, 300, 500, 1500]
+MAX_CURVE_LEVELS = 1000
+# Keeps every threshold an exact integer in JSON and SQLite (and base * n ^ exponent finite)
+MAX_CURVE_XP = 10 ** 12
+MAX_CURVE_EXPONENT = 10.0
+
+
+class LevelCurve:
+    """Sorted XP thresholds of a guild; levels are looked up with a bisect."""
+    __slots__ = ("thresholds", "max_level")
+
+    def __init__(self, thresholds: List[int]):
+        if not thresholds or len(thresholds) > MAX_CURVE_LEVELS:
+            raise ValueError(f"A level curve must have between 1 and {MAX_CURVE_LEVELS} levels.")
+        if thresholds[0] <= 0 or any(a >= b for a, b in zip(thresholds, thresholds[1:])):
+            raise ValueError("XP thresholds must be positive and strictly increasing.")
+        if thresholds[-1] > MAX_CURVE_XP:
+            raise ValueError(f"XP thresholds can be at most {MAX_CURVE_XP}.")
+        self.thresholds = thresholds
+        self.max_level = len(thresholds)
+
+    @classmethod
+    def from_formula(cls, base: int, exponent: float, levels: int) -> "LevelCurve":
+        """Threshold of level n is base * n ^ exponent."""
+        if not (1 <= levels <= MAX_CURVE_LEVELS):
+            raise ValueError(f"A level curve must have between 1 and {MAX_CURVE_LEVELS} levels.")
+        if not (1 <= base <= MAX_CURVE_XP):
+            raise ValueError(f"The base must be between 1 and {MAX_CURVE_XP}.")
+        # Also rejects nan and inf
+        if not (0 < exponent <= MAX_CURVE_EXPONENT):
+            raise ValueError(f"The exponent must be above 0 and at most {MAX_CURVE_EXPONENT:g}.")
+        return cls([round(base * n ** exponent) for n in range(1, levels + 1)])
+
+    @classmethod
+    def from_config(cls, curve: Optional[Dict[str, Any]]) -> "LevelCurve":
+        if not curve:
+            return cls(DEFAULT_THRESHOLDS)
+        if "formula" in curve:
+            f = curve["formula"]
+            return cls.from_formula(f["base"], f["exponent"], f["levels"])
+        return cls(curve["thresholds"])
+
+    def threshold(self, level: int) -> int:
+        """Total XP needed to reach `level`."""
+        return 0 if level <= 0 else self.thresholds[level - 1]
+
+    def get_level_info(self, total_xp: int) -> Tuple[int, int]:
+        """Returns (level, XP missing to the next level)."""
+        level = bisect_right(self.thresholds, total_xp)
+        if level >= self.max_level:
+            return self.max_level, 0
+        return level, self.thresholds[level] - total_xp
+
+    def describe(self) -> str:
+        return f"{self.max_level} levels, max level at {self.thresholds[-1]} XP"
+
+
+DEFAULT_CURVE = LevelCurve(DEFAULT_THRESHOLDS)
+
+
+class XPCooldown:
+    """Per-guild map of user ID -> time (monotonic) until which the user earns no XP.
+
+    Expired entries are evicted every COOLDOWN_EVICT_MINUTES (evict_cooldowns_loop), so only the
+    users who earned XP within the last cooldown + COOLDOWN_EVICT_MINUTES are ever kept.
+    """
+    __slots__ = ("_until",)
+
+    def __init__(self):
+        self._until: Dict[int, Dict[int, float]] = {}
+
+    def __len__(self) -> int:
+        return sum(len(users) for users in self._until.values())
+
+    def try_acquire(self, guild_id: int, user_id: int, cooldown: float, now: float) -> bool:
+        """Returns True (and starts a new window) if the user can earn XP now."""
+        users = self._until.get(guild_id)
+        if users is None:
+            users = self._until[guild_id] = {}
+        elif users.get(user_id, 0.0) > now:
+            return False
+        users[user_id] = now + cooldown
+        return True
+
+    def evict(self, now: float) -> int:
+        evicted = 0
+        for guild_id in list(self._until):
+            users = self._until[guild_id]
+            expired = [uid for uid, until in users.items() if until <= now]
+            for uid in expired:
+                del users[uid]
+            evicted += len(expired)
+            if not users:
+                del self._until[guild_id]
+        return evicted
+
+    def remove_guild(self, guild_id: int):
+        self._until.pop(guild_id, None)
+
+
+class LeaderboardView(discord.ui.View):
+    def __init__(self, cog: "Leveling", guild: discord.Guild, ranking: GuildRanking, page: int):
+        super().__init__(timeout=180)
+        self.cog = cog
+        self.guild = guild
+        self.ranking = ranking
+        self.page = page
+        self._update_buttons()
+
+    def _page_count(self) -> int:
+        return max(1, -(-len(self.ranking) // LEADERBOARD_PAGE_SIZE))
+
+    def _update_buttons(self):
+        self.previous_page.disabled = self.page <= 0
+        self.next_page.disabled = self.page >= self._page_count() - 1
+
+    async def _show(self, interaction: discord.Interaction):
+        self._update_buttons()
+        embed = self.cog._build_leaderboard_embed(self.guild, self.ranking, self.page)
+        await interaction.response.edit_message(embed=embed, view=self)
+
+    @discord.ui.button(label="Previous", style=discord.ButtonStyle.secondary, emoji="◀️")
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page = max(0, self.page - 1)
+        await self._show(interaction)
+
+    @discord.ui.button(label="Next", style=discord.ButtonStyle.secondary, emoji="▶️")
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page = min(self._page_count() - 1, self.page + 1)
+        await self._show(interaction)
 
 
 class Leveling(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        os.makedirs("data", exist_ok=True)
-        self.level_data = self._load_level_data()
-        self.config_data = self._load_config_data()
-
-    def _load_level_data(self):
-        try:
-            with open("data/levels.json", "r", encoding="utf-8") as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return {}
-
-    def _save_level_data(self):
-        with open("data/levels.json", "w", encoding="utf-8") as f:
-            json.dump(self.level_data, f, indent=4)
-
-    def _load_config_data(self):
-        try:
-            with open("data/config.json", "r", encoding="utf-8") as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return {}
-
-    def _save_config_data(self):
-        with open("data/config.json", "w", encoding="utf-8") as f:
-            json.dump(self.config_data, f, indent=4)
+        self.store = get_store(bot)
+        # Per-guild level data, loaded lazily from the store on first use
+        self.level_data: Dict[str, Dict[str, Dict[str, int]]] = {}
+        self.guild_configs = get_guild_configs(bot, "config", self._default_config)
+        # Level curve per guild, built from the config on first use
+        self._curves: Dict[str, LevelCurve] = {}
+        self.cooldowns = XPCooldown()
+        # XP ranking per guild, built when the guild's level data is first used
+        self.rankings: Dict[str, GuildRanking] = {}
+
+        # Write-behind state: XP changes are kept in memory and flushed in batches
+        self._dirty_levels: Set[Tuple[str, str]] = set()
+        self._pending_updates = 0
+
+    async def cog_load(self):
+        self.flush_level_loop.start()
+        self.evict_cooldowns_loop.start()
+
+    async def cog_unload(self):
+        self.flush_level_loop.cancel()
+        self.evict_cooldowns_loop.cancel()
+        self.flush_level_data()
+
+    @tasks.loop(minutes=COOLDOWN_EVICT_MINUTES)
+    async def evict_cooldowns_loop(self):
+        self.cooldowns.evict(time.monotonic())
+
+    #   ---- Level data ----
+    def get_guild_levels(self, gid: str) -> Dict[str, Dict[str, int]]:
+        """Blocking lookup, for callers that are not on the event loop."""
+        gid = str(gid)
+        if gid not in self.level_data:
+            self.level_data[gid] = self.store.load_levels(gid)
+        return self.level_data[gid]
+
+    async def fetch_guild_levels(self, gid: str) -> Dict[str, Dict[str, int]]:
+        gid = str(gid)
+        if gid not in self.level_data:
+            loaded = await self.store.run(self.store.load_levels, gid)
+            # Another message may have loaded the guild while we were waiting
+            self.level_data.setdefault(gid, loaded)
+        return self.level_data[gid]
+
+    #   ---- Ranking ----
+    def _ranking(self, gid: str, users: Dict[str, Dict[str, int]]) -> GuildRanking:
+        ranking = self.rankings.get(gid)
+        if ranking is None:
+            ranking = self.rankings[gid] = GuildRanking(users)
+        return ranking
+
+    def get_ranking(self, gid: str) -> GuildRanking:
+        """Blocking lookup, for callers that are not on the event loop."""
+        gid = str(gid)
+        return self._ranking(gid, self.get_guild_levels(gid))
+
+    async def fetch_ranking(self, gid: str) -> GuildRanking:
+        gid = str(gid)
+        return self._ranking(gid, await self.fetch_guild_levels(gid))
+
+    #   ---- Write-behind ----
+    def _mark_level_dirty(self, gid: str, uid: str):
+        self._dirty_levels.add((gid, uid))
+        self._pending_updates += 1
+        if len(self._dirty_levels) >= FLUSH_THRESHOLD:
+            self.flush_level_data()
+
+    def flush_level_data(self) -> bool:
+        """Writes pending XP changes to the store. Returns False if there was nothing to write."""
+        if not self._dirty_levels:
+            return False
+        self.store.save_levels(self.level_data, self._dirty_levels)
+        LEVEL_WRITES.inc()
+        LEVEL_WRITES_COALESCED.inc(self._pending_updates - 1)
+        self._dirty_levels.clear()
+        self._pending_updates = 0
+        return True
+
+    @tasks.loop(seconds=FLUSH_INTERVAL_SECONDS)
+    @timed_task("flush_level_data")
+    async def flush_level_loop(self):
+        self.flush_level_data()
+
+    #   ---- Level curves ----
+    def get_level_curve(self, gid: str) -> LevelCurve:
+        gid = str(gid)
+        curve = self._curves.get(gid)
+        if curve is None:
+            config = self.guild_configs.get(gid)
+            try:
+                curve = LevelCurve.from_config(config.get("level_curve"))
+            except (KeyError, TypeError, ValueError, OverflowError) as e:
+                print(f"Leveling Error: invalid level curve for guild {gid} ({e}), using the default one.")
+                curve = DEFAULT_CURVE
+            self._curves[gid] = curve
+        return curve
+
+    def invalidate_level_curve(self, gid: str):
+        self._curves.pop(str(gid), None)
+
+    #   ---- Guild config ----
+    def _default_config(self, guild_id: int) -> Dict[str, Any]:
+        guild = self.bot.get_guild(guild_id)
+        return {
+            "guild_name": guild.name if guild else "Unknown",
+            "level_up_channel_id": None,
+            "level_up_channel_name": None,
+            "invite_link": None,
+            "role_assignments": {"1": None, "2": None, "3": None, "4": None, "5": None},
+            "is_active": True,
+            "backgroundT_status": True
+        }
 
     def get_guild_config(self, guild_id: str):
-        guild_id = str(guild_id)
-        guild = self.bot.get_guild(int(guild_id))
-        if guild_id not in self.config_data:
-            guild_name = guild.name if guild else "Unknown",
-            self.config_data[guild_id] = {
-                "guild_name": guild_name,
-                "level_up_channel_id": None,
-                "level_up_channel_name": None,
-                "invite_link": None,
-                "role_assignments": {"1": None, "2": None, "3": None, "4": None, "5": None},
-                "is_active": True,
-                "backgroundT_status": True
-            }
-            self._save_config_data()
-        return self.config_data[guild_id]
+        return self.guild_configs.get(guild_id)
 
     @commands.Cog.listener()
     async def on_guild_remove(self, guild: discord.Guild):
         gid = str(guild.id)
-        changed = False
-        if gid in self.level_data:
-            del self.level_data[gid]
-            changed = True
-        if gid in self.config_data:
-            del self.config_data[gid]
-            changed = True
-        if changed:
-            self._save_level_data()
-            self._save_config_data()
+        self.level_data.pop(gid, None)
+        self.rankings.pop(gid, None)
+        self._dirty_levels = {key for key in self._dirty_levels if key[0] != gid}
+        self.store.delete_guild_levels(gid)
+        self.invalidate_level_curve(gid)
+        self.cooldowns.remove_guild(guild.id)
+        self.guild_configs.remove(gid)
 
     @commands.Cog.listener()
     async def on_message(self, message: discord.Message):
@@ -97,37 +303,55 @@ class Leveling(commands.Cog):
         if not config.get("is_active", True):
             return
 
-        self.level_data.setdefault(gid, {}).setdefault(uid, {"total_xp": 0, "level": 0})
-        user = self.level_data[gid][uid]
+        # Messages inside the cooldown window earn nothing and touch no level data
+        cooldown = config.get("xp_cooldown", DEFAULT_XP_COOLDOWN)
+        if cooldown > 0 and not self.cooldowns.try_acquire(message.guild.id, message.author.id, cooldown, time.monotonic()):
+            return
+
+        users = await self.fetch_guild_levels(gid)
+        user = users.setdefault(uid, {"total_xp": 0, "level": 0})
 
+        curve = self.get_level_curve(gid)
         old_level = user["level"]
-        if old_level < MAX_LEVEL:
-            user["total_xp"] += XP_PER_MESSAGE
-
-        new_level, _ = get_level_info(user["total_xp"])
-        if new_level > old_level:
+        if old_level < curve.max_level:
+            xp_min = config.get("xp_min", XP_PER_MESSAGE)
+            xp_max = config.get("xp_max", XP_PER_MESSAGE)
+            user["total_xp"] += xp_min if xp_min >= xp_max else random.randint(xp_min, xp_max)
+            self._mark_level_dirty(gid, uid)
+            self._ranking(gid, users).update(message.author.id, user["total_xp"])
+
+        new_level, _ = curve.get_level_info(user["total_xp"])
+        if new_level < old_level:
+            # The guild switched to a steeper curve
+            user["level"] = new_level
+            self._mark_level_dirty(gid, uid)
+        elif new_level > old_level:
             user["level"] = new_level
-            self._save_level_data()
+            # Level-ups are never left in memory only
+            self.flush_level_data()
 
             channel = message.guild.get_channel(config["level_up_channel_id"]) or message.channel
             msg = f"**Congratulations {message.author.mention}!** You've reached **Level {new_level}**!"
 
-            role_id = config["role_assignments"].get(str(new_level))
-            if role_id:
-                role = message.guild.get_role(int(role_id))
-                if role:
-                    try:
-                        await message.author.add_roles(role, reason="Level up")
-                        msg += f" and you got **{role.name}**!"
-                    except discord.Forbidden:
-                        pass
+            # A message can jump several levels (big XP gains, a gentler curve): every role
+            # of the levels passed is given, in one request
+            roles = []
+            for level in range(old_level + 1, new_level + 1):
+                role_id = config["role_assignments"].get(str(level))
+                role = message.guild.get_role(int(role_id)) if role_id else None
+                if role and role not in message.author.roles:
+                    roles.append(role)
+            if roles:
+                try:
+                    await message.author.add_roles(*roles, reason="Level up")
+                    msg += f" and you got **{', '.join(role.name for role in roles)}**!"
+                except discord.Forbidden:
+                    pass
 
             try:
                 await channel.send(msg)
             except:
                 pass
-        else:
-            self._save_level_data()
 
     @commands.hybrid_command(name="level", description="Show current level and XP")
     @app_commands.describe(member="Member of which to show the level (default: yourself)")
@@ -136,18 +360,21 @@ class Leveling(commands.Cog):
         gid = str(ctx.guild.id)
         uid = str(target.id)
 
-        data = self.level_data.get(gid, {}).get(uid, {"total_xp": 0, "level": 0})
-        level = data["level"]
+        users = await self.fetch_guild_levels(gid)
+        data = users.get(uid, {"total_xp": 0, "level": 0})
         xp = data["total_xp"]
-        current_level, xp_to_next = get_level_info(xp)
+        curve = self.get_level_curve(gid)
+        current_level, xp_to_next = curve.get_level_info(xp)
+        level = current_level
+        max_level = curve.max_level
 
-        if level >= MAX_LEVEL:
+        if level >= max_level:
             progress_bar = "█" * 10
             progress_percent = 100.0
             status = "MAX LEVEL REACHED!"
         else:
-            prev_threshold = LEVEL_THRESHOLDS.get(current_level, 0)
-            next_threshold = LEVEL_THRESHOLDS[current_level + 1]
+            prev_threshold = curve.threshold(current_level)
+            next_threshold = curve.threshold(current_level + 1)
             xp_in_current = xp - prev_threshold
             needed_in_current = next_threshold - prev_threshold
 
@@ -159,11 +386,11 @@ class Leveling(commands.Cog):
 
         embed = discord.Embed(
             title=f"Level of {target.display_name}",
-            color=discord.Color.gold() if level >= MAX_LEVEL else discord.Color.blue()
+            color=discord.Color.gold() if level >= max_level else discord.Color.blue()
         )
         embed.set_thumbnail(url=target.display_avatar.url)
 
-        embed.add_field(name="Level", value=f"**{level}** / {MAX_LEVEL}", inline=True)
+        embed.add_field(name="Level", value=f"**{level}** / {max_level}", inline=True)
         embed.add_field(name="Total XP", value=f"**{xp}**", inline=True)
         embed.add_field(name="Next Level", value=status, inline=False)
 
@@ -176,6 +403,43 @@ class Leveling(commands.Cog):
         embed.set_footer(text=f"User ID: {target.id}")
         await ctx.send(embed=embed)
 
+    def _build_leaderboard_embed(self, guild: discord.Guild, ranking: GuildRanking, page: int) -> discord.Embed:
+        curve = self.get_level_curve(guild.id)
+        offset = page * LEADERBOARD_PAGE_SIZE
+        lines = []
+        for position, (uid, xp) in enumerate(ranking.top(LEADERBOARD_PAGE_SIZE, offset), offset + 1):
+            level, _ = curve.get_level_info(xp)
+            lines.append(f"**#{position}** <@{uid}> · Level **{level}** · {xp} XP")
+
+        pages = max(1, -(-len(ranking) // LEADERBOARD_PAGE_SIZE))
+        embed = discord.Embed(
+            title=f"Leaderboard of {guild.name}",
+            description="\n".join(lines) or "No one has earned XP yet.",
+            color=discord.Color.gold()
+        )
+        embed.set_footer(text=f"Page {page + 1}/{pages} · {len(ranking)} members ranked")
+        return embed
+
+    @commands.hybrid_command(name="leaderboard", description="Show the server XP leaderboard")
+    @app_commands.describe(page="Page to show (default: 1)")
+    async def leaderboard(self, ctx: commands.Context, page: int = 1):
+        ranking = await self.fetch_ranking(ctx.guild.id)
+        pages = max(1, -(-len(ranking) // LEADERBOARD_PAGE_SIZE))
+        page = min(max(page, 1), pages) - 1
+        view = LeaderboardView(self, ctx.guild, ranking, page)
+        await ctx.send(embed=self._build_leaderboard_embed(ctx.guild, ranking, page), view=view)
+
+    @commands.hybrid_command(name="rank", description="Show your position in the XP leaderboard")
+    @app_commands.describe(member="Member of which to show the rank (default: yourself)")
+    async def rank(self, ctx: commands.Context, member: Optional[discord.Member] = None):
+        target = member or ctx.author
+        ranking = await self.fetch_ranking(ctx.guild.id)
+        position = ranking.rank(target.id)
+        if position is None:
+            await ctx.send(f"{target.display_name} has no XP yet.")
+            return
+        await ctx.send(f"**{target.display_name}** is **#{position}** of {len(ranking)} in the leaderboard.")
+
     @commands.hybrid_command(name="config-show", description="Show current server configuration")
     @commands.has_permissions(administrator=True)
     async def show_config(self, ctx: commands.Context):
@@ -208,8 +472,8 @@ class Leveling(commands.Cog):
 
         # Roles
         roles_lines = []
-        for lvl in range(1, 6):
-            role_id = config["role_assignments"].get(str(lvl))
+        for lvl in sorted(config["role_assignments"], key=int):
+            role_id = config["role_assignments"][lvl]
             if role_id:
                 role = ctx.guild.get_role(int(role_id))
                 roles_lines.append(f"Level **{lvl}** → {role.mention if role else 'Role deleted'}")
@@ -221,7 +485,8 @@ class Leveling(commands.Cog):
         embed.add_field(name="Level-up Channel", value=lvl_text, inline=True)
         embed.add_field(name="Exit Channel", value=exit_text, inline=True)
         embed.add_field(name="Voice Creator Channel", value=voice_text, inline=True)
-        embed.add_field(name="Roles by Level", value="\n".join(roles_lines), inline=False)
+        embed.add_field(name="Level Curve", value=self.get_level_curve(ctx.guild.id).describe(), inline=False)
+        embed.add_field(name="Roles by Level", value="\n".join(roles_lines) or "Not set", inline=False)
         embed.add_field(name="Leveling System", value="Active" if config.get("is_active") else "Inactive", inline=True)
         embed.add_field(name="Task Background (48h)", value="Active" if config.get("backgroundT_status") else "Inactive", inline=True)
         await ctx.send(embed=embed, ephemeral=False)
@@ -251,7 +516,7 @@ class Leveling(commands.Cog):
         exit_channel: Optional[discord.TextChannel] = None,
         voice_creator_channel: Optional[discord.VoiceChannel] = None
     ):
-        config = self.get_guild_config(str(ctx.guild.id))
+        config = self.guild_configs.edit(ctx.guild.id)
         updated = []
 
         if level_up_channel:
@@ -275,22 +540,22 @@ class Leveling(commands.Cog):
 
         if exit_channel and self.bot.get_cog("Moderation"):
             mod = self.bot.get_cog("Moderation")
-            mod_cfg = mod.get_guild_config(ctx.guild.id)
+            mod_cfg = mod.guild_configs.edit(ctx.guild.id)
             mod_cfg["exit_channel_id"] = exit_channel.id
             mod_cfg["exit_channel_name"] = exit_channel.name
-            mod._save_config_data()
+            mod.guild_configs.save(ctx.guild.id)
             updated.append(f"Exit → {exit_channel.mention}")
 
         if voice_creator_channel and self.bot.get_cog("TempVoice"):
             vc = self.bot.get_cog("TempVoice")
-            vc_cfg = vc.get_guild_config(ctx.guild.id)
+            vc_cfg = vc.guild_configs.edit(ctx.guild.id)
             vc_cfg["creator_channel_id"] = voice_creator_channel.id
             vc_cfg["creator_channel_name"] = voice_creator_channel.name
-            vc._save_config_data()
+            vc.guild_configs.save(ctx.guild.id)
             updated.append(f"Create VC channel → {voice_creator_channel.mention}")
 
         if updated:
-            self._save_config_data()
+            self.guild_configs.save(ctx.guild.id)
             await ctx.send("Configuration updated:\n" + "\n".join(updated), ephemeral=True)
         else:
             await ctx.send("No changes applied.", ephemeral=True)
@@ -299,18 +564,18 @@ class Leveling(commands.Cog):
     @commands.has_permissions(administrator=True)
     @app_commands.describe(stato="True to activate, False to deactivate")
     async def leveling_toggle(self, ctx: commands.Context, stato: bool):
-        config = self.get_guild_config(str(ctx.guild.id))
+        config = self.guild_configs.edit(ctx.guild.id)
         config["is_active"] = stato
-        self._save_config_data()
+        self.guild_configs.save(ctx.guild.id)
         await ctx.send(f"Leveling system {'enabled' if stato else 'disabled'}.", ephemeral=False)
 
     @commands.hybrid_command(name="bg-task-toggle", description="On/off the background task (kick 48h)")
     @commands.has_permissions(administrator=True)
     @app_commands.describe(stato="True to activate, False to deactivate")
     async def bg_task_toggle(self, ctx: commands.Context, stato: bool):
-        config = self.get_guild_config(str(ctx.guild.id))
+        config = self.guild_configs.edit(ctx.guild.id)
         config["backgroundT_status"] = stato
-        self._save_config_data()
+        self.guild_configs.save(ctx.guild.id)
         embed = discord.Embed(
             title="Task Background",
             description=f"Task 48h {'enabled' if stato else 'disabled'}.",
@@ -318,5 +583,93 @@ class Leveling(commands.Cog):
         )
         await ctx.send(embed=embed, ephemeral=False)
 
+    @commands.hybrid_command(name="level-curve", description="Set the XP curve of the leveling system")
+    @commands.has_permissions(administrator=True)
+    @app_commands.describe(
+        thresholds="Total XP for each level, comma separated (e.g. 15,100,300,500,1500)",
+        base="Formula: XP of level n is base * n ^ exponent",
+        exponent="Formula exponent (default: 2)",
+        levels="Formula: number of levels"
+    )
+    async def level_curve(
+        self, ctx: commands.Context,
+        thresholds: Optional[str] = None,
+        base: Optional[int] = None,
+        exponent: Optional[float] = 2.0,
+        levels: Optional[int] = None
+    ):
+        config = self.guild_configs.edit(ctx.guild.id)
+        try:
+            if thresholds:
+                values = [int(x) for x in thresholds.replace(" ", "").split(",") if x]
+                LevelCurve(values)
+                config["level_curve"] = {"thresholds": values}
+            elif base is not None and levels is not None:
+                LevelCurve.from_formula(base, exponent, levels)
+                config["level_curve"] = {"formula": {"base": base, "exponent": exponent, "levels": levels}}
+            elif base is None and levels is None:
+                config.pop("level_curve", None)
+            else:
+                return await ctx.send("The formula needs both `base` and `levels`.", ephemeral=True)
+        except (ValueError, OverflowError) as e:
+            return await ctx.send(f"Invalid level curve: {e}", ephemeral=True)
+
+        self.invalidate_level_curve(ctx.guild.id)
+        self.guild_configs.save(ctx.guild.id)
+        await ctx.send(f"Level curve updated: {self.get_level_curve(ctx.guild.id).describe()}.", ephemeral=True)
+
+    @commands.hybrid_command(name="xp-settings", description="Set the XP per message and the anti-spam cooldown")
+    @commands.has_permissions(administrator=True)
+    @app_commands.describe(
+        cooldown="Seconds between two messages that earn XP (0 to disable)",
+        xp_min="Minimum XP per message",
+        xp_max="Maximum XP per message"
+    )
+    async def xp_settings(
+        self, ctx: commands.Context,
+        cooldown: Optional[int] = None,
+        xp_min: Optional[int] = None,
+        xp_max: Optional[int] = None
+    ):
+        current = self.guild_configs.get(ctx.guild.id)
+        if cooldown is not None and not (0 <= cooldown <= MAX_XP_COOLDOWN):
+            return await ctx.send(f"Cooldown must be between 0 and {MAX_XP_COOLDOWN} seconds.", ephemeral=True)
+        new_min = xp_min if xp_min is not None else current.get("xp_min", XP_PER_MESSAGE)
+        new_max = xp_max if xp_max is not None else current.get("xp_max", XP_PER_MESSAGE)
+        if not (1 <= new_min <= new_max <= MAX_XP_PER_MESSAGE):
+            return await ctx.send(f"XP per message must satisfy 1 ≤ min ≤ max ≤ {MAX_XP_PER_MESSAGE}.", ephemeral=True)
+
+        config = self.guild_configs.edit(ctx.guild.id)
+        if cooldown is not None:
+            config["xp_cooldown"] = cooldown
+        config["xp_min"] = new_min
+        config["xp_max"] = new_max
+
+        self.guild_configs.save(ctx.guild.id)
+        await ctx.send(
+            f"XP per message: **{new_min}-{new_max}**, cooldown: **{config.get('xp_cooldown', DEFAULT_XP_COOLDOWN)}s**.",
+            ephemeral=True
+        )
+
+    @commands.hybrid_command(name="level-role", description="Set the role given at any level")
+    @commands.has_permissions(administrator=True)
+    @app_commands.describe(level="Level that gives the role", role="Role to give (leave empty to remove)")
+    async def level_role(self, ctx: commands.Context, level: int, role: Optional[discord.Role] = None):
+        curve = self.get_level_curve(ctx.guild.id)
+        if not (1 <= level <= curve.max_level):
+            return await ctx.send(f"Level must be between 1 and {curve.max_level}.", ephemeral=True)
+
+        config = self.guild_configs.edit(ctx.guild.id)
+        if role is None:
+            config["role_assignments"].pop(str(level), None)
+            message = f"Role for level {level} removed."
+        elif role.is_default():
+            return await ctx.send("Can't assign @everyone.", ephemeral=True)
+        else:
+            config["role_assignments"][str(level)] = role.id
+            message = f"Level {level} → {role.mention}"
+        self.guild_configs.save(ctx.guild.id)
+        await ctx.send(message, ephemeral=True)
+
 async def setup(bot):
     await bot.add_cog(Leveling(bot))
\ No newline at end of file
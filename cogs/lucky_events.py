@@ -2,14 +2,78 @@
 import discord
 from discord.ext import commands, tasks
 from discord import app_commands
-import json
-import os
 from datetime import datetime, timedelta
-from typing import Dict, Optional
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+import asyncio
+import heapq
+import time
+from utils.reservations import EventReservations, ReservationEngine, format_ranges
+from utils.storage import get_store
+from utils.metrics import timed_task
+from utils.monitoring import BackgroundTasks
+from utils.sharding import owns_guild
+from utils.intents import GatewayProfile
+
+# Buttons and modals arrive without any intent; members are mentioned rather than looked up in the cache
+GATEWAY_PROFILE = GatewayProfile()
 
 BUTTON_CUSTOM_ID = "casino:select_number"
 APPROVE_CUSTOM_ID = "casino:approve"
 REJECT_CUSTOM_ID = "casino:reject"
+BROWSE_CUSTOM_ID = "casino:browse"
+
+DEFAULT_EVENT_SIZE = 100
+MAX_EVENT_SIZE = 5000
+PARTY_COUNT = 3
+# Up to this size every number is listed on the event message (a party of 34 fits one embed field);
+# larger events show the free ranges and a "Browse numbers" button instead
+DETAILED_MAX_SIZE = 100
+BROWSE_PAGE_SIZE = 50
+FIELD_LIMIT = 1024
+DATE_FORMAT = "%d/%m/%Y %H:%M"
+# Events expire this long after their start time
+EVENT_LIFETIME = timedelta(hours=4)
+# Events whose deadlines fall within this many seconds are expired together
+EXPIRY_BATCH_WINDOW = 1.0
+# Numbers waiting for staff approval are released after this many seconds
+RESERVATION_TTL = 6 * 60 * 60
+# Approvals within this window are merged into a single edit of the event message
+EMBED_EDIT_DELAY = 2.0
+
+
+def _event_size(casino_data: Dict) -> int:
+    return casino_data.get("size", DEFAULT_EVENT_SIZE)
+
+
+def _party_ranges(size: int) -> List[Tuple[int, int]]:
+    """Splits 1..size into parties; the first parties get the remainder (100 -> 34, 33, 33)."""
+    count = min(PARTY_COUNT, size)
+    base, extra = divmod(size, count)
+    ranges = []
+    start = 1
+    for index in range(count):
+        end = start + base + (index < extra) - 1
+        ranges.append((start, end))
+        start = end + 1
+    return ranges
+
+
+def _field_index(size: int, number: int) -> int:
+    """Which cached embed field shows `number`."""
+    if size > DETAILED_MAX_SIZE:
+        return 0
+    for index, (start, end) in enumerate(_party_ranges(size)):
+        if start <= number <= end:
+            return index
+    raise ValueError(number)
+
+
+def _parse_assignments(raw: Union[Dict[str, str], List[List[int]]]) -> Iterator[Tuple[int, int]]:
+    """Reads both the compact [[number, user_id], ...] form and the legacy {"number": "user_id"} dict."""
+    if isinstance(raw, dict):
+        return ((int(number), int(user_id)) for number, user_id in raw.items())
+    return ((number, user_id) for number, user_id in raw)
+
 
 # ------------------- VALIDATION VIEW -------------------
 class ValidationView(discord.ui.View):
@@ -31,53 +95,47 @@ class ValidationView(discord.ui.View):
         if not casino_cog:
             return
 
-        found = False
-        for msg_id, data in list(casino_cog.pending_validations.items()):
-            if (data["user_id"] == self.user_id and
-                data["number"] == self.number and
-                data["guild_id"] == interaction.guild.id):
-                found = True
-                message_id = data["message_id"]
-                del casino_cog.pending_validations[msg_id]
-                casino_cog._save_pending()
-                break
-
-        if not found:
+        # Pending requests are keyed by the validation message, so no scan is needed
+        # (this also works for the persistent dummy view registered at startup)
+        data = casino_cog._pop_pending(interaction.message.id)
+        if data is None:
             await interaction.response.send_message("This request has already been processed.", ephemeral=True)
             return
 
-        user = interaction.guild.get_member(self.user_id)
-        user_name = user.display_name if user else "Unknown user"
-
-        if approved:
-            casino_data = casino_cog.active_casinos.get(message_id)
-            if casino_data:
-                casino_data["assignments"][self.number] = str(self.user_id)
-                casino_cog._save_casinos()
-
-                channel = interaction.guild.get_channel(casino_data["channel_id"])
-                if channel:
-                    try:
-                        msg = await channel.fetch_message(message_id)
-                        occupied = len(casino_data["assignments"])
-                        new_embed = casino_cog._build_party_embed(casino_data, interaction.guild, occupied)
-                        await msg.edit(embed=new_embed)
-                    except:
-                        pass
-
-            await interaction.response.send_message(f"✅ Number **{self.number}** approved for {user_name}!", ephemeral=True)
-            if user:
-                try:
-                    await user.send(f"✅ Your number **{self.number}** for the Casino has been **approved** by the staff!")
-                except:
-                    pass
+        message_id = data["message_id"]
+        user_id = data["user_id"]
+        number = data["number"]
+        user = interaction.guild.get_member(user_id)
+        user_name = user.display_name if user else f"<@{user_id}>"
+
+        reservations = casino_cog.reservations.get(message_id)
+        casino_data = casino_cog.active_casinos.get(message_id)
+        if approved and not (casino_data and reservations):
+            await interaction.response.send_message("This Casino event has been closed.", ephemeral=True)
+        elif approved:
+            # The hold is turned into an assignment under the event lock, so a number
+            # can never be approved twice
+            async with reservations.lock:
+                committed = reservations.commit(int(number), user_id, interaction.message.id)
+
+            if committed:
+                casino_cog._save_casinos(message_id)
+                casino_cog._mark_number_changed(message_id, number)
+                casino_cog._schedule_embed_update(message_id, interaction.guild)
+
+                await interaction.response.send_message(f"✅ Number **{number}** approved for {user_name}!", ephemeral=True)
+                await casino_cog._send_dm(user_id, f"✅ Your number **{number}** for the Casino has been **approved** by the staff!")
+            else:
+                await interaction.response.send_message(
+                    f"❌ Number **{number}** is no longer reserved for {user_name} (the request expired or the number was taken).",
+                    ephemeral=True
+                )
         else:
-            await interaction.response.send_message(f"❌ Number **{self.number}** rejected for {user_name}.", ephemeral=True)
-            if user:
-                try:
-                    await user.send(f"❌ Your number **{self.number}** for the Casino has been **rejected** by the staff. Try another one!")
-                except:
-                    pass
+            if reservations:
+                async with reservations.lock:
+                    reservations.release(int(number), interaction.message.id)
+            await interaction.response.send_message(f"❌ Number **{number}** rejected for {user_name}.", ephemeral=True)
+            await casino_cog._send_dm(user_id, f"❌ Your number **{number}** for the Casino has been **rejected** by the staff. Try another one!")
 
         for item in self.children:
             item.disabled = True
@@ -99,6 +157,9 @@ class CasinoSelectModal(discord.ui.Modal, title="Choose your lucky number"):
         self.casino_cog = casino_cog
         self.message_id = message_id
         self.casino_data = casino_data
+        self.size = _event_size(casino_data)
+        self.numero.label = f"Enter the number (1-{self.size})"
+        self.numero.max_length = len(str(self.size))
 
     async def on_submit(self, interaction: discord.Interaction):
         if self.message_id not in self.casino_cog.active_casinos:
@@ -107,26 +168,51 @@ class CasinoSelectModal(discord.ui.Modal, title="Choose your lucky number"):
 
         try:
             num = int(self.numero.value.strip())
-            if not (1 <= num <= 100):
+            if not (1 <= num <= self.size):
                 raise ValueError
         except ValueError:
-            await interaction.response.send_message("❌ Please enter a valid number between 1 and 100.", ephemeral=True)
+            await interaction.response.send_message(f"❌ Please enter a valid number between 1 and {self.size}.", ephemeral=True)
             return
 
         num_str = str(num)
-        assignments = self.casino_data["assignments"]
+        engine = self.casino_cog.reservations
+        reservations = engine.get(self.message_id)
 
-        if num_str in assignments:
-            owner = interaction.guild.get_member(int(assignments[num_str]))
-            owner_name = owner.display_name if owner else "someone"
-            await interaction.response.send_message(f"❌ The number **{num}** has already been taken by {owner_name}.", ephemeral=True)
+        validation_channel = None
+        validation_channel_id = self.casino_cog.get_validation_channel(interaction.guild.id)
+        if validation_channel_id:
+            channel = interaction.guild.get_channel(validation_channel_id)
+            if channel and isinstance(channel, discord.TextChannel):
+                validation_channel = channel
+
+        # --- RESERVATION ---
+        # Check and reservation happen together under the event lock; of two concurrent
+        # submits for the same number only the first one gets it
+        expires_at = time.time() + RESERVATION_TTL
+        async with reservations.lock:
+            if validation_channel:
+                # Keyed by the interaction until the validation message exists
+                reserved = engine.hold(self.message_id, num, interaction.id, expires_at)
+            else:
+                reserved = reservations.take(num, interaction.user.id)
+
+        if not reserved:
+            if reservations.is_held(num):
+                reply = f"❌ The number **{num}** has already been requested and is waiting for approval."
+            else:
+                owner_id = reservations.owner(num)
+                owner = interaction.guild.get_member(owner_id) if owner_id else None
+                owner_name = owner.display_name if owner else f"<@{owner_id}>"
+                reply = f"❌ The number **{num}** has already been taken by {owner_name}."
+            next_free = reservations.next_free()
+            if next_free is not None:
+                reply += f" The next free number is **{next_free}**."
+            await interaction.response.send_message(reply, ephemeral=True)
             return
 
         # --- VALIDATION LOGIC ---
-        validation_channel_id = self.casino_cog.get_validation_channel(interaction.guild.id)
-        if validation_channel_id:
-            validation_channel = interaction.guild.get_channel(validation_channel_id)
-            if validation_channel and isinstance(validation_channel, discord.TextChannel):
+        if validation_channel:
+            try:
                 await interaction.response.send_message(
                     f"⏳ Your request for number **{num}** has been sent to the staff for approval.",
                     ephemeral=True
@@ -149,30 +235,45 @@ class CasinoSelectModal(discord.ui.Modal, title="Choose your lucky number"):
 
                 view = ValidationView(interaction.user.id, num_str)
                 val_msg = await validation_channel.send(embed=embed, view=view)
+            except Exception:
+                reservations.release(num, interaction.id)
+                raise
 
-                self.casino_cog.pending_validations[val_msg.id] = {
-                    "message_id": self.message_id,
-                    "user_id": interaction.user.id,
-                    "number": num_str,
-                    "guild_id": interaction.guild.id
-                }
-                self.casino_cog._save_pending()
+            if not engine.set_token(self.message_id, num, val_msg.id, interaction.id):
+                # The hold expired (or the event closed) while the request was being sent
+                try:
+                    await val_msg.delete()
+                except discord.HTTPException:
+                    pass
                 return
+            self.casino_cog._add_pending(val_msg.id, {
+                "message_id": self.message_id,
+                "user_id": interaction.user.id,
+                "number": num_str,
+                "guild_id": interaction.guild.id,
+                "expires_at": expires_at
+            })
+            return
 
         # --- DIRECT ASSIGNMENT IF NO VALIDATION ---
-        assignments[num_str] = str(interaction.user.id)
-        occupied = len(assignments)
-        embed = self.casino_cog._build_party_embed(self.casino_data, interaction.guild, occupied)
+        self.casino_cog._mark_number_changed(self.message_id, num_str)
+        embed = self.casino_cog._build_party_embed(self.casino_data, interaction.guild, reservations, self.message_id)
 
         await interaction.response.edit_message(embed=embed)
         await interaction.followup.send(f"✅ You have taken the number **{num}**!", ephemeral=True)
-        self.casino_cog._save_casinos()
+        self.casino_cog._save_casinos(self.message_id)
 
 
 # ------------------- BUTTON VIEW -------------------
 class CasinoButton(discord.ui.View):
-    def __init__(self):
+    def __init__(self, browse: bool = True):
         super().__init__(timeout=None)
+        if not browse:
+            self.remove_item(self.browse_numbers)
+
+    @classmethod
+    def for_size(cls, size: int) -> "CasinoButton":
+        return cls(browse=size > DETAILED_MAX_SIZE)
 
     @discord.ui.button(label="Choose Number", style=discord.ButtonStyle.green, emoji="🎰", custom_id=BUTTON_CUSTOM_ID)
     async def select_number(self, interaction: discord.Interaction, button: discord.ui.Button):
@@ -183,143 +284,386 @@ class CasinoButton(discord.ui.View):
             return
 
         casino_data = casino_cog.active_casinos[message_id]
-        if len(casino_data["assignments"]) >= 100 and casino_cog.get_validation_channel(interaction.guild.id) is None:
+        reservations = casino_cog.reservations.get(message_id)
+        if reservations.all_taken:
             await interaction.response.send_message("❌ All numbers have already been taken!", ephemeral=True)
             return
+        if reservations.next_free() is None:
+            await interaction.response.send_message("⏳ All remaining numbers are waiting for staff approval.", ephemeral=True)
+            return
 
         modal = CasinoSelectModal(casino_cog, message_id, casino_data)
         await interaction.response.send_modal(modal)
 
+    @discord.ui.button(label="Browse numbers", style=discord.ButtonStyle.gray, emoji="🔎", custom_id=BROWSE_CUSTOM_ID)
+    async def browse_numbers(self, interaction: discord.Interaction, button: discord.ui.Button):
+        message_id = interaction.message.id
+        casino_cog = interaction.client.get_cog("Casino")
+        if not casino_cog or message_id not in casino_cog.active_casinos:
+            await interaction.response.send_message("Event does not exist or has been closed.", ephemeral=True)
+            return
+
+        view = NumberBrowserView(casino_cog, message_id)
+        await interaction.response.send_message(embed=view.build_embed(), view=view, ephemeral=True)
+
+
+# ------------------- NUMBER BROWSER -------------------
+class NumberBrowserView(discord.ui.View):
+    """Ephemeral, per-user pages of a large event (BROWSE_PAGE_SIZE numbers each)."""
+
+    def __init__(self, casino_cog: "Casino", message_id: int, page: int = 0):
+        super().__init__(timeout=300)
+        self.casino_cog = casino_cog
+        self.message_id = message_id
+        self.page = page
+
+    def _page_count(self, reservations: EventReservations) -> int:
+        return -(-reservations.size // BROWSE_PAGE_SIZE)
+
+    def build_embed(self) -> discord.Embed:
+        reservations = self.casino_cog.reservations.get(self.message_id)
+        casino_data = self.casino_cog.active_casinos.get(self.message_id)
+        if not reservations or not casino_data:
+            return discord.Embed(title="This Casino event has been closed.", color=discord.Color.red())
+
+        pages = self._page_count(reservations)
+        self.page = max(0, min(self.page, pages - 1))
+        start = self.page * BROWSE_PAGE_SIZE + 1
+        end = min(start + BROWSE_PAGE_SIZE - 1, reservations.size)
+        self.previous_page.disabled = self.page == 0
+        self.next_page.disabled = self.page >= pages - 1
+
+        embed = discord.Embed(
+            title=f"🎰 Casino Night - {casino_data['data_ora']} ({start}-{end})",
+            description=self.casino_cog._render_party(reservations, start, end),
+            color=discord.Color.gold()
+        )
+        embed.set_footer(text=f"Page {self.page + 1}/{pages} • Numbers taken: {reservations.taken_count}/{reservations.size}")
+        return embed
+
+    @discord.ui.button(label="Previous", style=discord.ButtonStyle.gray, emoji="◀️")
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page -= 1
+        await interaction.response.edit_message(embed=self.build_embed(), view=self)
+
+    @discord.ui.button(label="Next", style=discord.ButtonStyle.gray, emoji="▶️")
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page += 1
+        await interaction.response.edit_message(embed=self.build_embed(), view=self)
+
 
 # ------------------- COG -------------------
 class Casino(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        self.store = get_store(bot)
         self.active_casinos: Dict[int, Dict] = self._load_casinos()
         self.pending_validations: Dict[int, Dict] = self._load_pending()
-        self.validation_channels: Dict[str, int] = self._load_validation_channels()
+        self.reservations = ReservationEngine()
+        self._open_reservations()
+        self.validation_channels: Dict[str, int] = {
+            gid: channel_id for gid, channel_id in self.store.load("casino_validation_channels").items()
+            if owns_guild(bot, gid)
+        }
+        # message_id -> rendered party fields (None = needs re-render)
+        self._party_fields: Dict[int, List[Optional[str]]] = {}
+        self._pending_edits: Set[int] = set()
+        # (expires_at, message_id); entries of closed events are skipped when popped
+        self._expiry_heap: List[Tuple[float, int]] = []
+        self._expiry_wakeup = asyncio.Event()
+        self._expiry_task: Optional[asyncio.Task] = None
+        self.background = BackgroundTasks("Casino")
+        self._build_expiry_heap()
         self._register_persistent_views()
 
-    # --- FILE MANAGEMENT ---
+    # --- STORAGE ---
     def _load_casinos(self) -> Dict[int, Dict]:
-        path = 'data/casino_events.json'
-        if os.path.exists(path):
-            with open(path, 'r') as f:
-                return {int(k): v for k, v in json.load(f).items()}
-        return {}
+        return {int(k): v for k, v in self.store.load("casino_events").items() if owns_guild(self.bot, v["guild_id"])}
 
-    def _save_casinos(self):
-        with open('data/casino_events.json', 'w') as f:
-            json.dump(self.active_casinos, f, indent=4)
+    def _save_casinos(self, *message_ids: int, removed: Iterable[int] = ()):
+        # Assignments live in the reservations; only their compact form is stored
+        for message_id in message_ids:
+            reservations = self.reservations.get(message_id)
+            if reservations is not None:
+                self.active_casinos[message_id]["assignments"] = reservations.export()
+        self.store.save("casino_events", self.active_casinos, changed=message_ids, removed=removed)
 
     def _load_pending(self) -> Dict[int, Dict]:
-        path = 'data/casino_pending.json'
-        if os.path.exists(path):
-            with open(path, 'r') as f:
-                return {int(k): v for k, v in json.load(f).items()}
-        return {}
-
-    def _save_pending(self):
-        with open('data/casino_pending.json', 'w') as f:
-            json.dump(self.pending_validations, f, indent=4)
-
-    def _load_validation_channels(self) -> Dict[str, int]:
-        path = 'data/casino_validation_channels.json'
-        if os.path.exists(path):
-            with open(path, 'r') as f:
-                return json.load(f)
-        return {}
-
-    def _save_validation_channels(self):
-        with open('data/casino_validation_channels.json', 'w') as f:
-            json.dump(self.validation_channels, f, indent=4)
+        return {int(k): v for k, v in self.store.load("casino_pending").items() if owns_guild(self.bot, v["guild_id"])}
 
-    def get_validation_channel(self, guild_id: int) -> Optional[int]:
-        return self.validation_channels.get(str(guild_id))
+    def _save_pending(self, *message_ids: int, removed: Iterable[int] = ()):
+        self.store.save("casino_pending", self.pending_validations, changed=message_ids, removed=removed)
 
-    @tasks.loop(minutes=30)
-    async def cleanup_expired_events(self):
-        now = datetime.now()
-        to_remove = []
+    # --- RESERVATIONS ---
+    def _open_reservations(self):
+        legacy = []
         for msg_id, data in self.active_casinos.items():
-            event_datetime_str = data.get("data_ora")
-            try:
-                event_datetime = datetime.strptime(event_datetime_str, "%d/%m/%Y %H:%M")
-                expiration_time = event_datetime + timedelta(hours=4)
-                if now > expiration_time:
-                    to_remove.append((msg_id, data))
-            except ValueError:
-                print(f"Invalid date format for event {msg_id}: {event_datetime_str}")
+            self.reservations.open(msg_id, _event_size(data), _parse_assignments(data["assignments"]))
+            if isinstance(data["assignments"], dict):
+                legacy.append(msg_id)
+        if legacy:
+            self._save_casinos(*legacy)
+        # Requests saved before holds had a deadline get a full TTL from now
+        expires_at = time.time() + RESERVATION_TTL
+        orphaned = []
+        for val_id, data in self.pending_validations.items():
+            if data["message_id"] not in self.active_casinos:
+                # Left behind by an event closed before pending requests were dropped with it
+                orphaned.append(val_id)
+                continue
+            self.reservations.hold(data["message_id"], int(data["number"]), val_id,
+                                   data.setdefault("expires_at", expires_at))
+        for val_id in orphaned:
+            del self.pending_validations[val_id]
+        if orphaned:
+            self._save_pending(removed=orphaned)
+
+    def _add_pending(self, validation_message_id: int, data: Dict):
+        self.pending_validations[validation_message_id] = data
+        self._save_pending(validation_message_id)
+
+    def _pop_pending(self, validation_message_id: int) -> Optional[Dict]:
+        data = self.pending_validations.pop(validation_message_id, None)
+        if data is not None:
+            self._save_pending(removed=[validation_message_id])
+        return data
+
+    @tasks.loop(minutes=1)
+    @timed_task("casino_expire_reservations")
+    async def expire_reservations(self):
+        for message_id, number, val_id in self.reservations.pop_expired(time.time()):
+            data = self._pop_pending(val_id)
+            if data is None:
                 continue
-        
-        for msg_id, data in to_remove:
-            channel_id = data["channel_id"]
-            guild_id = data["guild_id"]
-            channel = self.bot.get_channel(channel_id)
-            guild = self.bot.get_guild(guild_id)
-            
+
+            channel_id = self.get_validation_channel(data["guild_id"])
+            channel = self.bot.get_channel(channel_id) if channel_id else None
             if channel:
+                view = ValidationView(data["user_id"], data["number"])
+                for item in view.children:
+                    item.disabled = True
+                try:
+                    await channel.get_partial_message(val_id).edit(content="⌛ This request expired.", view=view)
+                except discord.HTTPException:
+                    pass
+
+            if self.bot.get_guild(data["guild_id"]):
+                await self._send_dm(data["user_id"], f"⌛ Your request for number **{number}** for the Casino expired before the staff reviewed it. Try again!")
+            print(f"[Casino] Reservation of number {number} for event {message_id} expired")
+
+    @expire_reservations.before_loop
+    async def before_expire_reservations(self):
+        await self.bot.wait_until_ready()
+
+    async def _send_dm(self, user_id: int, content: str):
+        """DMs a user from their ID: members are not all cached, so there may be no Member to call .send on."""
+        try:
+            dm = await self.bot.create_dm(discord.Object(user_id))
+            await dm.send(content)
+        except discord.HTTPException:
+            pass
+
+    def _save_validation_channels(self, *guild_ids: str, removed: Iterable[str] = ()):
+        self.store.save("casino_validation_channels", self.validation_channels, changed=guild_ids, removed=removed)
+
+    def get_validation_channel(self, guild_id: int) -> Optional[int]:
+        return self.validation_channels.get(str(guild_id))
+
+    # --- EXPIRY SCHEDULER ---
+    @staticmethod
+    def _parse_expiry(date_time: str) -> float:
+        """Epoch seconds at which an event starting at `date_time` expires (raises ValueError)."""
+        return (datetime.strptime(date_time, DATE_FORMAT) + EVENT_LIFETIME).timestamp()
+
+    def _build_expiry_heap(self):
+        """Parses legacy events once and fills the deadline heap from storage."""
+        migrated = []
+        for msg_id, data in self.active_casinos.items():
+            if "expires_at" not in data:
+                try:
+                    data["expires_at"] = self._parse_expiry(data.get("data_ora"))
+                except (TypeError, ValueError):
+                    print(f"Invalid date format for event {msg_id}: {data.get('data_ora')}")
+                    continue
+                migrated.append(msg_id)
+            self._expiry_heap.append((data["expires_at"], msg_id))
+        heapq.heapify(self._expiry_heap)
+        if migrated:
+            self._save_casinos(*migrated)
+
+    def _schedule_expiry(self, message_id: int, expires_at: float):
+        heapq.heappush(self._expiry_heap, (expires_at, message_id))
+        self._expiry_wakeup.set()
+
+    def _pop_due_events(self, now: float) -> List[int]:
+        """Pops every live event whose deadline is within EXPIRY_BATCH_WINDOW of `now`."""
+        due = []
+        while self._expiry_heap and self._expiry_heap[0][0] <= now + EXPIRY_BATCH_WINDOW:
+            expires_at, msg_id = heapq.heappop(self._expiry_heap)
+            data = self.active_casinos.get(msg_id)
+            # Closed events and superseded deadlines are skipped here (lazy deletion)
+            if data is not None and data.get("expires_at") == expires_at:
+                due.append(msg_id)
+        return due
+
+    async def _run_expiry_scheduler(self):
+        await self.bot.wait_until_ready()
+        while True:
+            self._expiry_wakeup.clear()
+            timeout = None
+            if self._expiry_heap:
+                timeout = max(0.0, self._expiry_heap[0][0] - time.time())
+            if timeout is None or timeout > 0:
                 try:
-                    msg = await channel.fetch_message(msg_id)
-                    embed = msg.embeds[0] if msg.embeds else discord.Embed(title="Casino Night")
-                    embed.color = discord.Color.dark_gray()
-                    embed.title = f"⏰ Casino Night - {data['data_ora']} (EXPIRED)"
-                    embed.set_footer(text="This event has expired and is no longer active.")
-
-                    view = CasinoButton()
-                    for child in view.children:
-                        child.disabled = True
-
-                    await msg.edit(embed=embed, view=view)
-                except discord.NotFound:
+                    await asyncio.wait_for(self._expiry_wakeup.wait(), timeout)
+                    continue
+                except asyncio.TimeoutError:
                     pass
+
+            due = self._pop_due_events(time.time())
+            if due:
+                try:
+                    await self._expire_events(due)
                 except Exception as e:
-                    print(f"[Casino Auto Cleanup] Errore editing message {msg_id}: {e}") 
-            
-            self.active_casinos.pop(msg_id, None)
+                    print(f"[Casino Auto Cleanup] Error expiring events: {e}")
+
+    @timed_task("casino_expire_events")
+    async def _expire_events(self, message_ids: List[int]):
+        """Marks events as expired; their messages are edited concurrently and saved in one write."""
+        expired = [(msg_id, self.active_casinos.pop(msg_id)) for msg_id in message_ids]
+        results = await asyncio.gather(*(self._edit_expired_message(msg_id, data) for msg_id, data in expired),
+                                       return_exceptions=True)
+        for (msg_id, _), result in zip(expired, results):
+            if isinstance(result, Exception) and not isinstance(result, discord.NotFound):
+                print(f"[Casino Auto Cleanup] Error editing message {msg_id}: {result}")
+            self._forget_event(msg_id)
             print(f"[Casino Auto Cleanup] Removed expired event {msg_id}")
-        
-        if to_remove:
-            self._save_casinos()
-    
-    @cleanup_expired_events.before_loop
-    async def before_cleanup(self):
-        await self.bot.wait_until_ready()
-        
+        self._save_casinos(removed=message_ids)
+
+    async def _edit_expired_message(self, msg_id: int, data: Dict):
+        channel = self.bot.get_channel(data["channel_id"])
+        guild = self.bot.get_guild(data["guild_id"])
+        reservations = self.reservations.get(msg_id)
+        if not channel or not guild or not reservations:
+            return
+        # Rebuilt from the cached event instead of fetching the message first
+        embed = self._build_party_embed(data, guild, reservations, msg_id)
+        embed.color = discord.Color.dark_gray()
+        embed.title = f"⏰ Casino Night - {data['data_ora']} (EXPIRED)"
+        embed.set_footer(text="This event has expired and is no longer active.")
+
+        view = CasinoButton.for_size(reservations.size)
+        for child in view.children:
+            child.disabled = True
+        await channel.get_partial_message(msg_id).edit(embed=embed, view=view)
+
+    def cog_unload(self):
+        self.background.cancel_all()
+        self.expire_reservations.cancel()
+
     # --- PERSISTENT VIEWS ---
     def _register_persistent_views(self):
         self.bot.add_view(CasinoButton())
         self.bot.add_view(ValidationView(user_id=0, number="0"))  # dummy instance
 
     # --- EMBED ---
-    def _build_party_embed(self, casino_data: Dict, guild: discord.Guild, occupied: int) -> discord.Embed:
+    @staticmethod
+    def _render_party(reservations: EventReservations, start: int, end: int) -> str:
+        lines = []
+        for n in range(start, end + 1):
+            user_id = reservations.owner(n)
+            lines.append(f"✅ {n}. <@{user_id}>" if user_id else f"⬜ {n}. Free")
+        return "\n".join(lines)
+
+    @staticmethod
+    def _render_free_ranges(reservations: EventReservations) -> str:
+        return format_ranges(reservations.free_ranges(), FIELD_LIMIT) or "None"
+
+    def _mark_number_changed(self, message_id: int, number: str):
+        fields = self._party_fields.get(message_id)
+        reservations = self.reservations.get(message_id)
+        if fields is not None and reservations is not None:
+            fields[_field_index(reservations.size, int(number))] = None
+
+    def _forget_event(self, message_id: int):
+        self.reservations.close(message_id)
+        self._party_fields.pop(message_id, None)
+        self._pending_edits.discard(message_id)
+        # Their holds went with the reservations: pop_expired will never report them
+        stale = [val_id for val_id, data in self.pending_validations.items() if data["message_id"] == message_id]
+        for val_id in stale:
+            del self.pending_validations[val_id]
+        if stale:
+            self._save_pending(removed=stale)
+
+    def _schedule_embed_update(self, message_id: int, guild: discord.Guild):
+        if message_id in self._pending_edits:
+            return
+        self._pending_edits.add(message_id)
+        self.background.spawn(self._flush_embed_update(message_id, guild), name=f"casino-embed-{message_id}")
+
+    async def _flush_embed_update(self, message_id: int, guild: discord.Guild):
+        await asyncio.sleep(EMBED_EDIT_DELAY)
+        if message_id not in self._pending_edits:
+            return
+        self._pending_edits.discard(message_id)
+
+        casino_data = self.active_casinos.get(message_id)
+        if not casino_data:
+            return
+        channel = guild.get_channel(casino_data["channel_id"])
+        if not channel:
+            return
+        reservations = self.reservations.get(message_id)
+        if not reservations:
+            return
+        try:
+            embed = self._build_party_embed(casino_data, guild, reservations, message_id)
+            await channel.get_partial_message(message_id).edit(embed=embed)
+        except Exception as e:
+            print(f"[Casino] Error updating event message {message_id}: {e}")
+
+    def _build_party_embed(self, casino_data: Dict, guild: discord.Guild, reservations: EventReservations,
+                           message_id: Optional[int] = None) -> discord.Embed:
         embed = discord.Embed(
             title=f"🎰 Casino Night - {casino_data['data_ora']}",
             color=discord.Color.gold(),
             timestamp=datetime.now()
         )
         creator = guild.get_member(casino_data['creator_id'])
-        embed.set_footer(text=f"Created by {creator.display_name if creator else 'Unknown'}")
+        creator_name = creator.display_name if creator else casino_data.get('creator_name', 'Unknown')
+        embed.set_footer(text=f"Created by {creator_name}")
 
+        size = reservations.size
+        detailed = size <= DETAILED_MAX_SIZE
         entry_cost = casino_data.get("entry_cost", 0)
-        base = f"**Numbers taken: {occupied}/100**\nClick the button below to choose your number!"
+        base = f"**Numbers taken: {reservations.taken_count}/{size}**\nClick the button below to choose your number!"
+        if not detailed:
+            base += "\nUse **Browse numbers** to see who took each number."
 
         if entry_cost > 0:
             embed.description = f"💰 **Entry cost: {entry_cost}€**\n\n{base}"
         else:
             embed.description = f"🎟️ **Free entry**\n\n{base}"
 
-        assignments = casino_data["assignments"]
-        for party_num, (start, end) in enumerate([(1,34), (35,67), (68,100)], 1):
-            lines = []
-            for n in range(start, end+1):
-                ns = str(n)
-                if ns in assignments:
-                    member = guild.get_member(int(assignments[ns]))
-                    lines.append(f"✅ {n}. {member.mention if member else 'Unknown'}")
-                else:
-                    lines.append(f"⬜ {n}. Free")
-            embed.add_field(name=f"Party {party_num}", value="\n".join(lines), inline=True)
+        # Only the fields whose numbers changed are rendered again
+        parties = _party_ranges(size) if detailed else []
+        fields = self._party_fields.get(message_id) if message_id is not None else None
+        if fields is None:
+            fields = [None] * (len(parties) if detailed else 1)
+            if message_id is not None:
+                self._party_fields[message_id] = fields
+
+        if not detailed:
+            if fields[0] is None:
+                fields[0] = self._render_free_ranges(reservations)
+            embed.add_field(name="Free numbers", value=fields[0], inline=False)
+            return embed
+
+        for index, (start, end) in enumerate(parties):
+            if fields[index] is None:
+                fields[index] = self._render_party(reservations, start, end)
+            embed.add_field(name=f"Party {index + 1}", value=fields[index], inline=True)
         return embed
 
     # --- COMMANDS ---
@@ -328,23 +672,40 @@ class Casino(commands.Cog):
     @app_commands.describe(
         date_time="Date and time of the event (DD/MM/YYYY hh:mm)",
         entry_cost="Entry cost (default: 0 for free)",
-        channel="Channel to post the event (default: current channel)"
+        channel="Channel to post the event (default: current channel)",
+        size=f"How many numbers the event has (default: {DEFAULT_EVENT_SIZE}, max: {MAX_EVENT_SIZE})"
     )
-    async def casino(self, ctx: commands.Context, date_time: str, entry_cost: int = 0, channel: Optional[discord.TextChannel] = None):
+    async def casino(self, ctx: commands.Context, date_time: str, entry_cost: int = 0,
+                     channel: Optional[discord.TextChannel] = None, size: int = DEFAULT_EVENT_SIZE):
         channel = channel or ctx.channel
-        embed = self._build_party_embed({"data_ora": date_time, "assignments": {}, "creator_id": ctx.author.id}, ctx.guild, 0)
-        view = CasinoButton()
+        if not 1 <= size <= MAX_EVENT_SIZE:
+            await ctx.send(f"❌ The event size must be between 1 and {MAX_EVENT_SIZE}.", ephemeral=True)
+            return
+        try:
+            expires_at = self._parse_expiry(date_time)
+        except ValueError:
+            await ctx.send("❌ Invalid date format. Use DD/MM/YYYY hh:mm (e.g. 24/12/2025 21:30).", ephemeral=True)
+            return
+        embed = self._build_party_embed({"data_ora": date_time, "creator_id": ctx.author.id,
+                                         "creator_name": ctx.author.display_name, "entry_cost": entry_cost},
+                                        ctx.guild, EventReservations(size))
+        view = CasinoButton.for_size(size)
         msg = await channel.send(embed=embed, view=view)
 
         self.active_casinos[msg.id] = {
             "channel_id": channel.id,
             "guild_id": ctx.guild.id,
             "data_ora": date_time,
-            "assignments": {},
+            "assignments": [],
             "creator_id": ctx.author.id,
+            "creator_name": ctx.author.display_name,
             "entry_cost": entry_cost,
+            "expires_at": expires_at,
+            "size": size,
         }
-        self._save_casinos()
+        self.reservations.open(msg.id, size)
+        self._schedule_expiry(msg.id, expires_at)
+        self._save_casinos(msg.id)
         await ctx.send(f"Casino event created in {channel.mention}!", ephemeral=True)
 
     @commands.hybrid_command(name="casino-set-validation-channel", description="Set/remove the channel for Casino validations")
@@ -355,13 +716,13 @@ class Casino(commands.Cog):
         if channel is None:
             if gid in self.validation_channels:
                 del self.validation_channels[gid]
-                self._save_validation_channels()
+                self._save_validation_channels(removed=[gid])
                 await ctx.send("Validation channel removed.", ephemeral=True)
             else:
                 await ctx.send("No validation channel configured.", ephemeral=True)
         else: 
             self.validation_channels[gid] = channel.id
-            self._save_validation_channels()
+            self._save_validation_channels(gid)
             await ctx.send(f"Validation channel set to {channel.mention}", ephemeral=True)
 
     @commands.hybrid_command(name="close-casino", description="Manually close a Casino event")
@@ -382,12 +743,15 @@ class Casino(commands.Cog):
             embed = msg.embeds[0]
             embed.color = discord.Color.red()
             embed.title = f"❌ Casino Night - {data['data_ora']} (CLOSED)"
-            view = CasinoButton()
+            view = CasinoButton.for_size(_event_size(data))
             for child in view.children:
                 child.disabled = True
             await msg.edit(embed=embed, view=view)
             del self.active_casinos[message_id]
-            self._save_casinos()
+            self._forget_event(message_id)
+            # Its heap entry is now stale; the scheduler re-reads the next deadline
+            self._expiry_wakeup.set()
+            self._save_casinos(removed=[message_id])
             await ctx.send("Event closed successfully.", ephemeral=True)
         except:
             await ctx.send("Message not found.", ephemeral=True)
@@ -396,4 +760,5 @@ class Casino(commands.Cog):
 async def setup(bot: commands.Bot):
     cog = Casino(bot)
     await bot.add_cog(cog)
-    cog.cleanup_expired_events.start()
+    cog._expiry_task = cog.background.spawn(cog._run_expiry_scheduler(), name="casino-expiry-scheduler")
+    cog.expire_reservations.start()
@@ -1,51 +1,108 @@
 import discord
 from discord import app_commands
 from discord.ext import commands
-import io
+import asyncio
+from typing import List, Literal, Optional, Set, Tuple
+from utils.export import StreamingExport
+from utils.intents import GatewayProfile, ensure_chunked
+
+# role.members needs the full member list: the guild is chunked the first time the command runs
+GATEWAY_PROFILE = GatewayProfile(intents=["members"], member_cache=["joined"])
+
+# Discord accepts at most this many attachments per message
+MAX_FILES_PER_MESSAGE = 10
 
 class RoleIDListerHybrid(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
 
+    @staticmethod
+    def _matching_ids(roles: List[discord.Role], match: str) -> Set[int]:
+        """Member IDs with all (or any) of the roles, computed on plain ID sets."""
+        id_sets = sorted(({member.id for member in role.members} for role in roles), key=len)
+        if match == "any":
+            return set().union(*id_sets)
+        # Intersecting from the smallest set keeps every step as small as possible
+        result = id_sets[0]
+        for ids in id_sets[1:]:
+            result = result.intersection(ids)
+        return result
+
+    @staticmethod
+    def _export_rows(guild: discord.Guild, member_ids: Set[int]) -> List[Tuple[int, str]]:
+        """(id, display name) rows, read from the member cache on the event loop."""
+        rows = []
+        for member_id in sorted(member_ids):
+            member = guild.get_member(member_id)
+            if member is not None:
+                rows.append((member_id, member.display_name))
+        return rows
+
+    @staticmethod
+    def _write_export(export: StreamingExport, rows: List[Tuple[int, str]]):
+        for member_id, name in rows:
+            export.write(member_id, name)
+        return export.finish()
+
     @commands.hybrid_command(name="list-id", description="Lists the IDs of all members with a specified role.")
     @commands.has_permissions(administrator=True)
-    @app_commands.describe(target_role="The role to list member IDs for")
-    async def list_member_ids(self, ctx: commands.Context, target_role: discord.Role):     
-        
+    @app_commands.describe(
+        target_role="The role to list member IDs for",
+        role_2="Another role to combine with the first one",
+        role_3="A third role to combine",
+        match="all = members with every role (default), any = members with at least one",
+        file_format="File format: plain, csv or json (default: plain)"
+    )
+    async def list_member_ids(self, ctx: commands.Context, target_role: discord.Role,
+                              role_2: Optional[discord.Role] = None, role_3: Optional[discord.Role] = None,
+                              match: Literal["all", "any"] = "all",
+                              file_format: Literal["plain", "csv", "json"] = "plain"):
+
         # 1. Defer the response
         await ctx.defer(ephemeral=False)
 
         if ctx.guild is None:
             await ctx.send("This command must be used in a server.", ephemeral=True)
             return
-        
-        # 2. Member ID extraction
-        member_info = []
-        for member in target_role.members:
-            member_info.append(f"ID: {member.id} | Name: {member.display_name} ")
-        member_count = len(member_info)
+
+        # 2. Member ID extraction (the member list is only requested the first time)
+        await ensure_chunked(ctx.guild)
+        roles = [role for role in (target_role, role_2, role_3) if role is not None]
+        roles = list({role.id: role for role in roles}.values())
+        member_ids = self._matching_ids(roles, match)
+        role_names = (" & " if match == "all" else " | ").join(role.name for role in roles)
+
+        if not member_ids:
+            await ctx.send(f"🤔 No members found with the role: **{role_names}**.")
+            return
 
         # 3. File Creation and Sending
-        if member_info:
-            
-            file_content = "\n".join(member_info)
-            buffer = io.StringIO(file_content)
-            
-            filename = f"members_{target_role.name.replace(' ', '_')}_ids.txt"
-            discord_file = discord.File(buffer, filename=filename)
+        # Names are read from the cache here; the thread only encodes the rows into size-capped
+        # (gzip or split) parts and never touches discord.py objects
+        basename = "members_" + "_".join(role.name.replace(' ', '_') for role in roles) + "_ids"
+        rows = self._export_rows(ctx.guild, member_ids)
+        export = StreamingExport(basename, file_format, limit=ctx.guild.filesize_limit)
+        try:
+            parts = await asyncio.to_thread(self._write_export, export, rows)
 
+            description = f"Found **{export.rows}** members. The list of names and IDs is attached below."
+            if export.gzipped:
+                description += "\nThe file is gzip-compressed to fit the upload limit."
+            if len(parts) > 1:
+                description += f"\nSplit into **{len(parts)}** files."
             embed = discord.Embed(
-                title=f"✅ Member List for Role: {target_role.name}",
-                description=f"Found **{member_count}** members. The list of names and IDs is attached below.",
+                title=f"✅ Member List for Role: {role_names}",
+                description=description,
                 color=discord.Color.green()
             )
-            
-            await ctx.send(embed=embed, file=discord_file)
-            
-        else:
-            response_message = f"🤔 No members found with the role: **{target_role.name}**."
-            await ctx.send(response_message)
-
-#   ---- Cog setup ----
+
+            files = [discord.File(fp, filename=filename) for filename, fp in parts]
+            await ctx.send(embed=embed, files=files[:MAX_FILES_PER_MESSAGE])
+            for start in range(MAX_FILES_PER_MESSAGE, len(files), MAX_FILES_PER_MESSAGE):
+                await ctx.send(files=files[start:start + MAX_FILES_PER_MESSAGE])
+        finally:
+            export.close()
+
+#   ---- Cog setup ----
 async def setup(bot: commands.Bot):
-    await bot.add_cog(RoleIDListerHybrid(bot))
\ No newline at end of file
+    await bot.add_cog(RoleIDListerHybrid(bot))
@@ -1,52 +1,132 @@
 import discord
 from discord import app_commands
-from discord.ext import commands, tasks
-from typing import Dict, Any, Optional
-import json
-import os
+from discord.ext import commands
+from typing import Dict, Any, Iterable, List, Mapping, Optional, Set, Tuple
+from datetime import datetime, timezone
+import asyncio
+from utils.storage import get_store
+from utils.guild_config import get_guild_configs
+from utils.sharding import owns_guild
+from utils.intents import GatewayProfile
+from utils.monitoring import BackgroundTasks
+
+# channel.members of the temporary channels comes from the voice states and the members in voice
+GATEWAY_PROFILE = GatewayProfile(intents=["voice_states"], member_cache=["voice"])
+
+# Pause between deletions of orphaned channels at startup (channel deletes are rate limited)
+ORPHAN_DELETE_DELAY = 1.0
+
+#   ---- Creation scheduler ----
+# Wait before creating, so members who join and leave right away don't get a channel
+JOIN_DEBOUNCE_SECONDS = 1.0
+# Channel creations in flight per guild (channel creation is rate limited per guild)
+CREATE_CONCURRENCY = 2
+# Hidden, pre-created channels kept ready per guild
+MAX_WARM_POOL_SIZE = 5
+POOL_CHANNEL_NAME = "Temporary channel"
 
 #   ---- TempVoice Cog ----
 class TempVoice(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.active_channels: Dict[int, int] = {}
-        self.config_data: Dict[str, Any] = self._load_config_data()
-        
-    #   ---- Database (JSON) ----
-    def _load_config_data(self) -> Dict[str, Optional[int]]:
-        if not os.path.exists('data'):
-            os.makedirs('data')
-        try:
-            with open('data/tempvoice_config.json', 'r') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            return {}
-        except json.JSONDecodeError:
-            print("Error: tempvoice_config.json corrupted, loaded in void.")
-            return {}
-    
-    def _save_config_data(self):
-        with open('data/tempvoice_config.json', 'w') as f:
-            json.dump(self.config_data, f, indent=4)
-    
-    def get_guild_config(self, guild_id: int) -> Dict[str, Any]:
-        default_config = {
+        self.store = get_store(bot)
+        self.guild_configs = get_guild_configs(bot, "tempvoice_config", self._default_config)
+        # channel_id -> {"guild_id", "owner_id", "created_at"}, persisted so restarts don't leak channels
+        # (with sharding, only the channels of this process' guilds: the others are not seen as stale)
+        self.active_channels: Dict[int, Dict[str, Any]] = {
+            int(k): v for k, v in self.store.load("tempvoice_channels").items() if owns_guild(bot, v["guild_id"])
+        }
+        self._reconciling = False
+        self.background = BackgroundTasks("TempVoice")
+
+        # Creation scheduler state
+        self._pending_joins: Set[Tuple[int, int]] = set()
+        self._create_slots: Dict[int, asyncio.Semaphore] = {}
+        self._warm_pools: Dict[int, List[int]] = {}
+        self._filling_pools: Set[int] = set()
+        for cid, entry in self.active_channels.items():
+            if entry.get("pooled"):
+                self._warm_pools.setdefault(entry["guild_id"], []).append(cid)
+
+    async def cog_load(self):
+        # When (re)loaded after startup, the listener below has already missed it
+        if self.bot.is_ready():
+            self.background.spawn(self.reconcile_channels(), name="tempvoice-reconcile")
+
+    async def cog_unload(self):
+        self.background.cancel_all()
+
+    #   ---- Database ----
+    def _save_channels(self, *channel_ids: int, removed: Iterable[int] = ()):
+        self.store.save("tempvoice_channels", self.active_channels, changed=channel_ids, removed=removed)
+
+    def _default_config(self, guild_id: int) -> Dict[str, Any]:
+        return {
             "creator_channel_id": None,
         }
-        guild_id_str = str(guild_id)
-        
-        if guild_id_str not in self.config_data:
-            self.config_data[guild_id_str] = default_config
-            self._save_config_data()
-        return self.config_data[guild_id_str]
+
+    def get_guild_config(self, guild_id: int) -> Mapping[str, Any]:
+        return self.guild_configs.get(guild_id)
     
     @commands.Cog.listener()
     async def on_guild_remove(self, guild: discord.Guild):
-        guild_id_str = str(guild.id)
-        if guild_id_str in self.config_data:
-            del self.config_data[guild_id_str]
-            self._save_config_data()
+        if self.guild_configs.remove(guild.id):
             print(f"TempVoice: Removed config for guild {guild.id} on bot removal.")
+
+        gone = [cid for cid, entry in self.active_channels.items() if entry["guild_id"] == guild.id]
+        for cid in gone:
+            del self.active_channels[cid]
+        if gone:
+            self._save_channels(removed=gone)
+        self._warm_pools.pop(guild.id, None)
+        self._create_slots.pop(guild.id, None)
+
+    #   ---- Startup reconciliation ----
+    @commands.Cog.listener()
+    async def on_ready(self):
+        await self.reconcile_channels()
+
+    async def reconcile_channels(self):
+        """Drops registry entries whose channel is gone and deletes empty temp channels left by a previous run."""
+        if self._reconciling:
+            return
+        self._reconciling = True
+        try:
+            stale, orphans = [], []
+            for cid, entry in self.active_channels.items():
+                guild = self.bot.get_guild(entry["guild_id"])
+                channel = guild.get_channel(cid) if guild else None
+                if channel is None:
+                    stale.append(cid)
+                elif entry.get("pooled"):
+                    # Warm pool channels are empty by design
+                    continue
+                elif isinstance(channel, discord.VoiceChannel) and len(channel.members) == 0:
+                    orphans.append(channel)
+
+            for cid in stale:
+                del self.active_channels[cid]
+            for guild_id, pool in self._warm_pools.items():
+                pool[:] = [cid for cid in pool if cid in self.active_channels]
+            if stale:
+                self._save_channels(removed=stale)
+                print(f"TempVoice: Dropped {len(stale)} temp channels that no longer exist.")
+
+            deleted = 0
+            for channel in orphans:
+                # Someone may have joined while we were pacing the deletions
+                if channel.id not in self.active_channels or len(channel.members) > 0:
+                    continue
+                if await self._delete_channel(channel):
+                    deleted += 1
+                await asyncio.sleep(ORPHAN_DELETE_DELAY)
+            if orphans:
+                print(f"TempVoice: Deleted {deleted}/{len(orphans)} empty temp channels left from a previous run.")
+
+            for guild in self.bot.guilds:
+                await self._fill_warm_pool(guild)
+        finally:
+            self._reconciling = False
             
     @commands.Cog.listener()
     async def on_voice_state_update(self, member: discord.Member, before: discord.VoiceState, after: discord.VoiceState):
@@ -61,12 +141,106 @@ class TempVoice(commands.Cog):
         if after.channel and after.channel.id == creator_channel_id:
             if member.bot or creator_channel_id is None:
                 return
-            await self._create_temporary_channel(member, after.channel)
+            self._schedule_creation(member, after.channel)
         
         # 2. Try to delete a temp channel
         if before.channel and before.channel.id in self.active_channels:
             await self._check_and_delete_channel(before.channel)
     
+    #   ---- Creation scheduler ----
+    def _schedule_creation(self, member: discord.Member, source_channel: discord.VoiceChannel):
+        key = (member.guild.id, member.id)
+        # Repeated joins of the same member collapse into one request
+        if key in self._pending_joins:
+            return
+        self._pending_joins.add(key)
+        self.background.spawn(self._run_creation(key, member, source_channel), name=f"tempvoice-create-{member.id}")
+
+    async def _run_creation(self, key: Tuple[int, int], member: discord.Member, source_channel: discord.VoiceChannel):
+        try:
+            await asyncio.sleep(JOIN_DEBOUNCE_SECONDS)
+            if not self._still_waiting(member, source_channel):
+                return
+
+            slots = self._create_slots.setdefault(member.guild.id, asyncio.Semaphore(CREATE_CONCURRENCY))
+            async with slots:
+                # The member may have left while queued
+                if self._still_waiting(member, source_channel):
+                    await self._create_temporary_channel(member, source_channel)
+        finally:
+            self._pending_joins.discard(key)
+        await self._fill_warm_pool(member.guild)
+
+    @staticmethod
+    def _still_waiting(member: discord.Member, source_channel: discord.VoiceChannel) -> bool:
+        return member.voice is not None and member.voice.channel is not None and member.voice.channel.id == source_channel.id
+
+    def _owner_overwrites(self, member: discord.Member) -> Dict:
+        return {
+            member.guild.default_role: discord.PermissionOverwrite(connect=True, view_channel=True),
+            member: discord.PermissionOverwrite(manage_channels=True, connect=True, view_channel=True)
+        }
+
+    def _register_channel(self, channel: discord.VoiceChannel, owner_id: Optional[int], pooled: bool = False):
+        entry = {
+            "guild_id": channel.guild.id,
+            "owner_id": owner_id,
+            "created_at": int(datetime.now(timezone.utc).timestamp())
+        }
+        if pooled:
+            entry["pooled"] = True
+        self.active_channels[channel.id] = entry
+        self._save_channels(channel.id)
+
+    async def _take_pooled_channel(self, member: discord.Member, name: str) -> Optional[discord.VoiceChannel]:
+        pool = self._warm_pools.get(member.guild.id)
+        while pool:
+            cid = pool.pop()
+            channel = member.guild.get_channel(cid)
+            if isinstance(channel, discord.VoiceChannel):
+                try:
+                    # A single edit turns the hidden channel into the member's channel
+                    await channel.edit(name=name, overwrites=self._owner_overwrites(member), reason="Temporary voice channel creation.")
+                    return channel
+                except discord.HTTPException as e:
+                    print(f"TempVoice Error: {e} while taking pooled channel {cid}.")
+                    # Unusable: deleted in the background (if that fails too, it stays registered
+                    # and goes back to the pool at the next start)
+                    self.background.spawn(self._delete_channel(channel), name=f"tempvoice-delete-{cid}")
+                    continue
+            # Gone: forget it and try the next one
+            if self.active_channels.pop(cid, None) is not None:
+                self._save_channels(removed=[cid])
+        return None
+
+    async def _fill_warm_pool(self, guild: discord.Guild):
+        guild_config = self.get_guild_config(guild.id)
+        size = min(guild_config.get("warm_pool_size", 0), MAX_WARM_POOL_SIZE)
+        pool = self._warm_pools.setdefault(guild.id, [])
+        if len(pool) >= size or guild.id in self._filling_pools:
+            return
+
+        creator = guild.get_channel(guild_config.get("creator_channel_id") or 0)
+        if creator is None:
+            return
+        slots = self._create_slots.setdefault(guild.id, asyncio.Semaphore(CREATE_CONCURRENCY))
+        self._filling_pools.add(guild.id)
+        try:
+            while len(pool) < size:
+                async with slots:
+                    channel = await guild.create_voice_channel(
+                        name=POOL_CHANNEL_NAME,
+                        category=creator.category,
+                        overwrites={guild.default_role: discord.PermissionOverwrite(view_channel=False, connect=False)},
+                        reason="Temporary voice channel pool.",
+                    )
+                self._register_channel(channel, owner_id=None, pooled=True)
+                pool.append(channel.id)
+        except Exception as e:
+            print(f"TempVoice Error: {e} while filling the channel pool in guild {guild.id}.")
+        finally:
+            self._filling_pools.discard(guild.id)
+
     async def _create_temporary_channel(self, member: discord.Member, source_channel: discord.VoiceChannel):
         guild = member.guild
         
@@ -74,24 +248,21 @@ class TempVoice(commands.Cog):
         new_channel_name = f"{member.display_name}'s Channel"
         category = source_channel.category
         try:    
-            #create the new voice channel
-            overwrites = {
-                guild.default_role: discord.PermissionOverwrite(connect=True, view_channel=True),
-                member: discord.PermissionOverwrite(manage_channels=True, connect=True, view_channel=True)
-            }
-
-            new_channel = await guild.create_voice_channel(
-                name=new_channel_name,
-                category=category,
-                overwrites=overwrites,
-                reason="Temporary voice channel creation.",
-            )
+            #take a pre-created channel if the pool has one, otherwise create the new voice channel
+            new_channel = await self._take_pooled_channel(member, new_channel_name)
+            if new_channel is None:
+                new_channel = await guild.create_voice_channel(
+                    name=new_channel_name,
+                    category=category,
+                    overwrites=self._owner_overwrites(member),
+                    reason="Temporary voice channel creation.",
+                )
+
+            #store the new channel in active channels (before moving, so it is never leaked)
+            self._register_channel(new_channel, owner_id=member.id)
 
             #move the member to the new channel
             await member.move_to(new_channel)
-
-            #store the new channel in active channels
-            self.active_channels[new_channel.id] = member.id
             print(f"TempVoice: Created temp channel {new_channel.id} for member {member.id} in guild {guild.id}.")
 
         except discord.Forbidden:
@@ -103,15 +274,47 @@ class TempVoice(commands.Cog):
     
     async def _check_and_delete_channel(self, channel: discord.VoiceChannel):
         if len(channel.members) == 0:
-            try:
-                await channel.delete(reason="Temporary voice channel deletion.")
-                del self.active_channels[channel.id]
-                print(f"TempVoice: Deleted temp channel {channel.id}.")
-                
-            except discord.Forbidden:
-                print(f"TempVoice Error: Missing permissions to delete channel {channel.id}.")
-            except Exception as e:
-                print(f"TempVoice Error: {e} while deleting channel {channel.id}.")
+            await self._delete_channel(channel)
+
+    async def _delete_channel(self, channel: discord.VoiceChannel) -> bool:
+        try:
+            await channel.delete(reason="Temporary voice channel deletion.")
+        except discord.NotFound:
+            # Already deleted by someone else
+            pass
+        except discord.Forbidden:
+            print(f"TempVoice Error: Missing permissions to delete channel {channel.id}.")
+            return False
+        except Exception as e:
+            print(f"TempVoice Error: {e} while deleting channel {channel.id}.")
+            return False
+
+        if self.active_channels.pop(channel.id, None) is not None:
+            self._save_channels(removed=[channel.id])
+        print(f"TempVoice: Deleted temp channel {channel.id}.")
+        return True
+
+
+    #   ---- Commands ----
+    @commands.hybrid_command(name="tempvoice-pool", description="Number of hidden temp channels kept ready for join bursts")
+    @commands.has_permissions(administrator=True)
+    @app_commands.describe(size=f"Channels to keep ready (0-{MAX_WARM_POOL_SIZE}, 0 to disable)")
+    async def tempvoice_pool(self, ctx: commands.Context, size: int):
+        if not (0 <= size <= MAX_WARM_POOL_SIZE):
+            return await ctx.send(f"Size must be between 0 and {MAX_WARM_POOL_SIZE}.", ephemeral=True)
+        await ctx.defer(ephemeral=True)
+
+        guild_config = self.guild_configs.edit(ctx.guild.id)
+        guild_config["warm_pool_size"] = size
+        self.guild_configs.save(ctx.guild.id)
+
+        pool = self._warm_pools.setdefault(ctx.guild.id, [])
+        while len(pool) > size:
+            channel = ctx.guild.get_channel(pool.pop())
+            if channel:
+                await self._delete_channel(channel)
+        await self._fill_warm_pool(ctx.guild)
+        await ctx.send(f"Temp channel pool size set to **{size}** ({len(pool)} ready).", ephemeral=True)
             
             
 #   ---- Setup function ----
@@ -1,6 +1,22 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
+import io
+import math
+from utils.metrics import (COMMAND_ERRORS, COMMAND_LATENCY, LEVEL_WRITES, LEVEL_WRITES_COALESCED, LISTENER_LATENCY,
+                           LOOP_LAG, REST_ERRORS, REST_LATENCY, REST_GLOBAL_RATE_LIMITED, REST_RATE_LIMITED, STORE_BYTES,
+                           STORE_WRITES, STORE_WRITES_COALESCED, TASK_DURATION, Histogram)
+from utils.sharding import shard_latencies
+from utils.intents import GatewayProfile
+from utils.extensions import sync_command_tree
+
+# Interactions arrive without any intent (prefix commands are covered by PREFIX_COMMANDS)
+GATEWAY_PROFILE = GatewayProfile()
+
+# Rows shown per section of /botstats; the attached file has everything
+BOTSTATS_TOP = 5
+# Shards listed by /ping (the guild's own shard is always shown)
+PING_MAX_SHARDS = 16
 
 class GlobalCommands(commands.Cog):
     def __init__(self, bot):
@@ -9,7 +25,24 @@ class GlobalCommands(commands.Cog):
     @app_commands.command(name="ping", description="Tests the bot's responsiveness")
     async def ping(self, interaction: discord.Interaction):
         latency = round(self.bot.latency * 1000)
-        await interaction.response.send_message(f"**Pong!** | Latency: **{latency}ms**")
+        message = f"**Pong!** | Latency: **{latency}ms**"
+        latencies = shard_latencies(self.bot)
+        if isinstance(self.bot, commands.AutoShardedBot):
+            current = interaction.guild.shard_id if interaction.guild else None
+            shown = [(sid, lat) for sid, lat in latencies if sid == current]
+            shown += [(sid, lat) for sid, lat in latencies if sid != current][:PING_MAX_SHARDS - len(shown)]
+            parts = []
+            for sid, lat in shown:
+                text = f"#{sid} {round(lat * 1000)}ms" if math.isfinite(lat) else f"#{sid} connecting"
+                # The shard serving this guild is in bold
+                parts.append(f"**{text}**" if sid == current else text)
+            message += "\nShards: " + " | ".join(parts)
+            if len(latencies) > len(shown):
+                message += f" (+{len(latencies) - len(shown)} more)"
+        loop_monitor = getattr(self.bot, "loop_monitor", None)
+        if loop_monitor:
+            message += f"\nEvent loop lag: {loop_monitor.summary()}"
+        await interaction.response.send_message(message)
 
     @app_commands.command(name="serverinfo", description="Displays basic information about the server")
     async def serverinfo(self, interaction: discord.Interaction):
@@ -25,7 +58,7 @@ class GlobalCommands(commands.Cog):
                 invite_link = config["invite_link"]
 
         embed = discord.Embed(title=f"Info about {guild.name}", color=discord.Color.blue())
-        embed.add_field(name="Owner", value=guild.owner.mention, inline=True)
+        embed.add_field(name="Owner", value=f"<@{guild.owner_id}>", inline=True)
         embed.add_field(name="Members", value=guild.member_count, inline=True)
         embed.add_field(name="Server ID", value=guild.id, inline=False)
         embed.add_field(name="Created", value=f"<t:{int(guild.created_at.timestamp())}:D>", inline=False)
@@ -38,11 +71,75 @@ class GlobalCommands(commands.Cog):
     async def sync(self, ctx: commands.Context):
         initial_msg = await ctx.send("⏳ Syncing slash commands...", ephemeral=True)
         try:
-            synced = await self.bot.tree.sync()
-            await initial_msg.edit(content=f"✅ {len(synced)} Slash commands synced successfully!")
+            # Also stores the tree's hash, so the next startup does not sync it again
+            synced = await sync_command_tree(self.bot, force=True)
+            await initial_msg.edit(content=f"✅ {synced} Slash commands synced successfully!")
         except Exception as e:
             await initial_msg.edit(content=f"❌ Failed to sync slash commands: {e}")
             print(f"Error syncing commands: {e}")
+
+    @staticmethod
+    def _latency_lines(histogram: Histogram) -> str:
+        # Slowest in total first: that is where the time goes
+        children = sorted((item for item in histogram.collect() if item[1].count),
+                          key=lambda item: item[1].sum, reverse=True)[:BOTSTATS_TOP]
+        lines = [
+            f"`{labels[0][:40]}` {child.count}× · p50 {child.quantile(0.5) * 1000:.1f}ms · "
+            f"p99 {child.quantile(0.99) * 1000:.1f}ms"
+            for labels, child in children
+        ]
+        return "\n".join(lines) or "No data yet"
+
+    @commands.hybrid_command(name="botstats", description="Show the bot's internal metrics (owner only)")
+    @commands.is_owner()
+    async def botstats(self, ctx: commands.Context):
+        metrics = getattr(self.bot, "metrics", None)
+        if metrics is None:
+            await ctx.send("Metrics are not enabled on this bot.", ephemeral=True)
+            return
+
+        embed = discord.Embed(title="📊 Bot stats", color=discord.Color.blurple())
+        embed.add_field(name="Listeners", value=self._latency_lines(LISTENER_LATENCY), inline=False)
+        embed.add_field(name="Commands", value=self._latency_lines(COMMAND_LATENCY) +
+                        f"\nFailed: **{COMMAND_ERRORS.total():.0f}**", inline=False)
+        embed.add_field(name="Background tasks", value=self._latency_lines(TASK_DURATION), inline=False)
+
+        rest_calls = sum(child.count for _, child in REST_LATENCY.collect())
+        embed.add_field(
+            name="REST",
+            value=f"Calls: **{rest_calls}** · errors: **{REST_ERRORS.total():.0f}** · "
+                  f"429s: **{REST_RATE_LIMITED.total():.0f}** (global: {REST_GLOBAL_RATE_LIMITED.total():.0f})\n"
+                  + self._latency_lines(REST_LATENCY),
+            inline=False
+        )
+
+        storage = {}
+        for (backend, _), child in STORE_WRITES.collect():
+            storage.setdefault(backend, [0, 0])[0] += child.value
+        for (backend, _), child in STORE_BYTES.collect():
+            storage.setdefault(backend, [0, 0])[1] += child.value
+        embed.add_field(
+            name="Storage",
+            value=("\n".join(f"{backend}: **{writes:.0f}** writes, **{written / 1024:.1f}** KiB"
+                             for backend, (writes, written) in storage.items()) or "No writes yet")
+                  + f"\nCoalesced: **{STORE_WRITES_COALESCED.total():.0f}** queued writes"
+                  + f"\nXP flushes: **{LEVEL_WRITES.total():.0f}** (**{LEVEL_WRITES_COALESCED.total():.0f}** changes batched)",
+            inline=True
+        )
+
+        caches = metrics.get("bot_cache_size")
+        if caches:
+            embed.add_field(name="Caches", value="\n".join(f"{labels[0]}: **{child.value}**"
+                                                         for labels, child in caches.collect()), inline=True)
+
+        loop_monitor = getattr(self.bot, "loop_monitor", None)
+        lag = f"p99 {LOOP_LAG.labels().quantile(0.99) * 1000:.1f}ms"
+        if loop_monitor:
+            lag = f"{loop_monitor.summary()} | {lag}"
+        embed.add_field(name="Event loop lag", value=lag, inline=False)
+
+        file = discord.File(io.BytesIO(metrics.render().encode()), filename="metrics.txt")
+        await ctx.send(embed=embed, file=file, ephemeral=True)
             
 async def setup(bot):
     await bot.add_cog(GlobalCommands(bot))
\ No newline at end of file
@@ -0,0 +1,143 @@
+import csv
+import gzip
+import io
+import json
+import tempfile
+from typing import BinaryIO, List, Optional, Tuple
+
+EXPORT_FORMATS = ("plain", "csv", "json")
+# Parts are kept in memory up to this size, then spill to a temp file on disk
+SPOOL_MAX_BYTES = 4 * 1024 * 1024
+# zlib holds back output until it is flushed: at most the bytes written since the last flush,
+# plus block markers and the gzip trailer
+GZIP_FLUSH_OVERHEAD = 64
+# Smallest accepted part size (a part must hold at least a few rows)
+MIN_LIMIT = 1024
+
+
+class StreamingExport:
+    """Writes (member_id, name) rows straight into bounded parts.
+
+    Every row is encoded and written as it comes; no encoded copy of the whole file is built.
+    With compress="auto" the output switches to gzip as soon as it would not fit in one
+    attachment; a part that would still exceed `limit` bytes is closed and a new one started.
+    """
+
+    def __init__(self, basename: str, fmt: str = "plain", limit: int = 25 * 1024 * 1024, compress: str = "auto"):
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format: {fmt}")
+        if limit < MIN_LIMIT:
+            raise ValueError(f"The part size limit must be at least {MIN_LIMIT} bytes")
+        self.basename = basename
+        self.fmt = fmt
+        self.limit = limit
+        self.compress = compress
+        self.gzipped = compress == "always"
+        self.rows = 0
+        self._parts: List[BinaryIO] = []
+        self._raw: Optional[BinaryIO] = None
+        self._out = None
+        self._rows_in_part = 0
+        # Uncompressed bytes written to the gzip stream since it was last flushed
+        self._pending = 0
+        self._csv_buffer = io.StringIO()
+        self._csv_writer = csv.writer(self._csv_buffer)
+
+    # ---- Encoding ----
+    def _header(self) -> bytes:
+        if self.fmt == "csv":
+            return self._csv_line("id", "name")
+        if self.fmt == "json":
+            return b"[\n"
+        return b""
+
+    def _footer(self) -> bytes:
+        return b"\n]\n" if self.fmt == "json" else b""
+
+    def _csv_line(self, *values) -> bytes:
+        self._csv_buffer.seek(0)
+        self._csv_buffer.truncate()
+        self._csv_writer.writerow(values)
+        return self._csv_buffer.getvalue().encode("utf-8")
+
+    def _encode(self, member_id: int, name: str) -> bytes:
+        if self.fmt == "csv":
+            return self._csv_line(member_id, name)
+        if self.fmt == "json":
+            row = json.dumps({"id": str(member_id), "name": name}, ensure_ascii=False).encode("utf-8")
+            return row if self._rows_in_part == 0 else b",\n" + row
+        return f"ID: {member_id} | Name: {name}\n".encode("utf-8")
+
+    # ---- Parts ----
+    def _part_size(self) -> int:
+        """Upper bound of the current part's final size."""
+        size = self._raw.tell()
+        return size + self._pending + GZIP_FLUSH_OVERHEAD if self.gzipped else size
+
+    def _fits(self, row: bytes) -> bool:
+        return self._part_size() + len(row) + len(self._footer()) <= self.limit
+
+    def _open_part(self):
+        self._raw = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+        self._out = gzip.GzipFile(fileobj=self._raw, mode="wb", mtime=0) if self.gzipped else self._raw
+        self._rows_in_part = 0
+        header = self._header()
+        self._out.write(header)
+        self._pending = len(header)
+
+    def _close_part(self):
+        self._out.write(self._footer())
+        if self._out is not self._raw:
+            self._out.close()
+        self._raw.seek(0)
+        self._parts.append(self._raw)
+        self._raw = self._out = None
+
+    def _switch_to_gzip(self):
+        """Re-encodes the current (first) part compressed; it is at most `limit` bytes."""
+        plain = self._raw
+        plain.seek(0)
+        self.gzipped = True
+        self._raw = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+        self._out = gzip.GzipFile(fileobj=self._raw, mode="wb", mtime=0)
+        while chunk := plain.read(64 * 1024):
+            self._out.write(chunk)
+        self._pending = plain.tell()
+        plain.close()
+
+    def write(self, member_id: int, name: str):
+        if self._raw is None:
+            self._open_part()
+        row = self._encode(member_id, name)
+        if not self._fits(row) and self._rows_in_part:
+            if self.compress == "auto" and not self.gzipped and not self._parts:
+                self._switch_to_gzip()
+            if self.gzipped and self._pending:
+                # Near the limit: flushing what zlib holds back gives the exact size written so far
+                self._out.flush()
+                self._pending = 0
+            if not self._fits(row):
+                self._close_part()
+                self._open_part()
+                row = self._encode(member_id, name)
+        self._out.write(row)
+        self._pending += len(row)
+        self._rows_in_part += 1
+        self.rows += 1
+
+    def finish(self) -> List[Tuple[str, BinaryIO]]:
+        """Closes the last part; returns (filename, file) pairs rewound to the start."""
+        if self._raw is not None:
+            self._close_part()
+        extension = {"plain": "txt", "csv": "csv", "json": "json"}[self.fmt]
+        if self.gzipped:
+            extension += ".gz"
+        if len(self._parts) == 1:
+            return [(f"{self.basename}.{extension}", self._parts[0])]
+        return [(f"{self.basename}.part{index}.{extension}", part) for index, part in enumerate(self._parts, 1)]
+
+    def close(self):
+        for part in self._parts:
+            part.close()
+        if self._raw is not None:
+            self._raw.close()
@@ -0,0 +1,101 @@
+import asyncio
+import hashlib
+import importlib
+import json
+import time
+from typing import Dict, Iterable, List, Optional
+
+from discord.ext import commands
+
+from utils.storage import get_store
+
+# Stored per application ID: {"hash", "commands", "synced_at"}
+COMMAND_TREE_NAMESPACE = "command_tree"
+
+# Seconds the first import of each extension module took (its dependencies included)
+IMPORT_TIMES: Dict[str, float] = {}
+
+
+#   ---- Loading ----
+def import_extension(name: str):
+    """Imports an extension module, recording how long the first import took."""
+    if name in IMPORT_TIMES:
+        return importlib.import_module(name)
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    IMPORT_TIMES[name] = time.perf_counter() - start
+    return module
+
+
+class ExtensionTiming:
+    __slots__ = ("name", "import_seconds", "setup_seconds", "error")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.import_seconds = 0.0
+        # load_extension: the module body runs again, then setup() and the cogs' cog_load
+        self.setup_seconds = 0.0
+        self.error: Optional[Exception] = None
+
+
+async def load_extensions(bot: commands.Bot, extensions: Iterable[str]) -> List[ExtensionTiming]:
+    """Loads independent extensions concurrently; a failing one does not stop the others.
+
+    Meant for setup_hook, which runs once per process (on_ready runs again after every reconnect).
+    """
+    async def load(name: str) -> ExtensionTiming:
+        timing = ExtensionTiming(name)
+        try:
+            import_extension(name)
+            timing.import_seconds = IMPORT_TIMES.get(name, 0.0)
+            start = time.perf_counter()
+            await bot.load_extension(name)
+            timing.setup_seconds = time.perf_counter() - start
+        except Exception as e:
+            timing.error = e
+        return timing
+
+    return list(await asyncio.gather(*(load(name) for name in extensions)))
+
+
+def timing_report(timings: List[ExtensionTiming], elapsed: float) -> str:
+    loaded = sum(1 for timing in timings if timing.error is None)
+    lines = [f"Extensions: {loaded}/{len(timings)} loaded in {elapsed * 1000:.0f}ms"]
+    for timing in sorted(timings, key=lambda t: t.import_seconds + t.setup_seconds, reverse=True):
+        if timing.error is not None:
+            lines.append(f"  {timing.name:<22} FAILED: {timing.error}")
+        else:
+            lines.append(f"  {timing.name:<22} import {timing.import_seconds * 1000:7.1f}ms   "
+                         f"setup {timing.setup_seconds * 1000:7.1f}ms")
+    return "\n".join(lines)
+
+
+#   ---- Command tree sync ----
+def command_tree_hash(tree) -> str:
+    """SHA-256 of the global commands exactly as tree.sync() would upload them."""
+    payload = sorted((command.to_dict(tree) for command in tree.get_commands()),
+                     key=lambda command: (command.get("type", 1), command["name"]))
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+
+async def sync_command_tree(bot: commands.Bot, force: bool = False) -> Optional[int]:
+    """Syncs the global commands only if they changed since the last sync (global syncs are heavily rate limited).
+
+    Returns the number of synced commands, or None when nothing was sent.
+    """
+    plan = getattr(bot, "shard_plan", None)
+    if not force and plan is not None and plan.partial and 0 not in plan.shard_ids:
+        # Global commands belong to the application: with several processes, the one running shard 0 syncs them
+        return None
+
+    store = get_store(bot)
+    key = str(bot.application_id)
+    digest = command_tree_hash(bot.tree)
+    synced_trees = store.load(COMMAND_TREE_NAMESPACE)
+    if not force and synced_trees.get(key, {}).get("hash") == digest:
+        return None
+
+    synced = await bot.tree.sync()
+    synced_trees[key] = {"hash": digest, "commands": len(synced), "synced_at": int(time.time())}
+    store.save(COMMAND_TREE_NAMESPACE, synced_trees, changed=[key])
+    return len(synced)
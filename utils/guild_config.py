@@ -0,0 +1,103 @@
+import copy
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Mapping, Optional
+
+from utils.sharding import owns_guild
+from utils.storage import get_store
+
+
+def _freeze(value: Any) -> Any:
+    """Read-only copy of a JSON-like value (dicts become mapping proxies, lists become tuples)."""
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+class GuildConfigs:
+    """Per-guild configuration of one namespace of the store.
+
+    A record is only created by `edit`, and only persisted by `save`.
+    Read-only views are cached per guild and invalidated by `edit`, `save` and `remove`.
+    With `owns` (sharding), only the records of the guilds it accepts are loaded.
+    """
+
+    def __init__(self, store, namespace: str, defaults: Callable[[int], Dict[str, Any]],
+                 owns: Optional[Callable[[str], bool]] = None):
+        self.store = store
+        self.namespace = namespace
+        self._defaults = defaults
+        records = store.load(namespace)
+        if owns is not None:
+            records = {gid: record for gid, record in records.items() if owns(gid)}
+        self._records: Dict[str, Dict[str, Any]] = records
+        self._views: Dict[str, Mapping[str, Any]] = {}
+        self._default_view = None
+
+    def __contains__(self, guild_id) -> bool:
+        return str(guild_id) in self._records
+
+    def get(self, guild_id) -> Mapping[str, Any]:
+        """Read-only view of the guild's record, or of the defaults if it has none. Never writes."""
+        gid = str(guild_id)
+        view = self._views.get(gid)
+        if view is None:
+            record = self._records.get(gid)
+            if record is None:
+                # Defaults don't depend on the guild for read-only purposes, so one view is shared
+                if self._default_view is None:
+                    self._default_view = _freeze(self._defaults(0))
+                return self._default_view
+            view = self._views[gid] = _freeze(record)
+        return view
+
+    def edit(self, guild_id) -> Dict[str, Any]:
+        """Mutable record of the guild, created from the defaults on first use. Call `save` after changing it."""
+        gid = str(guild_id)
+        record = self._records.get(gid)
+        if record is None:
+            record = self._records[gid] = copy.deepcopy(self._defaults(int(gid)))
+        self._views.pop(gid, None)
+        return record
+
+    def save(self, *guild_ids):
+        gids = [str(gid) for gid in guild_ids]
+        for gid in gids:
+            self._views.pop(gid, None)
+        self.store.save(self.namespace, self._records, changed=gids)
+
+    def invalidate(self, guild_id=None):
+        if guild_id is None:
+            self._views.clear()
+        else:
+            self._views.pop(str(guild_id), None)
+
+    def remove(self, guild_id) -> bool:
+        gid = str(guild_id)
+        self._views.pop(gid, None)
+        if self._records.pop(gid, None) is None:
+            return False
+        self.store.save(self.namespace, self._records, changed=(), removed=[gid])
+        return True
+
+
+#   ---- Shared instances ----
+def get_guild_configs(bot, namespace: str, defaults: Callable[[int], Dict[str, Any]]) -> GuildConfigs:
+    """Returns the bot's GuildConfigs of a namespace, creating it on first use (like `get_store`).
+
+    Every user of a namespace (its cog, the dashboard) and a reloaded cog share the same records
+    and cached views. Only the records of this process' guilds are loaded (see `owns_guild`).
+    """
+    shared = getattr(bot, "guild_configs", None)
+    if shared is None:
+        shared = bot.guild_configs = {}
+    configs = shared.get(namespace)
+    if configs is None:
+        configs = shared[namespace] = GuildConfigs(get_store(bot), namespace, defaults,
+                                                   owns=lambda gid: owns_guild(bot, gid))
+    else:
+        # A reloaded cog brings its own defaults
+        configs._defaults = defaults
+        configs._default_view = None
+    return configs
@@ -0,0 +1,125 @@
+import os
+from typing import Iterable
+
+import discord
+
+from utils.extensions import import_extension
+
+# Recent messages kept by discord.py when a feature asks for them (its own default)
+MESSAGE_CACHE_SIZE = 1000
+MEMBER_CACHE_FLAGS = ("joined", "voice")
+# MemberCacheFlags that discord.py refuses without the matching intent
+CACHE_REQUIRES = {"joined": "members", "voice": "voice_states"}
+
+
+#   ---- Profiles ----
+class GatewayProfile:
+    """What one feature needs from the gateway, declared next to the code that uses it.
+
+    - intents: names of `discord.Intents` flags (guilds is always on)
+    - member_cache: names of `discord.MemberCacheFlags` flags ("joined", "voice")
+    - chunk_at_startup: every member of every guild is requested at login and cached;
+      without it a guild is only chunked by a feature that calls `ensure_chunked`
+    - message_cache: keep recent messages (only needed for edit/delete events on old messages)
+    """
+    __slots__ = ("intents", "member_cache", "chunk_at_startup", "message_cache")
+
+    def __init__(self, intents: Iterable[str] = (), member_cache: Iterable[str] = (),
+                 chunk_at_startup: bool = False, message_cache: bool = False):
+        self.intents = frozenset(intents) | {"guilds"}
+        self.member_cache = frozenset(member_cache)
+        self.chunk_at_startup = chunk_at_startup
+        self.message_cache = message_cache
+
+        unknown = [name for name in self.intents if name not in discord.Intents.VALID_FLAGS]
+        unknown += [name for name in self.member_cache if name not in MEMBER_CACHE_FLAGS]
+        if unknown:
+            raise ValueError(f"Unknown intents or member cache flags: {', '.join(sorted(unknown))}")
+        for flag in self.member_cache:
+            if CACHE_REQUIRES[flag] not in self.intents:
+                raise ValueError(f"The '{flag}' member cache needs the '{CACHE_REQUIRES[flag]}' intent.")
+        if chunk_at_startup and "members" not in self.intents:
+            raise ValueError("Chunking guilds needs the 'members' intent.")
+
+    def __or__(self, other: "GatewayProfile") -> "GatewayProfile":
+        return GatewayProfile(self.intents | other.intents, self.member_cache | other.member_cache,
+                              self.chunk_at_startup or other.chunk_at_startup,
+                              self.message_cache or other.message_cache)
+
+    def build_intents(self) -> discord.Intents:
+        return discord.Intents(**{name: True for name in self.intents})
+
+    def build_member_cache(self) -> discord.MemberCacheFlags:
+        flags = discord.MemberCacheFlags.none()
+        for name in self.member_cache:
+            setattr(flags, name, True)
+        return flags
+
+    def bot_options(self) -> dict:
+        """Keyword arguments for `commands.Bot` / `ShardPlan.create_bot`.
+
+        GATEWAY_INTENTS = all in the environment restores discord.py's defaults with every intent.
+        """
+        if os.getenv("GATEWAY_INTENTS", "").strip().lower() == "all":
+            return {"intents": discord.Intents.all()}
+        return {
+            "intents": self.build_intents(),
+            "member_cache_flags": self.build_member_cache(),
+            "chunk_guilds_at_startup": self.chunk_at_startup,
+            "max_messages": MESSAGE_CACHE_SIZE if self.message_cache else None,
+        }
+
+    def describe(self) -> str:
+        intents = ", ".join(sorted(self.intents))
+        cache = ", ".join(sorted(self.member_cache)) or "none"
+        chunking = "at startup" if self.chunk_at_startup else "not at startup"
+        return f"intents: {intents} | member cache: {cache} | chunking: {chunking}"
+
+
+# The bot also answers "/" prefix commands, which are read from the message content
+PREFIX_COMMANDS = GatewayProfile(intents=["guild_messages", "message_content"])
+
+# Assumed for extensions that do not declare a profile: discord.py's default (non-privileged) intents
+UNDECLARED_PROFILE = GatewayProfile(
+    intents=[name for name, enabled in discord.Intents.default() if enabled],
+    member_cache=["voice"],
+    message_cache=True
+)
+
+
+def extension_profile(extension: str) -> GatewayProfile:
+    """The GATEWAY_PROFILE declared at the top of an extension module.
+
+    Only imports the module (no cog is created), so it can run before the bot exists.
+    """
+    module = import_extension(extension)
+    profile = getattr(module, "GATEWAY_PROFILE", None)
+    if profile is None:
+        print(f"Intents: {extension} declares no GATEWAY_PROFILE, assuming the default intents.")
+        return UNDECLARED_PROFILE
+    return profile
+
+
+def gateway_profile(extensions: Iterable[str], *extra: GatewayProfile) -> GatewayProfile:
+    """Smallest profile covering the given extensions and any extra features of the entry point."""
+    profile = GatewayProfile()
+    for extension in extensions:
+        profile |= extension_profile(extension)
+    for feature in extra:
+        profile |= feature
+    return profile
+
+
+#   ---- On-demand chunking ----
+async def ensure_chunked(guild: discord.Guild) -> bool:
+    """Requests the guild's full member list if it is not cached yet.
+
+    Returns False when the members intent is off (the cache stays partial).
+    """
+    if guild.chunked:
+        return True
+    if not guild._state._intents.members:
+        return False
+    await guild.chunk(cache=True)
+    return True
+
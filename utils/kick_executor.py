@@ -0,0 +1,88 @@
+import asyncio
+import time
+from typing import Dict, List
+
+import discord
+
+DEFAULT_GUILD_CONCURRENCY = 2
+
+
+class KickSummary:
+    __slots__ = ("kicked", "forbidden", "failed", "rate_limited", "dry_run", "duration", "retry")
+
+    def __init__(self, dry_run: bool):
+        self.kicked = 0
+        self.forbidden = 0
+        self.failed = 0
+        self.rate_limited = 0
+        self.dry_run = dry_run
+        self.duration = 0.0
+        # Members that could not be kicked and should be tried again on the next run
+        self.retry: List[discord.Member] = []
+
+    def __str__(self) -> str:
+        action = "would kick" if self.dry_run else "kicked"
+        return (f"{action} {self.kicked} | forbidden {self.forbidden} | failed {self.failed} | "
+                f"rate limited {self.rate_limited} | {self.duration:.1f}s")
+
+
+class KickExecutor:
+    """Kicks members of several guilds concurrently.
+
+    Guilds run in parallel; inside a guild at most `per_guild_concurrency` kicks are in flight,
+    because the kick route is rate limited per guild. discord.py already waits out 429s,
+    anything that still fails with 429 is counted and retried on the next run.
+    """
+
+    def __init__(self, per_guild_concurrency: int = DEFAULT_GUILD_CONCURRENCY, dry_run: bool = False):
+        self.per_guild_concurrency = per_guild_concurrency
+        self.dry_run = dry_run
+
+    async def run(self, batches: Dict[discord.Guild, List[discord.Member]], reason: str) -> KickSummary:
+        summary = KickSummary(self.dry_run)
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            self._kick_guild(guild, members, reason, summary)
+            for guild, members in batches.items() if members
+        ))
+        summary.duration = time.perf_counter() - start
+        return summary
+
+    async def _kick_guild(self, guild: discord.Guild, members: List[discord.Member], reason: str, summary: KickSummary):
+        semaphore = asyncio.Semaphore(self.per_guild_concurrency)
+
+        async def kick(member: discord.Member):
+            async with semaphore:
+                await self._kick(guild, member, reason, summary)
+
+        await asyncio.gather(*(kick(member) for member in members))
+
+    async def _kick(self, guild: discord.Guild, member: discord.Member, reason: str, summary: KickSummary):
+        if self.dry_run:
+            print(f"[Dry run] Would kick {member.name} ({member.id}) from server '{guild.name}'")
+            summary.kicked += 1
+            summary.retry.append(member)
+            return
+
+        try:
+            print(f"Kicking {member.name} ({member.id}) from server '{guild.name}'")
+            await member.kick(reason=reason)
+            summary.kicked += 1
+        except discord.Forbidden:
+            print(f"Error: I can't kick {member.name} from the server '{guild.name}'")
+            summary.forbidden += 1
+            summary.retry.append(member)
+        except discord.NotFound:
+            # Already gone
+            pass
+        except discord.HTTPException as e:
+            if e.status == 429:
+                summary.rate_limited += 1
+            else:
+                print(f"Error while kicking {member.name}: {e}")
+                summary.failed += 1
+            summary.retry.append(member)
+        except Exception as e:
+            print(f"Error while kicking {member.name}: {e}")
+            summary.failed += 1
+            summary.retry.append(member)
@@ -0,0 +1,94 @@
+import heapq
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import discord
+
+from utils.intents import GatewayProfile
+
+# Kept current by member events; each guild's member list is listed once (and not cached) by the kick task
+GATEWAY_PROFILE = GatewayProfile(intents=["members"], member_cache=["joined"])
+
+
+class UnassignedMemberIndex:
+    """Per-guild heap of members that only have @everyone, ordered by join time.
+
+    Kept current from gateway events, so a sweep only touches members whose deadline has passed.
+    Removals are lazy: stale heap entries are skipped when popped.
+    """
+
+    def __init__(self):
+        self._heaps: Dict[int, List[Tuple[float, int]]] = {}
+        self._candidates: Dict[int, Dict[int, float]] = {}
+        # Guilds indexed from their full member list (not just the members cached so far)
+        self._complete: Set[int] = set()
+
+    @staticmethod
+    def is_candidate(member: discord.Member) -> bool:
+        return not member.bot and len(member.roles) <= 1 and member.joined_at is not None
+
+    def __len__(self) -> int:
+        return sum(len(candidates) for candidates in self._candidates.values())
+
+    def rebuild_guild(self, guild: discord.Guild, members: Optional[Iterable[discord.Member]] = None):
+        """Indexes a guild from its full member list if given, otherwise from the member cache (no REST calls)."""
+        source = guild.members if members is None else members
+        candidates = {m.id: m.joined_at.timestamp() for m in source if self.is_candidate(m)}
+        heap = [(joined, member_id) for member_id, joined in candidates.items()]
+        heapq.heapify(heap)
+        self._candidates[guild.id] = candidates
+        self._heaps[guild.id] = heap
+        if members is not None or guild.chunked:
+            self._complete.add(guild.id)
+        else:
+            self._complete.discard(guild.id)
+
+    async def index_guild(self, guild: discord.Guild):
+        """Indexes a guild from its full member list.
+
+        Unless the guild is already cached, the members are listed over REST (1000 per request)
+        and only the candidates are kept; nothing is added to the member cache. (A gateway chunk
+        would always be cached while the "joined" member cache is on.)
+        """
+        if guild.chunked:
+            self.rebuild_guild(guild)
+        else:
+            self.rebuild_guild(guild, [m async for m in guild.fetch_members(limit=None) if self.is_candidate(m)])
+
+    def is_complete(self, guild_id: int) -> bool:
+        return guild_id in self._complete
+
+    def remove_guild(self, guild_id: int):
+        self._candidates.pop(guild_id, None)
+        self._heaps.pop(guild_id, None)
+        self._complete.discard(guild_id)
+
+    def add(self, member: discord.Member):
+        joined = member.joined_at.timestamp()
+        self._candidates.setdefault(member.guild.id, {})[member.id] = joined
+        heapq.heappush(self._heaps.setdefault(member.guild.id, []), (joined, member.id))
+
+    def discard(self, guild_id: int, member_id: int):
+        candidates = self._candidates.get(guild_id)
+        if candidates:
+            candidates.pop(member_id, None)
+
+    def update(self, member: discord.Member):
+        """Adds or removes a member after a join or a role change."""
+        if self.is_candidate(member):
+            if member.id not in self._candidates.get(member.guild.id, {}):
+                self.add(member)
+        else:
+            self.discard(member.guild.id, member.id)
+
+    def pop_expired(self, guild_id: int, deadline: float) -> List[int]:
+        """Removes and returns the IDs of candidates that joined before `deadline` (epoch seconds)."""
+        heap = self._heaps.get(guild_id)
+        candidates = self._candidates.get(guild_id)
+        expired = []
+        while heap and heap[0][0] < deadline:
+            joined, member_id = heapq.heappop(heap)
+            # Skip entries for members that got a role, left, or were re-added later
+            if candidates.get(member_id) == joined:
+                del candidates[member_id]
+                expired.append(member_id)
+        return expired
@@ -0,0 +1,422 @@
+import functools
+import logging
+import math
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+# Upper bounds in seconds; a final +Inf bucket is always added
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+#   ---- Metric types ----
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self._children[()] = self._new_child()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """The child for these label values; cached, so hot paths only pay a dict lookup."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(tuple(str(v) for v in values), self._new_child())
+                self._children[values] = child
+        return child
+
+    def _samples(self):
+        seen = set()
+        for values, child in list(self._children.items()):
+            if id(child) in seen:
+                continue
+            seen.add(id(child))
+            yield tuple(str(v) for v in values), child
+
+    def collect(self) -> List[Tuple[Tuple[str, ...], object]]:
+        """(label values, child) pairs; children have `.value`, or `.count`/`.sum`/`.quantile()` for histograms."""
+        return list(self._samples())
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in sorted(self._samples()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+    def _render_child(self, values, child) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"]
+
+
+class _Value:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        # Storage counters are updated from the persistence threads
+        with self._lock:
+            self.value += amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0):
+        self._default.inc(amount)
+
+    def total(self) -> float:
+        return sum(child.value for _, child in self._samples())
+
+
+class Gauge(_Metric):
+    """A settable value, or one read from `callback` at scrape time (free on the hot paths).
+
+    The callback returns a number, or a {label value(s): number} dict for labelled gauges.
+    """
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 callback: Optional[Callable[[], Union[float, Dict]]] = None):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def _new_child(self):
+        return _Value()
+
+    def set(self, value: float):
+        self._default.set(value)
+
+    def _samples(self):
+        if self.callback is None:
+            yield from super()._samples()
+            return
+        try:
+            result = self.callback()
+        except Exception as e:
+            print(f"[Metrics] Error reading gauge {self.name}: {e}")
+            return
+        if not isinstance(result, dict):
+            value = _Value()
+            value.value = result
+            yield (), value
+            return
+        for key, number in result.items():
+            value = _Value()
+            value.value = number
+            yield tuple(str(k) for k in (key if isinstance(key, tuple) else (key,))), value
+
+
+class _HistogramValue:
+    __slots__ = ("bounds", "counts", "sum", "count", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self) -> "_Timer":
+        return _Timer(self)
+
+    def quantile(self, q: float) -> float:
+        """Estimated from the buckets (linear inside the bucket), like Prometheus' histogram_quantile."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                if index == len(self.bounds):
+                    return self.bounds[-1]
+                lower = self.bounds[index - 1] if index else 0.0
+                return lower + (self.bounds[index] - lower) * (rank - seen) / count
+            seen += count
+        return self.bounds[-1]
+
+
+class _Timer:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram: _HistogramValue):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float):
+        self._default.observe(value)
+
+    def time(self) -> _Timer:
+        return self._default.time()
+
+    def _render_child(self, values, child: _HistogramValue) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), child.counts):
+            cumulative += count
+            le = 'le="' + _format_value(bound) + '"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}")
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+        lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+#   ---- Registry ----
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            # Re-registering (e.g. a cog reload) returns the metric that already holds the data
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+              callback: Optional[Callable] = None) -> Gauge:
+        gauge = self._register(Gauge(name, documentation, labelnames, callback))
+        if callback is not None:
+            gauge.callback = callback
+        return gauge
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+#   ---- Bot metrics ----
+LISTENER_LATENCY = REGISTRY.histogram("bot_listener_duration_seconds", "Time spent in event listeners", ("listener",))
+COMMAND_LATENCY = REGISTRY.histogram("bot_command_duration_seconds", "Time spent running commands", ("command",))
+COMMAND_ERRORS = REGISTRY.counter("bot_command_errors_total", "Commands that failed", ("command",))
+TASK_DURATION = REGISTRY.histogram("bot_task_duration_seconds", "Duration of background task runs", ("task",))
+TASK_ERRORS = REGISTRY.counter("bot_task_errors_total", "Background task runs that raised", ("task",))
+LOOP_LAG = REGISTRY.histogram("bot_event_loop_lag_seconds", "How late the event loop woke up a sleeping task")
+REST_LATENCY = REGISTRY.histogram("bot_rest_request_duration_seconds", "Discord REST calls by route", ("route",))
+REST_ERRORS = REGISTRY.counter("bot_rest_errors_total", "Discord REST calls that failed", ("route", "status"))
+REST_RATE_LIMITED = REGISTRY.counter("bot_rest_rate_limited_total", "429 responses from Discord", ("route",))
+REST_GLOBAL_RATE_LIMITED = REGISTRY.counter("bot_rest_global_rate_limited_total",
+                                            "429 responses that hit the global rate limit (also in bot_rest_rate_limited_total)")
+STORE_WRITES = REGISTRY.counter("bot_store_writes_total", "Writes to the storage backend", ("backend", "target"))
+STORE_BYTES = REGISTRY.counter("bot_store_written_bytes_total", "Bytes of data written to the storage backend",
+                               ("backend", "target"))
+STORE_WRITES_COALESCED = REGISTRY.counter("bot_store_writes_coalesced_total",
+                                          "Queued writes replaced by a newer snapshot before they ran")
+LEVEL_WRITES = REGISTRY.counter("bot_level_writes_total", "Batched XP flushes sent to the store")
+LEVEL_WRITES_COALESCED = REGISTRY.counter("bot_level_writes_coalesced_total",
+                                          "XP changes folded into a flush instead of getting their own write")
+
+# Route of the REST call running in the current task (read by the rate limit log handler)
+_current_route: ContextVar[str] = ContextVar("current_route", default="unknown")
+
+
+def timed_task(name: str):
+    """Records each run of a background task; goes under @tasks.loop."""
+    def decorator(fn):
+        histogram = TASK_DURATION.labels(name)
+        errors = TASK_ERRORS.labels(name)
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            except Exception:
+                errors.inc()
+                raise
+            finally:
+                histogram.observe(time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+class _RateLimitHandler(logging.Handler):
+    """discord.py retries 429s internally and only logs them; this counts those log records.
+
+    Every 429 logs "We are being rate limited" once; a global one then also logs "Global rate limit",
+    which is counted apart so the same response is not counted twice.
+    """
+
+    def emit(self, record: logging.LogRecord):
+        message = record.msg if isinstance(record.msg, str) else ""
+        if message.startswith("We are being rate limited"):
+            REST_RATE_LIMITED.labels(_current_route.get()).inc()
+        elif message.startswith("Global rate limit"):
+            REST_GLOBAL_RATE_LIMITED.inc()
+
+
+#   ---- Bot instrumentation ----
+def instrument_bot(bot):
+    """Times the bot's listeners, commands and REST calls and registers its cache gauges.
+
+    Called once, right after the bot is created.
+    """
+    if getattr(bot, "metrics", None) is not None:
+        return
+    bot.metrics = REGISTRY
+
+    # Every listener (cog listeners and @bot.event) is awaited through _run_event
+    run_event = bot._run_event
+
+    async def timed_run_event(coro, event_name, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            await run_event(coro, event_name, *args, **kwargs)
+        finally:
+            LISTENER_LATENCY.labels(getattr(coro, "__qualname__", event_name)).observe(time.perf_counter() - start)
+    bot._run_event = timed_run_event
+
+    # Prefix commands
+    invoke = bot.invoke
+
+    async def timed_invoke(ctx):
+        if ctx.command is None:
+            return await invoke(ctx)
+        start = time.perf_counter()
+        try:
+            return await invoke(ctx)
+        finally:
+            name = ctx.command.qualified_name
+            COMMAND_LATENCY.labels(name).observe(time.perf_counter() - start)
+            if ctx.command_failed:
+                COMMAND_ERRORS.labels(name).inc()
+    bot.invoke = timed_invoke
+
+    # Slash commands, hybrid commands used as slash commands and context menus
+    tree_call = bot.tree._call
+
+    async def timed_tree_call(interaction):
+        start = time.perf_counter()
+        try:
+            return await tree_call(interaction)
+        finally:
+            name = interaction.command.qualified_name if interaction.command else "unknown"
+            COMMAND_LATENCY.labels(name).observe(time.perf_counter() - start)
+            if interaction.command_failed:
+                COMMAND_ERRORS.labels(name).inc()
+    bot.tree._call = timed_tree_call
+
+    # REST calls, labelled by route template so IDs don't create new series
+    request = bot.http.request
+
+    async def timed_request(route, **kwargs):
+        label = f"{route.method} {route.path}"
+        token = _current_route.set(label)
+        start = time.perf_counter()
+        try:
+            return await request(route, **kwargs)
+        except Exception as e:
+            REST_ERRORS.labels(label, str(getattr(e, "status", "error"))).inc()
+            raise
+        finally:
+            REST_LATENCY.labels(label).observe(time.perf_counter() - start)
+            _current_route.reset(token)
+    bot.http.request = timed_request
+
+    logging.getLogger("discord.http").addHandler(_RateLimitHandler(logging.WARNING))
+
+    REGISTRY.gauge("bot_cache_size", "Objects held in the bot's caches", ("cache",), callback=lambda: _cache_sizes(bot))
+    REGISTRY.gauge("bot_guilds", "Guilds the bot is in", callback=lambda: len(bot.guilds))
+    REGISTRY.gauge("bot_gateway_latency_seconds", "Heartbeat latency",
+                   callback=lambda: bot.latency if math.isfinite(bot.latency) else 0.0)
+
+
+def _cache_sizes(bot) -> Dict[str, int]:
+    sizes = {
+        "users": len(bot.users),
+        "members": sum(len(guild.members) for guild in bot.guilds),
+        "channels": sum(len(guild.channels) for guild in bot.guilds),
+        "messages": len(bot.cached_messages),
+    }
+    leveling = bot.get_cog("Leveling")
+    if leveling:
+        sizes["level_guilds"] = len(leveling.level_data)
+        sizes["level_users"] = sum(len(users) for users in leveling.level_data.values())
+    tempvoice = bot.get_cog("TempVoice")
+    if tempvoice:
+        sizes["temp_channels"] = len(tempvoice.active_channels)
+    casino = bot.get_cog("Casino")
+    if casino:
+        sizes["casino_events"] = len(casino.active_casinos)
+        sizes["casino_pending"] = len(casino.pending_validations)
+    return sizes
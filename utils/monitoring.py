@@ -0,0 +1,87 @@
+import asyncio
+from typing import Coroutine, Optional, Set
+
+from utils.metrics import LOOP_LAG
+
+
+class BackgroundTasks:
+    """Fire-and-forget tasks of one owner (e.g. a cog).
+
+    The event loop only keeps weak references to tasks: this keeps each one until it finishes,
+    and prints the error of a task that failed instead of losing it.
+    """
+
+    def __init__(self, owner: str):
+        self.owner = owner
+        self._tasks: Set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def spawn(self, coro: Coroutine, name: Optional[str] = None) -> asyncio.Task:
+        task = asyncio.get_running_loop().create_task(coro, name=name)
+        self._tasks.add(task)
+        task.add_done_callback(self._done)
+        return task
+
+    def _done(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"{self.owner} Error: background task '{task.get_name()}' failed: {task.exception()!r}")
+
+    def cancel_all(self):
+        for task in list(self._tasks):
+            task.cancel()
+
+
+class LoopLagMonitor:
+    """Measures how long the event loop was blocked.
+
+    A task sleeps for `interval` seconds; any extra time before it wakes up is time the loop
+    spent running something else without yielding.
+    """
+
+    def __init__(self, interval: float = 0.5, warn_threshold: float = 0.25):
+        self.interval = interval
+        self.warn_threshold = warn_threshold
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.total_blocked = 0.0
+        self.samples = 0
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if not self.running:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - start - self.interval)
+
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            self.total_blocked += lag
+            self.samples += 1
+            LOOP_LAG.observe(lag)
+            if lag >= self.warn_threshold:
+                print(f"Loop lag: event loop was blocked for {lag * 1000:.0f}ms")
+
+    @property
+    def average_lag(self) -> float:
+        return self.total_blocked / self.samples if self.samples else 0.0
+
+    def summary(self) -> str:
+        return (f"last {self.last_lag * 1000:.1f}ms | avg {self.average_lag * 1000:.1f}ms | "
+                f"max {self.max_lag * 1000:.1f}ms")
@@ -0,0 +1,196 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, List
+
+from utils.metrics import STORE_WRITES_COALESCED
+
+DEFAULT_BACKUPS = 3
+DEFAULT_WORKERS = 4
+
+
+#   ---- Encoding ----
+def dumps(data: Any, compact: bool = False) -> str:
+    if compact:
+        return json.dumps(data, separators=(",", ":"))
+    return json.dumps(data, indent=4)
+
+
+def snapshot(data: Any) -> Any:
+    """Copies the dicts and lists of `data`, sharing the (immutable) leaves.
+
+    Much cheaper than encoding; the copy can then be encoded on another thread while the original keeps changing.
+    """
+    if isinstance(data, dict):
+        return {key: snapshot(value) for key, value in data.items()}
+    if isinstance(data, list):
+        return [snapshot(value) for value in data]
+    return data
+
+
+def _backup_path(path: str, n: int) -> str:
+    return f"{path}.{n}.bak"
+
+
+#   ---- Crash-safe write ----
+def atomic_write(path: str, text: str, backups: int = DEFAULT_BACKUPS):
+    """Writes `text` to a temp file, fsyncs it and renames it over `path`.
+
+    The previous versions are kept as `path.1.bak` (newest) to `path.N.bak`.
+    """
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+
+        if backups > 0 and os.path.exists(path):
+            for n in range(backups - 1, 0, -1):
+                if os.path.exists(_backup_path(path, n)):
+                    os.replace(_backup_path(path, n), _backup_path(path, n + 1))
+            # A second link to the current file, not a rename: `path` itself never goes missing
+            _link_or_copy(path, _backup_path(path, 1))
+
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    _fsync_dir(directory)
+
+
+def remove(path: str, backups: int = DEFAULT_BACKUPS):
+    """Deletes `path` and its backups (otherwise load_json would restore it from them)."""
+    for candidate in [path] + [_backup_path(path, n) for n in range(1, backups + 1)]:
+        try:
+            os.remove(candidate)
+        except FileNotFoundError:
+            pass
+
+
+def _link_or_copy(source: str, target: str):
+    """Makes `target` a hard link to `source`, or a copy where hard links are not supported."""
+    try:
+        os.remove(target)
+    except FileNotFoundError:
+        pass
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+
+def _fsync_dir(directory: str):
+    # Makes the rename itself durable; not supported on every platform
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+#   ---- Load with fallback ----
+def load_json(path: str, backups: int = DEFAULT_BACKUPS) -> Dict[str, Any]:
+    """Loads `path`, falling back to the newest readable backup if it is missing or corrupted."""
+    candidates = [path] + [_backup_path(path, n) for n in range(1, backups + 1)]
+    for candidate in candidates:
+        try:
+            with open(candidate, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            continue
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            print(f"Persistence Error: {candidate} is corrupted, trying the previous backup.")
+            continue
+        if candidate != path:
+            print(f"Persistence: restored {path} from backup {candidate}.")
+        return data
+    return {}
+
+
+#   ---- Async write executor ----
+class _WriteJob:
+    __slots__ = ("fn", "args", "coalesce", "future")
+
+    def __init__(self, fn: Callable, args: tuple, coalesce: bool):
+        self.fn = fn
+        self.args = args
+        self.coalesce = coalesce
+        self.future: Future = Future()
+
+
+class PersistenceExecutor:
+    """Runs writes on a bounded thread pool, one queue per target.
+
+    Jobs for the same key (a file path or a database) run one at a time, in submission order,
+    while different keys are written in parallel. A coalescing job replaces a coalescing job
+    that is still waiting for the same key: only the newest snapshot of a file is written.
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_WORKERS):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="persistence")
+        self._lock = threading.Lock()
+        self._queues: Dict[str, Deque[_WriteJob]] = {}
+        self._last: Dict[str, Future] = {}
+
+    def submit(self, key: str, fn: Callable, *args, coalesce: bool = False) -> Future:
+        with self._lock:
+            queue = self._queues.get(key)
+            if coalesce and queue and queue[-1].coalesce:
+                job = queue[-1]
+                job.fn, job.args = fn, args
+                STORE_WRITES_COALESCED.inc()
+                return job.future
+
+            job = _WriteJob(fn, args, coalesce)
+            self._last[key] = job.future
+            if queue is None:
+                self._queues[key] = deque([job])
+                self._pool.submit(self._drain, key)
+            else:
+                queue.append(job)
+            return job.future
+
+    def _drain(self, key: str):
+        while True:
+            with self._lock:
+                queue = self._queues[key]
+                if not queue:
+                    del self._queues[key]
+                    return
+                job = queue.popleft()
+            try:
+                job.future.set_result(job.fn(*job.args))
+            except Exception as e:
+                print(f"Persistence Error: write to {key} failed: {e}")
+                job.future.set_exception(e)
+
+    def pending(self) -> int:
+        with self._lock:
+            return sum(len(queue) for queue in self._queues.values())
+
+    def flush(self):
+        """Blocks until every write submitted so far has completed."""
+        with self._lock:
+            futures: List[Future] = list(self._last.values())
+            self._last.clear()
+        for future in futures:
+            try:
+                future.result()
+            except Exception:
+                pass
+
+    def shutdown(self):
+        self.flush()
+        self._pool.shutdown(wait=True)
@@ -0,0 +1,51 @@
+from bisect import bisect_left, insort
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+class GuildRanking:
+    """Users of a guild kept sorted by total XP (highest first).
+
+    Keys are (-total_xp, user_id), so ties are broken by user ID. Rank lookups are a bisect,
+    reading the top k is a slice, and an update moves a single key.
+    """
+    __slots__ = ("_keys", "_xp")
+
+    def __init__(self, users: Optional[Dict[str, Dict[str, int]]] = None):
+        self._xp: Dict[int, int] = {}
+        self._keys: List[Tuple[int, int]] = []
+        if users:
+            self._xp = {int(uid): data["total_xp"] for uid, data in users.items()}
+            self._keys = sorted((-xp, uid) for uid, xp in self._xp.items())
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def update(self, user_id: int, total_xp: int):
+        old = self._xp.get(user_id)
+        if old == total_xp:
+            return
+        if old is not None:
+            del self._keys[bisect_left(self._keys, (-old, user_id))]
+        self._xp[user_id] = total_xp
+        insort(self._keys, (-total_xp, user_id))
+
+    def remove(self, user_id: int):
+        old = self._xp.pop(user_id, None)
+        if old is not None:
+            del self._keys[bisect_left(self._keys, (-old, user_id))]
+
+    def rank(self, user_id: int) -> Optional[int]:
+        """1-based position of the user, or None if they have no XP yet."""
+        xp = self._xp.get(user_id)
+        if xp is None:
+            return None
+        return bisect_left(self._keys, (-xp, user_id)) + 1
+
+    def top(self, k: int, offset: int = 0) -> List[Tuple[int, int]]:
+        """Returns up to k (user_id, total_xp) pairs starting at position offset + 1."""
+        return [(uid, -neg_xp) for neg_xp, uid in self._keys[offset:offset + k]]
+
+    def iter_ranked(self, offset: int = 0) -> Iterator[Tuple[int, int]]:
+        for i in range(offset, len(self._keys)):
+            neg_xp, uid = self._keys[i]
+            yield uid, -neg_xp
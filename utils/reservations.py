@@ -0,0 +1,221 @@
+import asyncio
+import heapq
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+def format_ranges(ranges: Iterable[Tuple[int, int]], limit: int = 1024) -> str:
+    """Renders runs as "1-12, 15, 20-34", cut to at most `limit` characters."""
+    parts = []
+    length = 0
+    for first, last in ranges:
+        part = str(first) if first == last else f"{first}-{last}"
+        # Leave room for the ", …" marker
+        if length + len(part) + 5 > limit:
+            parts.append("…")
+            break
+        parts.append(part)
+        length += len(part) + 2
+    return ", ".join(parts)
+
+
+class EventReservations:
+    """Numbers 1..size of one event, each free, held (waiting for staff) or taken.
+
+    Free numbers are kept as a bitset (bit n-1 set = n is free), so the
+    "next free number" and "all taken" checks never scan the event.
+    Owners live in a flat array indexed by number (0 = nobody).
+    """
+
+    __slots__ = ("size", "lock", "_free", "_taken", "_taken_count", "_owners", "_holds")
+
+    def __init__(self, size: int, assignments: Iterable[Tuple[int, int]] = ()):
+        self.size = size
+        self.lock = asyncio.Lock()
+        self._free = (1 << size) - 1
+        self._taken = 0
+        self._taken_count = 0
+        self._owners = array("Q", [0]) * (size + 1)
+        # number -> [token, expires_at]
+        self._holds: Dict[int, List] = {}
+        for number, user_id in assignments:
+            self.take(number, user_id)
+
+    def _bit(self, number: int) -> int:
+        if not 1 <= number <= self.size:
+            raise ValueError(number)
+        return 1 << (number - 1)
+
+    def is_free(self, number: int) -> bool:
+        return bool(self._free & self._bit(number))
+
+    def is_taken(self, number: int) -> bool:
+        return bool(self._taken & self._bit(number))
+
+    def is_held(self, number: int) -> bool:
+        return number in self._holds
+
+    def get_hold(self, number: int) -> Optional[Tuple[int, float]]:
+        """(token, expires_at) of the hold on a number, if any."""
+        hold = self._holds.get(number)
+        return (hold[0], hold[1]) if hold else None
+
+    def owner(self, number: int) -> Optional[int]:
+        return self._owners[number] or None if 1 <= number <= self.size else None
+
+    @property
+    def taken_count(self) -> int:
+        return self._taken_count
+
+    @property
+    def all_taken(self) -> bool:
+        return self._taken == (1 << self.size) - 1
+
+    def next_free(self) -> Optional[int]:
+        """Lowest number that is neither taken nor held."""
+        if not self._free:
+            return None
+        return (self._free & -self._free).bit_length()
+
+    def take(self, number: int, user_id: int) -> bool:
+        """Marks a free number as taken (direct assignment, no validation)."""
+        bit = self._bit(number)
+        if not self._free & bit:
+            return False
+        self._free &= ~bit
+        self._assign(number, bit, user_id)
+        return True
+
+    def _assign(self, number: int, bit: int, user_id: int):
+        self._taken |= bit
+        self._taken_count += 1
+        self._owners[number] = user_id
+
+    def hold(self, number: int, token: int, expires_at: float) -> bool:
+        bit = self._bit(number)
+        if not self._free & bit:
+            return False
+        self._free &= ~bit
+        self._holds[number] = [token, expires_at]
+        return True
+
+    def set_token(self, number: int, token: int):
+        self._holds[number][0] = token
+
+    def release(self, number: int, token: Optional[int] = None) -> bool:
+        """Frees a held number; with a token, only if it still belongs to that hold."""
+        hold = self._holds.get(number)
+        if hold is None or (token is not None and hold[0] != token):
+            return False
+        del self._holds[number]
+        self._free |= self._bit(number)
+        return True
+
+    def commit(self, number: int, user_id: int, token: Optional[int] = None) -> bool:
+        """Turns a hold into an assignment."""
+        hold = self._holds.get(number)
+        if hold is None or (token is not None and hold[0] != token):
+            return False
+        del self._holds[number]
+        self._assign(number, self._bit(number), user_id)
+        return True
+
+    def unassign(self, number: int) -> bool:
+        bit = self._bit(number)
+        if not self._taken & bit:
+            return False
+        self._taken &= ~bit
+        self._taken_count -= 1
+        self._owners[number] = 0
+        self._free |= bit
+        return True
+
+    def assignments(self) -> Iterator[Tuple[int, int]]:
+        """(number, user_id) for every taken number, in order."""
+        taken = self._taken
+        while taken:
+            low = taken & -taken
+            number = low.bit_length()
+            yield number, self._owners[number]
+            taken ^= low
+
+    def export(self) -> List[List[int]]:
+        """Storage form of the assignments: [[number, user_id], ...]."""
+        return [[number, user_id] for number, user_id in self.assignments()]
+
+    def free_ranges(self, start: int = 1, end: Optional[int] = None) -> Iterator[Tuple[int, int]]:
+        """Runs of consecutive free numbers between start and end, as (first, last)."""
+        end = self.size if end is None else end
+        # Only the requested window is shifted down; runs are found with bit tricks
+        window = (self._free >> (start - 1)) & ((1 << (end - start + 1)) - 1)
+        offset = start
+        while window:
+            skip = (window & -window).bit_length() - 1
+            window >>= skip
+            offset += skip
+            run = (~window & (window + 1)).bit_length() - 1
+            yield offset, offset + run - 1
+            window >>= run
+            offset += run
+
+
+class ReservationEngine:
+    """Reservations for every open event, plus a heap of hold deadlines.
+
+    Expired entries are removed lazily: a heap entry only counts if the hold
+    it points to still exists with the same token and deadline.
+    """
+
+    def __init__(self):
+        self.events: Dict[int, EventReservations] = {}
+        self._deadlines: List[Tuple[float, int, int, int]] = []
+
+    def open(self, event_id: int, size: int, assignments: Iterable[Tuple[int, int]] = ()) -> EventReservations:
+        event = self.events[event_id] = EventReservations(size, assignments)
+        return event
+
+    def get(self, event_id: int) -> Optional[EventReservations]:
+        return self.events.get(event_id)
+
+    def close(self, event_id: int):
+        self.events.pop(event_id, None)
+
+    def lock(self, event_id: int) -> asyncio.Lock:
+        return self.events[event_id].lock
+
+    def hold(self, event_id: int, number: int, token: int, expires_at: float) -> bool:
+        event = self.events.get(event_id)
+        if event is None or not event.hold(number, token, expires_at):
+            return False
+        heapq.heappush(self._deadlines, (expires_at, event_id, number, token))
+        return True
+
+    def set_token(self, event_id: int, number: int, token: int, previous: int) -> bool:
+        """Re-keys a hold once its final token (e.g. the validation message) is known.
+
+        Returns False if the hold made with `previous` is gone (it expired or was released),
+        so a later hold on the same number is never taken over.
+        """
+        event = self.events.get(event_id)
+        hold = event.get_hold(number) if event is not None else None
+        if hold is None or hold[0] != previous:
+            return False
+        event.set_token(number, token)
+        heapq.heappush(self._deadlines, (hold[1], event_id, number, token))
+        return True
+
+    def pop_expired(self, now: float) -> List[Tuple[int, int, int]]:
+        """Releases holds whose deadline has passed; returns (event_id, number, token) for each."""
+        expired = []
+        heap = self._deadlines
+        while heap and heap[0][0] <= now:
+            expires_at, event_id, number, token = heapq.heappop(heap)
+            event = self.events.get(event_id)
+            if event is None:
+                continue
+            if event.get_hold(number) != (token, expires_at):
+                continue
+            event.release(number, token)
+            expired.append((event_id, number, token))
+        return expired
+
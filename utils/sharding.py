@@ -0,0 +1,159 @@
+import argparse
+import os
+import subprocess
+import sys
+from typing import List, Optional
+
+import discord
+from discord.ext import commands
+
+# Shard of a guild = (guild_id >> 22) % shard_count, as Discord computes it
+SNOWFLAKE_TIMESTAMP_SHIFT = 22
+
+
+#   ---- Shard plan ----
+def parse_shard_ids(text: str) -> List[int]:
+    """"0,1,2", "0-3" or "0-3,8" -> list of shard IDs."""
+    shard_ids = []
+    for part in text.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            start, end = part.split("-", 1)
+            shard_ids.extend(range(int(start), int(end) + 1))
+        else:
+            shard_ids.append(int(part))
+    return sorted(set(shard_ids))
+
+
+def split_shards(shard_count: int, processes: int) -> List[List[int]]:
+    """Contiguous, as even as possible split of the shards over the processes (the dashboard relies on it)."""
+    base, extra = divmod(shard_count, processes)
+    groups, start = [], 0
+    for index in range(processes):
+        size = base + (index < extra)
+        groups.append(list(range(start, start + size)))
+        start += size
+    return groups
+
+
+class ShardPlan:
+    """Which shards this process runs, read from the environment.
+
+    - nothing set: a single `commands.Bot`, one connection
+    - SHARD_COUNT = auto | N: one `AutoShardedBot` running every shard
+    - SHARD_COUNT = N and SHARD_IDS = 0-3: this process only runs those shards (and only owns their guilds)
+    """
+
+    def __init__(self, shard_count: Optional[int] = None, shard_ids: Optional[List[int]] = None,
+                 sharded: bool = False):
+        self.shard_count = shard_count
+        self.shard_ids = shard_ids
+        self.sharded = sharded or shard_count is not None or shard_ids is not None
+
+    @classmethod
+    def from_env(cls) -> "ShardPlan":
+        count = os.getenv("SHARD_COUNT", "").strip().lower()
+        ids = os.getenv("SHARD_IDS", "").strip()
+        return cls(
+            shard_count=int(count) if count and count != "auto" else None,
+            shard_ids=parse_shard_ids(ids) if ids else None,
+            sharded=count == "auto"
+        )
+
+    @property
+    def partial(self) -> bool:
+        """True when other processes run the remaining shards."""
+        return self.shard_ids is not None and self.shard_count is not None and len(self.shard_ids) < self.shard_count
+
+    def validate(self) -> Optional[str]:
+        if self.shard_ids is not None and self.shard_count is None:
+            return "SHARD_IDS requires a numeric SHARD_COUNT."
+        if self.shard_ids and self.shard_count and max(self.shard_ids) >= self.shard_count:
+            return f"SHARD_IDS must be below SHARD_COUNT ({self.shard_count})."
+        if self.partial and os.getenv("STORAGE_BACKEND", "sqlite").lower() == "json":
+            # A JSON file is rewritten whole, so every process would overwrite the others' guilds
+            return "Multi-process sharding needs the SQLite storage backend (remove STORAGE_BACKEND = json)."
+        return None
+
+    def shard_for(self, guild_id) -> int:
+        return (int(guild_id) >> SNOWFLAKE_TIMESTAMP_SHIFT) % (self.shard_count or 1)
+
+    def owns(self, guild_id) -> bool:
+        """Whether this process runs the shard of `guild_id` (always True without multi-process sharding)."""
+        return not self.partial or self.shard_for(guild_id) in self.shard_ids
+
+    def create_bot(self, **kwargs) -> commands.Bot:
+        if not self.sharded:
+            bot = commands.Bot(**kwargs)
+        else:
+            bot = commands.AutoShardedBot(shard_count=self.shard_count, shard_ids=self.shard_ids, **kwargs)
+        bot.shard_plan = self
+        return bot
+
+    def describe(self) -> str:
+        if not self.sharded:
+            return "not sharded"
+        if self.shard_ids is None:
+            return f"all shards ({self.shard_count or 'auto'})"
+        return f"shards {self.shard_ids} of {self.shard_count}"
+
+
+def owns_guild(bot, guild_id) -> bool:
+    """For cogs filtering stored per-guild state at load time."""
+    plan = getattr(bot, "shard_plan", None)
+    return plan is None or plan.owns(guild_id)
+
+
+def shard_is_connected(bot, guild: discord.Guild) -> bool:
+    """False while the guild's shard is reconnecting (its cache may be out of date)."""
+    get_shard = getattr(bot, "get_shard", None)
+    if get_shard is None:
+        return not bot.is_closed()
+    shard = get_shard(guild.shard_id)
+    return shard is not None and not shard.is_closed()
+
+
+def shard_latencies(bot) -> List[tuple]:
+    """[(shard_id, seconds)] for every shard run by this process."""
+    latencies = getattr(bot, "latencies", None)
+    if latencies is not None:
+        return list(latencies)
+    return [(0, bot.latency)]
+
+
+#   ---- Launcher: python -m utils.sharding --shards 8 --processes 2 ----
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m utils.sharding",
+                                     description="Runs the bot as several processes, each with its own shards.")
+    parser.add_argument("--shards", type=int, required=True, help="Total number of shards")
+    parser.add_argument("--processes", type=int, required=True, help="Number of processes to split them over")
+    parser.add_argument("--script", default="bot.py", help="Entry point to start (bot.py or web/dashboard.py)")
+    parser.add_argument("--base-port", type=int, default=int(os.getenv("DASHBOARD_PORT", "5000")),
+                        help="Dashboard port of the first process; the next ones use the following ports")
+    args = parser.parse_args(argv)
+    if not 1 <= args.processes <= args.shards:
+        parser.error("--processes must be between 1 and --shards")
+
+    children = []
+    for cluster_id, shard_ids in enumerate(split_shards(args.shards, args.processes)):
+        env = dict(os.environ,
+                   SHARD_COUNT=str(args.shards),
+                   SHARD_IDS=",".join(map(str, shard_ids)),
+                   CLUSTER_ID=str(cluster_id),
+                   DASHBOARD_PORT=str(args.base_port + cluster_id))
+        print(f"Sharding: starting process {cluster_id} with shards {shard_ids}")
+        children.append(subprocess.Popen([sys.executable, args.script], env=env))
+
+    try:
+        exit_codes = [child.wait() for child in children]
+    except KeyboardInterrupt:
+        for child in children:
+            child.terminate()
+        exit_codes = [child.wait() for child in children]
+    return max(exit_codes, default=0)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
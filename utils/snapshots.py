@@ -0,0 +1,203 @@
+import asyncio
+import itertools
+import time
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, Mapping, Optional, Tuple
+
+import discord
+
+from utils.guild_config import _freeze
+from utils.intents import GatewayProfile
+
+# Full republish interval; guilds marked dirty by gateway events are republished right away
+SNAPSHOT_INTERVAL = 30.0
+SNAPSHOT_TOP_USERS = 10
+# Ranked users looked at per guild when filling the top list (members who left are skipped)
+SNAPSHOT_SCAN_LIMIT = 100
+
+# Top users missing from the member cache are requested by ID (members intent), not by chunking the guild
+GATEWAY_PROFILE = GatewayProfile(intents=["members"])
+
+
+class GuildSnapshot:
+    """Read-only view of one guild, safe to read from any thread."""
+
+    __slots__ = ("id", "name", "icon_url", "member_count", "channels", "roles", "config", "top_users", "ranked",
+                 "built_at")
+
+    def __init__(self, guild_id: int, name: str, icon_url: Optional[str], member_count: int,
+                 channels: Mapping[int, str], roles: Mapping[int, str], config: Mapping[str, Any],
+                 top_users: Tuple[Mapping[str, Any], ...], ranked: bool):
+        self.id = guild_id
+        self.name = name
+        self.icon_url = icon_url
+        self.member_count = member_count
+        self.channels = channels
+        self.roles = roles
+        self.config = config
+        self.top_users = top_users
+        # False when the guild's levels were not loaded yet (see SnapshotPublisher.refresh_guild)
+        self.ranked = ranked
+        self.built_at = time.time()
+
+    def channel_name(self, channel_id) -> Optional[str]:
+        return self.channels.get(int(channel_id)) if channel_id else None
+
+    def role_name(self, role_id) -> Optional[str]:
+        return self.roles.get(int(role_id)) if role_id else None
+
+
+class SnapshotPublisher:
+    """Publishes immutable per-guild snapshots of the bot state for other threads.
+
+    Snapshots are only built on the bot's event loop. Publishing swaps a single
+    reference to a new read-only mapping, so readers never lock and never see a
+    guild half-way through an update.
+    """
+
+    def __init__(self, bot, interval: float = SNAPSHOT_INTERVAL, top_n: int = SNAPSHOT_TOP_USERS):
+        self.bot = bot
+        self.interval = interval
+        self.top_n = top_n
+        self.snapshots: Mapping[int, GuildSnapshot] = MappingProxyType({})
+        self._dirty: set = set()
+        # guild_id -> ranked user IDs to request from the gateway / already requested
+        self._missing: Dict[int, list] = {}
+        self._queried: Dict[int, set] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    # ---- Reader side (any thread) ----
+    def get(self, guild_id) -> Optional[GuildSnapshot]:
+        return self.snapshots.get(int(guild_id))
+
+    # ---- Bot side (event loop only) ----
+    def start(self):
+        if self._task is None or self._task.done():
+            for event in ("on_guild_join", "on_guild_update", "on_guild_channel_create", "on_guild_channel_delete",
+                          "on_guild_channel_update", "on_guild_role_create", "on_guild_role_delete",
+                          "on_guild_role_update"):
+                self.bot.add_listener(self._on_guild_event, event)
+            self.bot.add_listener(self._on_guild_remove, "on_guild_remove")
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def mark_dirty(self, guild_id: int):
+        self._dirty.add(int(guild_id))
+        self._wakeup.set()
+
+    async def _on_guild_event(self, *args):
+        obj = args[-1]
+        guild = obj if isinstance(obj, discord.Guild) else getattr(obj, "guild", None)
+        if guild is not None:
+            self.mark_dirty(guild.id)
+
+    async def _on_guild_remove(self, guild: discord.Guild):
+        self._queried.pop(guild.id, None)
+        self.publish([guild.id])
+
+    async def _run(self):
+        await self.bot.wait_until_ready()
+        self.publish()
+        next_full = time.monotonic() + self.interval
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), max(0.0, next_full - time.monotonic()))
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                if time.monotonic() >= next_full:
+                    self.publish()
+                    next_full = time.monotonic() + self.interval
+                elif self._dirty:
+                    self.publish(self._dirty)
+                if self._missing:
+                    await self._fetch_missing_members()
+            except Exception as e:
+                print(f"[Snapshots] Error publishing snapshots: {e}")
+
+    async def _fetch_missing_members(self):
+        """Caches the top users that were not in the member cache, then republishes their guilds."""
+        missing, self._missing = self._missing, {}
+        for guild_id, user_ids in missing.items():
+            guild = self.bot.get_guild(guild_id)
+            if guild is None or not self.bot.intents.members:
+                continue
+            self._queried.setdefault(guild_id, set()).update(user_ids)
+            try:
+                await guild.query_members(user_ids=user_ids, limit=len(user_ids), cache=True)
+            except (asyncio.TimeoutError, discord.ClientException) as e:
+                print(f"[Snapshots] Could not fetch members of guild {guild_id}: {e}")
+                continue
+            self.mark_dirty(guild_id)
+
+    async def refresh_guild(self, guild_id: int):
+        """Loads the guild's levels if needed, then republishes it."""
+        leveling = self.bot.get_cog("Leveling")
+        if leveling:
+            await leveling.fetch_guild_levels(str(guild_id))
+        self.publish([int(guild_id)])
+
+    def publish(self, guild_ids: Optional[Iterable[int]] = None):
+        """Rebuilds the given guilds (all guilds if None) and swaps in the new mapping."""
+        if guild_ids is None:
+            snapshots = {guild.id: self._build(guild) for guild in self.bot.guilds}
+        else:
+            snapshots = dict(self.snapshots)
+            for guild_id in list(guild_ids):
+                guild = self.bot.get_guild(guild_id)
+                if guild is None:
+                    snapshots.pop(guild_id, None)
+                else:
+                    snapshots[guild_id] = self._build(guild)
+        self._dirty.clear()
+        self.snapshots = MappingProxyType(snapshots)
+
+    def _build(self, guild: discord.Guild) -> GuildSnapshot:
+        config: Dict[str, Any] = {}
+        for cog_name in ("Leveling", "TempVoice", "Moderation"):
+            cog = self.bot.get_cog(cog_name)
+            if cog:
+                config.update(cog.get_guild_config(str(guild.id) if cog_name == "Leveling" else guild.id))
+
+        top_users = []
+        leveling = self.bot.get_cog("Leveling")
+        # Only guilds whose levels are already loaded are ranked; nothing is read from storage here
+        ranked = leveling is None or str(guild.id) in leveling.level_data
+        if leveling and ranked:
+            curve = leveling.get_level_curve(str(guild.id))
+            queried = self._queried.get(guild.id, ())
+            missing = []
+            for uid, xp in itertools.islice(leveling.get_ranking(str(guild.id)).iter_ranked(), SNAPSHOT_SCAN_LIMIT):
+                member = guild.get_member(uid)
+                if member is None and uid not in queried:
+                    missing.append(uid)
+                if member:
+                    top_users.append(MappingProxyType({
+                        "name": member.display_name,
+                        "level": curve.get_level_info(xp)[0],
+                        "xp": xp,
+                        "avatar": member.display_avatar.url
+                    }))
+                    if len(top_users) == self.top_n:
+                        break
+            if missing:
+                self._missing[guild.id] = missing
+                self._wakeup.set()
+
+        return GuildSnapshot(
+            guild.id,
+            guild.name,
+            str(guild.icon.with_size(256)) if guild.icon else None,
+            guild.member_count or 0,
+            MappingProxyType({channel.id: channel.name for channel in guild.channels}),
+            MappingProxyType({role.id: role.name for role in guild.roles}),
+            _freeze(config),
+            tuple(top_users),
+            ranked
+        )
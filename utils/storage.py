@@ -0,0 +1,316 @@
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+import threading
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from utils.metrics import STORE_BYTES, STORE_WRITES
+from utils.persistence import DEFAULT_BACKUPS, PersistenceExecutor, atomic_write, dumps, load_json, remove, snapshot
+
+DATA_DIR = "data"
+DB_FILE = "bot.db"
+
+#   ---- Namespaces and their legacy JSON files ----
+NAMESPACES = {
+    "config": "config.json",
+    "moderation_config": "moderation_config.json",
+    "tempvoice_config": "tempvoice_config.json",
+    "tempvoice_channels": "tempvoice_channels.json",
+    "casino_events": "casino_events.json",
+    "casino_pending": "casino_pending.json",
+    "casino_validation_channels": "casino_validation_channels.json",
+    "command_tree": "command_tree.json",
+}
+LEVELS_FILE = "levels.json"
+# JSON backend: one file of levels per guild, so saving XP only rewrites the guilds that changed
+LEVELS_DIR = "levels"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    namespace TEXT NOT NULL,
+    key       TEXT NOT NULL,
+    value     TEXT NOT NULL,
+    PRIMARY KEY (namespace, key)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS levels (
+    guild_id TEXT NOT NULL,
+    user_id  TEXT NOT NULL,
+    total_xp INTEGER NOT NULL,
+    level    INTEGER NOT NULL,
+    PRIMARY KEY (guild_id, user_id)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS levels_by_xp ON levels (guild_id, total_xp DESC);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class _BaseStore:
+    """Common write scheduling: data is snapshotted on the event loop; encoding whole files and all I/O run on the executor."""
+
+    def __init__(self):
+        self.executor = PersistenceExecutor()
+
+    def _submit(self, key: str, fn, *args, coalesce: bool = False):
+        return self.executor.submit(key, fn, *args, coalesce=coalesce)
+
+    async def run(self, fn, *args):
+        """Runs a blocking store call (e.g. a read) without blocking the event loop."""
+        return await asyncio.to_thread(fn, *args)
+
+    def flush(self):
+        """Blocks until every scheduled write has completed."""
+        self.executor.flush()
+
+    def close(self):
+        self.executor.shutdown()
+
+
+#   ---- SQLite backend (default) ----
+class SQLiteStore(_BaseStore):
+    def __init__(self, path: str = os.path.join(DATA_DIR, DB_FILE)):
+        super().__init__()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        # Shard processes share the database file; a writer waits for the others instead of failing
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.executescript(SCHEMA)
+
+    # --- Reads ---
+    def load(self, namespace: str) -> Dict[str, Any]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, value FROM documents WHERE namespace = ?", (namespace,)
+            ).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    def load_levels(self, guild_id: str) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT user_id, total_xp, level FROM levels WHERE guild_id = ?", (str(guild_id),)
+            ).fetchall()
+        return {uid: {"total_xp": xp, "level": level} for uid, xp, level in rows}
+
+    # --- Writes ---
+    def save(self, namespace: str, data: Dict, changed: Optional[Iterable] = None, removed: Iterable = ()):
+        """Upserts the `changed` keys of `data` (all keys if None) and deletes the `removed` ones."""
+        keys = data.keys() if changed is None else changed
+        upserts = [(namespace, str(k), json.dumps(data[k])) for k in keys if k in data]
+        deletes = [(namespace, str(k)) for k in removed]
+        if upserts or deletes:
+            self._submit(self.path, self._write_documents, upserts, deletes)
+
+    def _write_documents(self, upserts, deletes):
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT INTO documents (namespace, key, value) VALUES (?, ?, ?) "
+                "ON CONFLICT (namespace, key) DO UPDATE SET value = excluded.value",
+                upserts,
+            )
+            self._conn.executemany("DELETE FROM documents WHERE namespace = ? AND key = ?", deletes)
+        namespace = (upserts or deletes)[0][0]
+        STORE_WRITES.labels("sqlite", namespace).inc()
+        STORE_BYTES.labels("sqlite", namespace).inc(sum(len(value) for _, _, value in upserts))
+
+    def save_levels(self, level_data: Dict[str, Dict], changed: Iterable[Tuple[str, str]]):
+        rows = []
+        for gid, uid in changed:
+            user = level_data.get(gid, {}).get(uid)
+            if user is not None:
+                rows.append((gid, uid, user["total_xp"], user["level"]))
+        if rows:
+            self._submit(self.path, self._write_levels, rows)
+
+    def _write_levels(self, rows):
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT INTO levels (guild_id, user_id, total_xp, level) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (guild_id, user_id) DO UPDATE SET "
+                "total_xp = excluded.total_xp, level = excluded.level",
+                rows,
+            )
+        STORE_WRITES.labels("sqlite", "levels").inc()
+
+    def delete_guild_levels(self, guild_id: str):
+        self._submit(self.path, self._delete_levels, str(guild_id))
+
+    def _delete_levels(self, guild_id):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM levels WHERE guild_id = ?", (guild_id,))
+
+    # --- Migration ---
+    def is_migrated(self) -> bool:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'json_migrated'").fetchone()
+        return row is not None
+
+    def migrate_from_json(self, data_dir: str = DATA_DIR) -> Dict[str, int]:
+        """One-shot import of the legacy JSON files. Returns the number of rows imported per file."""
+        imported = {}
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN")
+
+            levels = load_json_levels(data_dir)
+            rows = [
+                (str(gid), str(uid), user.get("total_xp", 0), user.get("level", 0))
+                for gid, users in levels.items()
+                for uid, user in users.items()
+            ]
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO levels (guild_id, user_id, total_xp, level) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            imported[LEVELS_FILE] = len(rows)
+
+            for namespace, filename in NAMESPACES.items():
+                doc = load_json(os.path.join(data_dir, filename))
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO documents (namespace, key, value) VALUES (?, ?, ?)",
+                    [(namespace, str(k), json.dumps(v)) for k, v in doc.items()],
+                )
+                imported[filename] = len(doc)
+
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('json_migrated', '1')")
+        return imported
+
+    def close(self):
+        super().close()
+        with self._lock:
+            self._conn.close()
+
+
+def load_json_levels(data_dir: str = DATA_DIR) -> Dict[str, Dict]:
+    """Levels of every guild saved by the JSON backend: the per-guild files, or the legacy levels.json."""
+    directory = os.path.join(data_dir, LEVELS_DIR)
+    if not os.path.isdir(directory):
+        return load_json(os.path.join(data_dir, LEVELS_FILE))
+    return {
+        filename[:-len(".json")]: load_json(os.path.join(directory, filename))
+        for filename in os.listdir(directory) if filename.endswith(".json")
+    }
+
+
+#   ---- JSON backend (legacy files, one per namespace, levels in one file per guild) ----
+class JSONStore(_BaseStore):
+    def __init__(self, data_dir: str = DATA_DIR, compact: bool = False, backups: int = DEFAULT_BACKUPS):
+        super().__init__()
+        os.makedirs(data_dir, exist_ok=True)
+        self.data_dir = data_dir
+        self.compact = compact
+        self.backups = backups
+        self._levels: Dict[str, Dict] = {}
+        self._split_legacy_levels()
+
+    def _path(self, filename: str) -> str:
+        return os.path.join(self.data_dir, filename)
+
+    def _write(self, path: str, data: Dict, label: str):
+        # Encoded here, on the executor; `data` is a snapshot nothing else touches
+        text = dumps(data, self.compact)
+        atomic_write(path, text, self.backups)
+        STORE_WRITES.labels("json", label).inc()
+        # json.dumps escapes non-ASCII, so characters are bytes
+        STORE_BYTES.labels("json", label).inc(len(text))
+
+    def _schedule_write(self, filename: str, data: Dict, label: Optional[str] = None):
+        path = self._path(filename)
+        self._submit(path, self._write, path, data, label or filename, coalesce=True)
+
+    def load(self, namespace: str) -> Dict[str, Any]:
+        return load_json(self._path(NAMESPACES[namespace]), self.backups)
+
+    def save(self, namespace: str, data: Dict, changed: Optional[Iterable] = None, removed: Iterable = ()):
+        # A JSON file can only be rewritten whole
+        self._schedule_write(NAMESPACES[namespace], snapshot(data))
+
+    # --- Levels ---
+    def _levels_file(self, guild_id: str) -> str:
+        return os.path.join(LEVELS_DIR, f"{guild_id}.json")
+
+    def _split_legacy_levels(self):
+        """Moves the levels of the legacy levels.json to one file per guild (levels.json is left untouched)."""
+        directory = self._path(LEVELS_DIR)
+        if os.path.isdir(directory):
+            return
+        levels = load_json(self._path(LEVELS_FILE), self.backups)
+        # Written next to the final directory and renamed at the end, so a crash never leaves it half filled
+        staging = directory + ".tmp"
+        os.makedirs(staging, exist_ok=True)
+        for gid, users in levels.items():
+            atomic_write(os.path.join(staging, f"{gid}.json"), dumps(users, self.compact), backups=0)
+        os.replace(staging, directory)
+        if levels:
+            print(f"Storage: split {LEVELS_FILE} into {len(levels)} per-guild files in {directory}")
+
+    def load_levels(self, guild_id: str) -> Dict[str, Dict[str, int]]:
+        gid = str(guild_id)
+        users = self._levels.get(gid)
+        if users is None:
+            loaded = load_json(self._path(self._levels_file(gid)), self.backups)
+            # The returned dict is shared with the caller, so saves always see the latest values
+            users = self._levels.setdefault(gid, loaded)
+        return users
+
+    def save_levels(self, level_data: Dict[str, Dict], changed: Iterable[Tuple[str, str]]):
+        """Rewrites the file of each guild with a changed user; a guild's file is still written whole."""
+        for gid in {gid for gid, _ in changed}:
+            users = level_data.get(gid)
+            if users is not None:
+                # Each user's dict always has the same keys, so copying the guild dict is enough
+                self._schedule_write(self._levels_file(gid), dict(users), label=LEVELS_DIR)
+
+    def delete_guild_levels(self, guild_id: str):
+        gid = str(guild_id)
+        self._levels.pop(gid, None)
+        path = self._path(self._levels_file(gid))
+        # Same queue as the file's writes, so it runs after any write still pending
+        self._submit(path, remove, path, self.backups)
+
+
+#   ---- Shared instance ----
+def open_store(backend: Optional[str] = None):
+    """Opens the backend selected by STORAGE_BACKEND ("sqlite" by default, or "json").
+
+    The JSON backend also reads JSON_COMPACT (true/false) and JSON_BACKUPS (number of rotating backups).
+    """
+    backend = (backend or os.getenv("STORAGE_BACKEND", "sqlite")).lower()
+    if backend == "json":
+        compact = os.getenv("JSON_COMPACT", "false").lower() in ("1", "true", "yes")
+        backups = int(os.getenv("JSON_BACKUPS", DEFAULT_BACKUPS))
+        return JSONStore(compact=compact, backups=backups)
+
+    store = SQLiteStore()
+    if not store.is_migrated():
+        imported = store.migrate_from_json()
+        print(f"Storage: imported legacy JSON data into {store.path}: {imported}")
+    return store
+
+
+def get_store(bot):
+    """Returns the store shared by every cog, opening it on first use."""
+    store = getattr(bot, "store", None)
+    if store is None:
+        store = open_store()
+        bot.store = store
+    return store
+
+
+#   ---- Manual migration: python -m utils.storage ----
+if __name__ == "__main__":
+    data_dir = sys.argv[1] if len(sys.argv) > 1 else DATA_DIR
+    sqlite_store = SQLiteStore(os.path.join(data_dir, DB_FILE))
+    print(f"Imported rows: {sqlite_store.migrate_from_json(data_dir)}")
+    sqlite_store.close()
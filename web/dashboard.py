@@ -23,146 +23,307 @@ if not BOT_TOKEN or BOT_TOKEN.strip() == "":
     sys.exit(1)
 print(f"BOT_TOKEN found ({len(BOT_TOKEN)} characters) → OK")
 
+# The project root must be importable for cogs/ and utils/
+sys.path.append(str(BASE_DIR))
+
+import asyncio
+import base64
 import functools
-from flask import Flask, redirect, url_for, session, render_template, request, flash
-import discord
+import hashlib
+import hmac
+import json
+import time
+import aiohttp
+import jinja2
+from aiohttp import web
 from discord.ext import commands
-import threading
-import requests
-
-app = Flask(__name__, static_folder='static', template_folder='templates')
-app.secret_key = os.getenv("FLASK_SECRET_KEY", "fallback-secret-change-me")
+from utils.metrics import PROMETHEUS_CONTENT_TYPE, instrument_bot
+from utils.extensions import load_extensions, sync_command_tree, timing_report
+from utils.intents import PREFIX_COMMANDS, gateway_profile
+from utils.monitoring import LoopLagMonitor
+from utils.sharding import ShardPlan, split_shards
+from utils.snapshots import GATEWAY_PROFILE as SNAPSHOT_PROFILE, SnapshotPublisher
+
+WEB_DIR = Path(__file__).resolve().parent
+DASHBOARD_HOST = os.getenv("DASHBOARD_HOST", "0.0.0.0")
+DASHBOARD_PORT = int(os.getenv("DASHBOARD_PORT", "5000"))
+SECRET_KEY = os.getenv("DASHBOARD_SECRET_KEY") or os.getenv("FLASK_SECRET_KEY", "fallback-secret-change-me")
+# /metrics is only served when set, and requires "Authorization: Bearer <token>"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+#   ---- Sharding ----
+# With shards split over several processes, every process runs its own dashboard for its own guilds.
+# DASHBOARD_CLUSTER_URLS lists their base URLs in process order (as started by python -m utils.sharding)
+SHARD_PLAN = ShardPlan.from_env()
+CLUSTER_URLS = [url.strip().rstrip("/") for url in os.getenv("DASHBOARD_CLUSTER_URLS", "").split(",") if url.strip()]
+CLUSTER_TIMEOUT = aiohttp.ClientTimeout(total=3)
+
+#   ---- Bot ----
+BOT_EXTENSIONS = ("cogs.leveling", "cogs.tempvoice", "cogs.moderation", "cogs.member_id", "cogs.utility",
+                  "cogs.lucky_events")
 
 #   ---- OAuth2 Configuration ----
 CLIENT_ID = os.getenv("CLIENT_ID")
 CLIENT_SECRET = os.getenv("CLIENT_SECRET")
 REDIRECT_URI = "https://volanbotte.duckdns.org/callback"
+# Can point to a local mock server for testing
+DISCORD_API = os.getenv("DISCORD_API_BASE", "https://discord.com/api").rstrip("/")
 AUTH_URL = f"https://discord.com/oauth2/authorize?client_id={CLIENT_ID}&redirect_uri={  REDIRECT_URI  }&response_type=code&scope=identify%20guilds"
-TOKEN_URL = "https://discord.com/api/oauth2/token"
-bot = None
-
-def login_required(view):
-    @functools.wraps(view)
-    def wrapped_view(**kwargs):
-        if session.get("user") is None:
-            return redirect(url_for("login"))
-        return view(**kwargs)
-    return wrapped_view
-
-@app.route("/")
-def index():
-    return render_template("index.html")
-
-@app.route("/home")
-def home():
-    return render_template("index.html")    
-
-@app.route("/login")
-def login():
-    return redirect(AUTH_URL)
-
-@app.route("/callback")
-def callback():
-    try:
-        code = request.args.get("code")
-        if not code:
-            return "No code provided", 400
-
-        print("[CALLBACK] Received code:", code[:10] + "...")  # partial for safety
+TOKEN_URL = f"{DISCORD_API}/oauth2/token"
+MANAGE_GUILD = 0x20
 
-        data = {
-            "client_id": CLIENT_ID,
-            "client_secret": CLIENT_SECRET,
-            "grant_type": "authorization_code",
-            "code": code,
-            "redirect_uri": REDIRECT_URI,
-            "scope": "identify guilds"
-        }
-        headers = {"Content-Type": "application/x-www-form-urlencoded"}
+#   ---- HTTP client pool ----
+HTTP_POOL_SIZE = 20
+HTTP_TIMEOUT = aiohttp.ClientTimeout(total=12, connect=5)
 
-        print("[CALLBACK] Sending token request with redirect_uri:", REDIRECT_URI)
+#   ---- Sessions ----
+SESSION_COOKIE = "dashboard_session"
+SESSION_MAX_AGE = 7 * 24 * 60 * 60
 
-        r = requests.post(TOKEN_URL, data=data, headers=headers, timeout=12)
-        
-        print("[CALLBACK] Token response status:", r.status_code)
-        print("[CALLBACK] Token response body:", r.text[:400])  # limit length
+BOT_KEY = web.AppKey("bot", commands.Bot)
+HTTP_KEY = web.AppKey("http", aiohttp.ClientSession)
 
-        r.raise_for_status()
-        token = r.json()
+templates = jinja2.Environment(
+    loader=jinja2.FileSystemLoader(WEB_DIR / "templates"),
+    autoescape=jinja2.select_autoescape(),
+    enable_async=True
+)
 
-        print("[CALLBACK] Got access_token:", token.get("access_token", "???")[:10] + "...")
 
-        # ────────────────────────────────────────────────
-        # user info request
-        user_headers = {"Authorization": f"Bearer {token['access_token']}"}
-        user_info = requests.get("https://discord.com/api/users/@me", headers=user_headers).json()
-        print("[CALLBACK] User info:", user_info)
+# Processes authenticate to each other with a token derived from the shared secret key
+CLUSTER_TOKEN = hmac.new(SECRET_KEY.encode(), b"dashboard-cluster", hashlib.sha256).hexdigest()
 
-        guilds = requests.get("https://discord.com/api/users/@me/guilds", headers=user_headers).json()
-        print("[CALLBACK] Guilds count:", len(guilds))
+def _sign_session(data: dict) -> str:
+    payload = base64.urlsafe_b64encode(json.dumps(data, separators=(",", ":")).encode())
+    mac = hmac.new(SECRET_KEY.encode(), payload, hashlib.sha256).hexdigest()
+    return f"{payload.decode()}.{mac}"
 
-        # your existing filtering + session code here
-        # ...
+def _load_session(cookie: str) -> dict:
+    """Signed-cookie session, like Flask's: the data lives client-side and can't be altered."""
+    try:
+        payload, mac = cookie.rsplit(".", 1)
+        expected = hmac.new(SECRET_KEY.encode(), payload.encode(), hashlib.sha256).hexdigest()
+        if not hmac.compare_digest(mac, expected):
+            return {}
+        data = json.loads(base64.urlsafe_b64decode(payload.encode()))
+    except (ValueError, TypeError):
+        return {}
+    if data.pop("_expires", 0) < time.time():
+        return {}
+    return data
+
+@web.middleware
+async def session_middleware(request: web.Request, handler):
+    cookie = request.cookies.get(SESSION_COOKIE)
+    session = _load_session(cookie) if cookie else {}
+    request["session"] = session
+    before = json.dumps(session, sort_keys=True)
+
+    response = await handler(request)
+
+    if json.dumps(session, sort_keys=True) != before:
+        if session:
+            data = dict(session, _expires=time.time() + SESSION_MAX_AGE)
+            response.set_cookie(SESSION_COOKIE, _sign_session(data), max_age=SESSION_MAX_AGE,
+                                httponly=True, samesite="Lax")
+        else:
+            response.del_cookie(SESSION_COOKIE)
+    return response
+
+def redirect(location: str) -> web.Response:
+    return web.Response(status=302, headers={"Location": location})
+
+def flash(request: web.Request, message: str):
+    request["session"].setdefault("_flashes", []).append(message)
+
+async def render_template(request: web.Request, name: str, **context) -> web.Response:
+    context.setdefault("flashes", request["session"].pop("_flashes", []))
+    html = await templates.get_template(name).render_async(**context)
+    return web.Response(text=html, content_type="text/html")
+
+def login_required(handler):
+    @functools.wraps(handler)
+    async def wrapped_handler(request: web.Request):
+        if request["session"].get("user") is None:
+            return redirect("/login")
+        return await handler(request)
+    return wrapped_handler
+
+def user_can_manage(request: web.Request, guild_id) -> bool:
+    for g in request["session"]["user"]["guilds"]:
+        if str(g["id"]) == str(guild_id):
+            return bool(int(g.get("permissions", 0)) & MANAGE_GUILD)
+    return False
+
+#   ---- Cluster fan-out ----
+def cluster_url(guild_id) -> str:
+    """Base URL of the process running the guild's shard, or "" if it is this one."""
+    if SHARD_PLAN.owns(guild_id) or not CLUSTER_URLS:
+        return ""
+    shard_id = SHARD_PLAN.shard_for(guild_id)
+    for url, shard_ids in zip(CLUSTER_URLS, split_shards(SHARD_PLAN.shard_count, len(CLUSTER_URLS))):
+        if shard_id in shard_ids:
+            return url
+    return ""
+
+async def remote_guilds(app: web.Application, guild_ids) -> dict:
+    """Asks the other processes, in parallel, which of these guilds they serve: {id: {id, name, icon_url}}."""
+    by_cluster = {}
+    for guild_id in guild_ids:
+        url = cluster_url(guild_id)
+        if url:
+            by_cluster.setdefault(url, []).append(str(guild_id))
+    if not by_cluster:
+        return {}
+
+    async def ask(url: str, ids: list):
+        async with app[HTTP_KEY].get(f"{url}/cluster/guilds", params={"ids": ",".join(ids)},
+                                     headers={"Authorization": f"Bearer {CLUSTER_TOKEN}"},
+                                     timeout=CLUSTER_TIMEOUT) as r:
+            r.raise_for_status()
+            return await r.json()
+
+    results = await asyncio.gather(*(ask(url, ids) for url, ids in by_cluster.items()), return_exceptions=True)
+    guilds = {}
+    for url, result in zip(by_cluster, results):
+        if isinstance(result, Exception):
+            print(f"[CLUSTER] {url} did not answer: {type(result).__name__} {result}")
+            continue
+        for guild in result:
+            guilds[guild["id"]] = guild
+    return guilds
+
+def forward_to_cluster(request: web.Request):
+    """Sends requests for another process' guild there (307 keeps the method and the form)."""
+    url = cluster_url(request.match_info["guild_id"]) if request.match_info["guild_id"].isdigit() else ""
+    if url:
+        raise web.HTTPTemporaryRedirect(f"{url}{request.path_qs}")
+
+routes = web.RouteTableDef()
+
+@routes.get("/")
+async def index(request: web.Request):
+    return await render_template(request, "index.html")
+
+@routes.get("/home")
+async def home(request: web.Request):
+    return await render_template(request, "index.html")
+
+@routes.get("/login")
+async def login(request: web.Request):
+    return redirect(AUTH_URL)
 
-        return redirect(url_for("dashboard"))
+async def _get_json(http: aiohttp.ClientSession, path: str, headers: dict):
+    async with http.get(f"{DISCORD_API}{path}", headers=headers) as r:
+        r.raise_for_status()
+        return await r.json()
+
+@routes.get("/callback")
+async def callback(request: web.Request):
+    code = request.query.get("code")
+    if not code:
+        return web.Response(text="No code provided", status=400)
+
+    print("[CALLBACK] Received code:", code[:10] + "...")  # partial for safety
+
+    http = request.app[HTTP_KEY]
+    bot = request.app[BOT_KEY]
+    data = {
+        "client_id": CLIENT_ID,
+        "client_secret": CLIENT_SECRET,
+        "grant_type": "authorization_code",
+        "code": code,
+        "redirect_uri": REDIRECT_URI,
+        "scope": "identify guilds"
+    }
+    try:
+        async with http.post(TOKEN_URL, data=data) as r:
+            print("[CALLBACK] Token response status:", r.status)
+            r.raise_for_status()
+            token = await r.json()
 
-    except Exception as e:
-        import traceback
+        # user info and guilds are fetched in parallel over the pooled connections
+        user_headers = {"Authorization": f"Bearer {token['access_token']}"}
+        user_info, guilds = await asyncio.gather(
+            _get_json(http, "/users/@me", user_headers),
+            _get_json(http, "/users/@me/guilds", user_headers)
+        )
+    except (aiohttp.ClientError, asyncio.TimeoutError, KeyError) as e:
         print("[CALLBACK CRASH]")
-        traceback.print_exc()
-        print("[CALLBACK] Request args:", request.args)
         print("[CALLBACK] Exception type:", type(e).__name__)
         print("[CALLBACK] Exception message:", str(e))
-        
-        return f"Callback error: {type(e).__name__} - {str(e)}", 500
-        
-@app.route("/dashboard")
+        return web.Response(text=f"Callback error: {type(e).__name__} - {str(e)}", status=500)
+
+    print("[CALLBACK] Guilds count:", len(guilds))
+
+    # Guilds of shards run by other processes are checked with those processes
+    remote = await remote_guilds(request.app, [g["id"] for g in guilds if not SHARD_PLAN.owns(g["id"])])
+
+    # Only the guilds shared with the bot are kept, so the session cookie stays small
+    avatar = user_info.get("avatar")
+    request["session"]["user"] = {
+        "id": user_info["id"],
+        "username": user_info.get("global_name") or user_info.get("username"),
+        "avatar": avatar,
+        "avatar_url": f"https://cdn.discordapp.com/avatars/{user_info['id']}/{avatar}.png" if avatar else None,
+        "guilds": [
+            {"id": str(g["id"]), "permissions": str(g.get("permissions", 0))}
+            for g in guilds if bot.snapshots.get(g["id"]) or g["id"] in remote
+        ]
+    }
+    return redirect("/dashboard")
+
+@routes.get("/dashboard")
 @login_required
-def dashboard():
-    user_guild_ids = [str(g["id"]) for g in session["user"]["guilds"]]
+async def dashboard(request: web.Request):
+    session = request["session"]
+    snapshots = request.app[BOT_KEY].snapshots.snapshots
     common_guilds = []
-    for g in bot.guilds:
-        if str(g.id) in user_guild_ids:
+    remote = await remote_guilds(request.app, [g["id"] for g in session["user"]["guilds"]
+                                               if not SHARD_PLAN.owns(g["id"])])
+    for g in session["user"]["guilds"]:
+        snapshot = snapshots.get(int(g["id"]))
+        if snapshot:
             common_guilds.append({
-                "id": g.id,
-                "name": g.name,
-                "icon_url": str(g.icon.with_size(256)) if g.icon else None
-            })            
-    
-    return render_template("dashboard.html", guilds=common_guilds, user=session["user"])
-
-@app.route("/guild/<guild_id>")
-@login_required
-def guild_config(guild_id):
-    guild = bot.get_guild(int(guild_id))
-    if not guild:
-        flash("Bot non presente o permessi insufficienti")
-        return redirect(url_for("dashboard"))
+                "id": snapshot.id,
+                "name": snapshot.name,
+                "icon_url": snapshot.icon_url
+            })
+        elif g["id"] in remote:
+            common_guilds.append(remote[g["id"]])
 
-    leveling = bot.get_cog("Leveling")
-    tempvoice = bot.get_cog("TempVoice")
-    moderation = bot.get_cog("Moderation")
+    return await render_template(request, "dashboard.html", guilds=common_guilds, user=session["user"])
 
-    config = {}
-    if leveling:
-        config.update(leveling.get_guild_config(str(guild.id)))
-    if tempvoice:
-        config.update(tempvoice.get_guild_config(guild.id))
-    if moderation:
-        config.update(moderation.get_guild_config(guild.id))
+@routes.get("/guild/{guild_id}")
+@login_required
+async def guild_config(request: web.Request):
+    forward_to_cluster(request)
+    bot = request.app[BOT_KEY]
+    guild_id = request.match_info["guild_id"]
+    snapshot = bot.snapshots.get(guild_id) if guild_id.isdigit() else None
+    if not snapshot or not user_can_manage(request, guild_id):
+        flash(request, "Bot non presente o permessi insufficienti")
+        return redirect("/dashboard")
+    if not snapshot.ranked:
+        # Levels of this guild are not in memory yet: load them, then read the new snapshot
+        await bot.snapshots.refresh_guild(snapshot.id)
+        snapshot = bot.snapshots.get(guild_id)
+        if not snapshot:
+            flash(request, "Bot non presente o permessi insufficienti")
+            return redirect("/dashboard")
+
+    config = snapshot.config
 
     # NUOVO: Convertiamo gli ID in nomi reali per la dashboard web
     def resolve_channel(channel_id):
         if not channel_id:
             return "Non configurato"
-        channel = guild.get_channel(int(channel_id))
-        return channel.name if channel else "Canale eliminato"
+        return snapshot.channel_name(channel_id) or "Canale eliminato"
 
     def resolve_role(role_id):
         if not role_id:
             return "Non configurato"
-        role = guild.get_role(int(role_id))
-        return role.name if role else "Ruolo eliminato"
+        return snapshot.role_name(role_id) or "Ruolo eliminato"
 
     # Prepariamo i dati puliti per il template
     display_config = {
@@ -176,79 +337,142 @@ def guild_config(guild_id):
     }
 
     # Ruoli livello
-    for i in range(1, 6):
-        role_id = config.get("role_assignments", {}).get(str(i))
-        display_config["roles"][f"level_{i}"] = resolve_role(role_id)
+    for lvl, role_id in sorted(config.get("role_assignments", {}).items(), key=lambda x: int(x[0])):
+        display_config["roles"][f"level_{lvl}"] = resolve_role(role_id)
 
     # Top 10 (come prima)
-    top_users = []
-    if leveling and str(guild.id) in leveling.level_data:
-        users = leveling.level_data[str(guild.id)]
-        for uid, data in sorted(users.items(), key=lambda x: x[1]["total_xp"], reverse=True)[:10]:
-            member = guild.get_member(int(uid))
-            if member:
-                top_users.append({
-                    "name": member.display_name,
-                    "level": data["level"],
-                    "xp": data["total_xp"],
-                    "avatar": member.display_avatar.url
-                })
-
-    return render_template("guild.html", guild=guild, config=display_config, top_users=top_users, user=session["user"])
-
-@app.route("/logout")
-def logout():
-    session.clear()
-    return redirect("/")
+    top_users = list(snapshot.top_users)
 
-#   ---- Run Bot in Separate Thread ----
-def run_bot():
-    global bot
+    return await render_template(request, "guild.html", guild=snapshot, config=display_config,
+                                 top_users=top_users, user=request["session"]["user"])
 
-    # IMPORTANT: add the project root to Python path
-    import sys
-    from pathlib import Path
-    root_path = Path(__file__).resolve().parent.parent
-    sys.path.append(str(root_path))
-    print(f"Added to sys.path: {root_path}")
-
-    intents = discord.Intents.all()
-    bot = commands.Bot(command_prefix="/", intents=intents)
+@routes.post("/guild/{guild_id}/toggle/{setting}")
+@login_required
+async def toggle_setting(request: web.Request):
+    forward_to_cluster(request)
+    bot = request.app[BOT_KEY]
+    guild_id = request.match_info["guild_id"]
+    setting = request.match_info["setting"]
+    keys = {"leveling": "is_active", "background_task": "backgroundT_status"}
+    snapshot = bot.snapshots.get(guild_id) if guild_id.isdigit() else None
+    leveling = bot.get_cog("Leveling")
+    if setting not in keys or not snapshot or not user_can_manage(request, guild_id):
+        flash(request, "Bot non presente o permessi insufficienti")
+        return redirect("/dashboard")
+    if not leveling:
+        flash(request, "Modulo leveling non caricato")
+        return redirect(f"/guild/{guild_id}")
+
+    # Handlers run on the bot's loop, so the config can be changed directly
+    key = keys[setting]
+    config = leveling.guild_configs.edit(snapshot.id)
+    config[key] = not config.get(key, True)
+    leveling.guild_configs.save(snapshot.id)
+    bot.snapshots.publish([snapshot.id])
+    return redirect(f"/guild/{guild_id}")
+
+async def metrics(request: web.Request):
+    """Registered by create_app only when METRICS_TOKEN is set."""
+    if not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {METRICS_TOKEN}"):
+        return web.Response(status=401, text="Unauthorized")
+    body = request.app[BOT_KEY].metrics.render()
+    return web.Response(body=body.encode(), headers={"Content-Type": PROMETHEUS_CONTENT_TYPE})
+
+@routes.get("/cluster/guilds")
+async def cluster_guilds(request: web.Request):
+    """Which of the requested guilds this process serves (called by the other processes)."""
+    if not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {CLUSTER_TOKEN}"):
+        return web.Response(status=401, text="Unauthorized")
+    snapshots = request.app[BOT_KEY].snapshots
+    guilds = []
+    for guild_id in request.query.get("ids", "").split(","):
+        snapshot = snapshots.get(guild_id) if guild_id.isdigit() else None
+        if snapshot:
+            guilds.append({"id": str(snapshot.id), "name": snapshot.name, "icon_url": snapshot.icon_url})
+    return web.json_response(guilds)
+
+@routes.get("/logout")
+async def logout(request: web.Request):
+    request["session"].clear()
+    return redirect("/")
 
-    @bot.event
-    async def on_ready():
-        print(f"Bot logged in as {bot.user} ({bot.user.id})")
+#   ---- Application ----
+async def http_session_ctx(app: web.Application):
+    """One pooled client session for every OAuth and Discord API call of the dashboard."""
+    connector = aiohttp.TCPConnector(limit=HTTP_POOL_SIZE, ttl_dns_cache=300)
+    async with aiohttp.ClientSession(connector=connector, timeout=HTTP_TIMEOUT) as http:
+        app[HTTP_KEY] = http
+        yield
+
+def create_app(bot: commands.Bot) -> web.Application:
+    app = web.Application(middlewares=[session_middleware])
+    app[BOT_KEY] = bot
+    app.cleanup_ctx.append(http_session_ctx)
+    app.add_routes(routes)
+    # Behind the reverse proxy every request comes from localhost: no token, no /metrics
+    if METRICS_TOKEN:
+        app.router.add_get("/metrics", metrics)
+    app.router.add_static("/static", WEB_DIR / "static")
+    return app
+
+#   ---- Bot ----
+def create_bot() -> commands.Bot:
+    # Only what the cogs and the snapshots declare (see utils/intents.py)
+    gateway = gateway_profile(BOT_EXTENSIONS, PREFIX_COMMANDS, SNAPSHOT_PROFILE)
+    bot = SHARD_PLAN.create_bot(command_prefix="/", **gateway.bot_options())
+    bot.loop_monitor = LoopLagMonitor()
+    bot.snapshots = SnapshotPublisher(bot)
+    instrument_bot(bot)
+
+    async def setup_hook():
+        # Runs once per process; on_ready fires again after reconnects
         print("Loading cogs...")
         print("------------------------------")
+        start = time.perf_counter()
+        timings = await load_extensions(bot, BOT_EXTENSIONS)
+        print(timing_report(timings, time.perf_counter() - start))
+        print("------------------------------")
 
         try:
-            await bot.load_extension("cogs.leveling")
-            print("Leveling cog loaded")
-            await bot.load_extension("cogs.tempvoice")
-            print("TempVoice cog loaded")
-            await bot.load_extension("cogs.moderation")
-            print("Moderation cog loaded")
-            await bot.load_extension("cogs.member_id")
-            print("Member ID cog loaded")
-            await bot.load_extension("cogs.utility")
-            print("Utility cog loaded")
-            await bot.load_extension("cogs.casino")
-            print("Casino cog loaded")
-            print("------------------------------")
-
-            await bot.tree.sync()
-            print("Slash commands synced globally")
+            synced = await sync_command_tree(bot)
+            print("Slash commands unchanged, not synced" if synced is None else f"{synced} slash commands synced globally")
         except Exception as e:
-            print(f"Error loading cogs: {e}")
+            print(f"Error syncing slash commands: {e}")
+
+        # Started after the cogs are loaded, so the first snapshots include their configs
+        bot.snapshots.start()
 
-    print("Starting bot with token...")
-    bot.run(BOT_TOKEN)
+    bot.setup_hook = setup_hook
+
+    @bot.event
+    async def on_ready():
+        print(f"Bot logged in as {bot.user} ({bot.user.id}), {SHARD_PLAN.describe()}")
+        print(f"Gateway: {gateway.describe()}")
+        bot.loop_monitor.start()
+
+    return bot
+
+async def main():
+    shard_error = SHARD_PLAN.validate()
+    if shard_error:
+        print(f"ERROR: {shard_error}")
+        sys.exit(1)
+    bot = create_bot()
+    runner = web.AppRunner(create_app(bot))
+    await runner.setup()
+    # Bot and dashboard share this event loop: no second thread, no cross-thread calls
+    await web.TCPSite(runner, DASHBOARD_HOST, DASHBOARD_PORT).start()
+    print(f"Dashboard running at http://{DASHBOARD_HOST}:{DASHBOARD_PORT}")
+    try:
+        async with bot:
+            print("Starting bot with token...")
+            await bot.start(BOT_TOKEN)
+    finally:
+        await runner.cleanup()
 
 #   ---- Main Entry Point ----
 if __name__ == "__main__":
     print("="*60)
     print("STARTING BOT + DASHBOARD ")
     print("="*60)
-    threading.Thread(target=run_bot, daemon=True).start()
-    print("Bot started → Flask running at https://volanbotte.duckdns.org")
-    app.run(host="0.0.0.0", port=5000, debug=False)
\ No newline at end of file
+    asyncio.run(main())